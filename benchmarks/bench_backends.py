@@ -0,0 +1,61 @@
+"""
+    benchmarks.backends
+
+    Throughput of the gevent and asyncio backends, running flows whose tasks
+    wait on a short sleep, as a stand-in for a network round trip.
+
+    Usage: python -m benchmarks.bench_backends [flow_no] [pool_size]
+"""
+import asyncio
+import sys
+import time
+
+import gevent
+
+from stateful_test import core
+
+TASKS_PER_FLOW = 3
+SLEEP = 0.001
+
+
+def gevent_request():
+    gevent.sleep(SLEEP)
+    return True
+
+
+async def asyncio_request():
+    await asyncio.sleep(SLEEP)
+    return True
+
+
+def flow_factory(request):
+    def _create_flow_path(flow_id):
+        return core.FlowPath([core.Task("request_{}".format(i), request)
+                              for i in range(TASKS_PER_FLOW)])
+    return _create_flow_path
+
+
+def bench(backend, request, flow_no, pool_size):
+    concurrent_flow = core.ConcurrentFlows(flow_factory=flow_factory(request),
+                                           flow_count=flow_no)
+    t = time.perf_counter()
+    logs = concurrent_flow.run({"backend": backend, "mode": "pool",
+                                "pool_size": pool_size})
+    elapsed = time.perf_counter() - t
+    assert all(log["status"] == "SUCCESS" for log in logs.values())
+    return elapsed
+
+
+def main():
+    flow_no = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    pool_size = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    print("{:>8} {:>10} {:>12}".format("backend", "seconds", "flows/s"))
+    for backend, request in (("gevent", gevent_request),
+                             ("asyncio", asyncio_request)):
+        elapsed = bench(backend, request, flow_no, pool_size)
+        print("{:>8} {:>10.3f} {:>12.1f}".format(backend, elapsed,
+                                                 flow_no / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+    benchmarks.multiprocess
+
+    Throughput of CPU bound flows when sharded across worker processes. Every
+    flow parses a JSON payload in its result function, which is what saturates
+    a single core of the load generator first.
+
+    Usage: python -m benchmarks.bench_multiprocess [flow_no] [max_processes]
+"""
+import json
+import multiprocessing
+import sys
+import time
+
+from stateful_test import core
+
+PAYLOAD = json.dumps([{"id": i, "name": "user_{}".format(i), "tags": ["a", "b"]}
+                      for i in range(2000)])
+
+
+def request():
+    return PAYLOAD
+
+
+def parse_response(response):
+    return len(json.loads(response)) == 2000
+
+
+def create_flow_dict(flow_no):
+    flow_dict = {}
+    for i in range(flow_no):
+        task = core.Task("parse", request)
+        task.add_result_function(parse_response, core.TaskResult())
+        flow_dict[i] = core.FlowPath(task)
+    return flow_dict
+
+
+def bench(flow_no, processes):
+    concurrent_flow = core.ConcurrentFlows(create_flow_dict(flow_no))
+    options = {"processes": processes} if processes > 1 else None
+    t = time.perf_counter()
+    logs = concurrent_flow.run(options)
+    elapsed = time.perf_counter() - t
+    assert len(logs) == flow_no
+    return elapsed
+
+
+def main():
+    flow_no = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    max_processes = (int(sys.argv[2]) if len(sys.argv) > 2
+                     else multiprocessing.cpu_count())
+    base = None
+    print("{:>9} {:>10} {:>12} {:>8}".format("processes", "seconds", "flows/s",
+                                             "speedup"))
+    processes = 1
+    while processes <= max_processes:
+        elapsed = bench(flow_no, processes)
+        base = base or elapsed
+        print("{:>9} {:>10.3f} {:>12.1f} {:>8.2f}".format(
+            processes, elapsed, flow_no / elapsed, base / elapsed))
+        processes *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+    benchmarks.overhead
+
+    The overhead of the library itself, measured with no-op tasks so nothing
+    but the framework is timed:
+
+    * The cost per task run through FlowPath.run, with and without a result
+      function, so the task and verification traces are both accounted
+    * The spawn and join cost of ConcurrentFlows runs of 1k, 10k and 100k flows
+    * The memory kept per flow log
+    * The cost of serializing the logs with write_log and the JSONL sink
+
+    The results are written as JSON, so the runs of two versions can be
+    compared. Given a baseline file, every metric is compared against it, and
+    the exit status is 1 if any one regressed more than the given percentage.
+
+    Usage: python -m benchmarks.bench_overhead [output.json] [baseline.json]
+        [max_regression_pct]
+"""
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import stateful_test
+from stateful_test import core
+from stateful_test.main import write_log
+from stateful_test.sinks import JsonlSink
+
+REPEATS = 3
+TASKS_PER_FLOW = 10
+FLOW_PATH_RUNS = 2000
+CONCURRENT_FLOW_COUNTS = (1000, 10000, 100000)
+MEMORY_FLOW_COUNT = 10000
+SERIALIZED_FLOW_COUNT = 10000
+DEFAULT_MAX_REGRESSION = 10
+
+
+def noop():
+    return True
+
+
+def check_noop(result):
+    return result is True
+
+
+def create_flow_path(flow_id=None, verify=False):
+    tasks = []
+    for i in range(TASKS_PER_FLOW):
+        task = core.Task("task_{}".format(i), noop)
+        if verify:
+            task.add_result_function(check_noop, core.TaskResult())
+        tasks.append(task)
+    return core.FlowPath(tasks)
+
+
+def best_of(function, repeats=REPEATS):
+    """
+    :return: <float> The fastest of the timed runs, in seconds
+    """
+    timings = []
+    for _ in range(repeats):
+        gc.collect()
+        t = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - t)
+    return min(timings)
+
+
+def bench_task_overhead(verify):
+    flow_paths = [create_flow_path(verify=verify)
+                  for _ in range(FLOW_PATH_RUNS * REPEATS)]
+
+    def _run():
+        for _ in range(FLOW_PATH_RUNS):
+            flow_paths.pop().run()
+    elapsed = best_of(_run)
+    return elapsed / (FLOW_PATH_RUNS * TASKS_PER_FLOW) * 1e9
+
+
+def bench_concurrent_flows(flow_count):
+    def _run():
+        core.ConcurrentFlows(flow_factory=create_flow_path,
+                             flow_count=flow_count).execute()
+    elapsed = best_of(_run, repeats=1 if flow_count >= 100000 else REPEATS)
+    return elapsed / flow_count * 1e6
+
+
+def run_logs(flow_count):
+    return core.ConcurrentFlows(flow_factory=create_flow_path,
+                                flow_count=flow_count).run()
+
+
+def bench_memory_per_flow():
+    gc.collect()
+    tracemalloc.start()
+    concurrent_flow = core.ConcurrentFlows(flow_factory=create_flow_path,
+                                           flow_count=MEMORY_FLOW_COUNT)
+    concurrent_flow.execute()
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del concurrent_flow
+    return memory / MEMORY_FLOW_COUNT
+
+
+def bench_write_log(logs):
+    out_dict = {"cflows": logs}
+    with open(os.devnull, "w") as devnull:
+        _stdout, sys.stdout = sys.stdout, devnull
+        try:
+            elapsed = best_of(lambda: write_log(out_dict))
+        finally:
+            sys.stdout = _stdout
+    return elapsed / len(logs) * 1e6
+
+
+def bench_jsonl_sink(logs):
+    def _write():
+        with open(os.devnull, "w") as devnull, JsonlSink(devnull) as sink:
+            for flow_id, log in logs.items():
+                sink.write_flow("cflows", flow_id, log)
+    return best_of(_write) / len(logs) * 1e6
+
+
+def run_benchmarks():
+    """
+    :return: <dict> The metrics by name. Every metric is a cost, so the lower
+        the better
+    """
+    core.patch_gevent()
+    results = {
+        "task_run_ns": {"value": bench_task_overhead(False), "unit": "ns/task"},
+        "task_run_verified_ns": {"value": bench_task_overhead(True),
+                                 "unit": "ns/task"},
+    }
+    for flow_count in CONCURRENT_FLOW_COUNTS:
+        results["concurrent_flows_{}_us".format(flow_count)] = {
+            "value": bench_concurrent_flows(flow_count), "unit": "us/flow"}
+    results["memory_per_flow_bytes"] = {"value": bench_memory_per_flow(),
+                                        "unit": "bytes/flow"}
+    logs = run_logs(SERIALIZED_FLOW_COUNT)
+    results["write_log_us"] = {"value": bench_write_log(logs), "unit": "us/flow"}
+    results["jsonl_sink_us"] = {"value": bench_jsonl_sink(logs),
+                                "unit": "us/flow"}
+    return results
+
+
+def compare(results, baseline, max_regression):
+    """
+    Print every metric against the baseline one
+    :return: <list>.<str> The metrics which regressed more than max_regression
+    """
+    regressed = []
+    print("{:>28} {:>12} {:>12} {:>8}".format("metric", "baseline", "current",
+                                                "change"))
+    for name, metric in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        change = (metric["value"] / previous["value"] - 1) * 100
+        print("{:>28} {:>12.1f} {:>12.1f} {:>7.1f}%".format(
+            name, previous["value"], metric["value"], change))
+        if change > max_regression:
+            regressed.append(name)
+    return regressed
+
+
+def main():
+    output = sys.argv[1] if len(sys.argv) > 1 else None
+    baseline_path = sys.argv[2] if len(sys.argv) > 2 else None
+    max_regression = (float(sys.argv[3]) if len(sys.argv) > 3
+                      else DEFAULT_MAX_REGRESSION)
+
+    report = {
+        "version": stateful_test.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "results": run_benchmarks(),
+    }
+    if output:
+        with open(output, "w") as output_file:
+            json.dump(report, output_file, indent=4)
+    else:
+        print(json.dumps(report, indent=4))
+
+    if baseline_path:
+        with open(baseline_path) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+        regressed = compare(report["results"], baseline, max_regression)
+        if regressed:
+            print("Regressed: {}".format(", ".join(regressed)))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+    benchmarks.records
+
+    Time and memory spent tracing tasks with the slotted trace records, against
+    the deep copied log dictionaries they replace.
+
+    Usage: python -m benchmarks.bench_records [task_no]
+"""
+import copy
+import sys
+import time
+import tracemalloc
+
+from stateful_test.log_config import LOG_DICT, TASK_DICT
+from stateful_test.records import FlowRecord, TaskRecord
+
+TASKS_PER_FLOW = 10
+
+
+def trace_dicts(task_no):
+    flows = []
+    for i in range(task_no // TASKS_PER_FLOW):
+        log = copy.deepcopy(LOG_DICT)
+        for j in range(TASKS_PER_FLOW):
+            task_dict = copy.deepcopy(TASK_DICT)
+            task_dict["status"]["task"] = "SUCCESS"
+            task_dict["execution_time"] = j
+            log["tasks"]["task_{}".format(j)] = task_dict
+        flows.append(log)
+    return flows
+
+
+def trace_records(task_no):
+    flows = []
+    for i in range(task_no // TASKS_PER_FLOW):
+        record = FlowRecord()
+        for j in range(TASKS_PER_FLOW):
+            task_record = TaskRecord()
+            task_record.task_status = "SUCCESS"
+            task_record.start_ns = 0
+            task_record.end_ns = j
+            record.tasks["task_{}".format(j)] = task_record
+        flows.append(record)
+    return flows
+
+
+def bench(trace_function, task_no):
+    t = time.perf_counter()
+    trace_function(task_no)
+    elapsed = time.perf_counter() - t
+
+    tracemalloc.start()
+    flows = trace_function(task_no)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del flows
+    return elapsed, memory
+
+
+def main():
+    task_no = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print("{:>8} {:>10} {:>10}".format("trace", "seconds", "MiB"))
+    for name, trace_function in (("dicts", trace_dicts),
+                                 ("records", trace_records)):
+        elapsed, memory = bench(trace_function, task_no)
+        print("{:>8} {:>10.3f} {:>10.1f}".format(name, elapsed, memory / 2**20))
+
+
+if __name__ == "__main__":
+    main()
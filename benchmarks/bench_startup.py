@@ -0,0 +1,70 @@
+"""
+    benchmarks.startup
+
+    Startup cost of the CLI: the time to import stateful_test.main and to load a
+    minimal flowfile, measured in fresh interpreters. The medians are printed as
+    JSON. With a threshold, the exit status is 1 when the total is above it, so
+    CI can guard against startup regressions.
+
+    Usage: python -m benchmarks.bench_startup [runs] [threshold_ms]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+FLOWFILE = '''
+from stateful_test.core import Task, FlowPath
+
+def dummy():
+    return True
+
+flow = FlowPath([Task("dummy", dummy)])
+'''
+
+PROBE = '''
+import json, sys, time
+t = time.perf_counter()
+from stateful_test.main import load_flowfile
+imported = time.perf_counter()
+load_flowfile(sys.argv[1])
+loaded = time.perf_counter()
+print(json.dumps({"import_ms": (imported - t) * 1000,
+                  "load_ms": (loaded - imported) * 1000,
+                  "gevent_imported": "gevent" in sys.modules}))
+'''
+
+
+def probe(flowfile):
+    output = subprocess.check_output([sys.executable, "-c", PROBE, flowfile],
+                                     cwd=os.path.dirname(os.path.dirname(
+                                         os.path.abspath(__file__))))
+    return json.loads(output)
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    threshold_ms = float(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    with tempfile.TemporaryDirectory() as directory:
+        flowfile = os.path.join(directory, "flowfile.py")
+        with open(flowfile, "w") as f:
+            f.write(FLOWFILE)
+        samples = [probe(flowfile) for _ in range(runs)]
+
+    result = {
+        "runs": runs,
+        "import_ms": statistics.median(s["import_ms"] for s in samples),
+        "load_ms": statistics.median(s["load_ms"] for s in samples),
+        "gevent_imported": any(s["gevent_imported"] for s in samples),
+    }
+    result["total_ms"] = result["import_ms"] + result["load_ms"]
+    print(json.dumps(result, indent=2))
+    if threshold_ms is not None and result["total_ms"] > threshold_ms:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
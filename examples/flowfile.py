@@ -1,17 +1,23 @@
 """
     Perform simple requests concurrently using the ConcurrencyFlows class. Check
-    the task returns a 200 response code
+    the task returns a 200 response code. The HTTP sessions are pooled, so the
+    connections are reused across the flows
 """
 
 from stateful_test import core
+from stateful_test.resources import ResourcePool
 import requests
 
 req_no = 10
 url = "http://www.example.com/"
 
+# The tasks get one of the sessions while they run. They are closed at the end
+sessions = ResourcePool("sessions", requests.Session, size=5,
+                        teardown=lambda session: session.close())
 
-def request():
-    response = requests.get(url)
+
+def request(session):
+    response = session.get(url)
     return response
 
 
@@ -22,10 +28,14 @@ def create_task():
         else:
             return False
 
-    task = core.Task("example_request", request)
+    task = core.Task("example_request", request, task_args=[sessions])
     task.add_result_function(result_test, task.result)
     return task
 
 
-flow_dict = {i: core.FlowPath(create_task()) for i in range(req_no)}
-cflows = core.ConcurrentFlows(flow_dict)
+def create_flow_path(flow_id):
+    return core.FlowPath(create_task())
+
+
+# The flows are created as they are about to run
+cflows = core.ConcurrentFlows(flow_factory=create_flow_path, flow_count=req_no)
@@ -16,7 +16,7 @@ setup(
     author_email="iatzkypedro@gmail.com",
     description="A simpleframework for performing integration tests",
     packages=["stateful_test"],
-    python_requires=">=3.5",
+    python_requires=">=3.7",
     install_requires=[
         'gevent>=1.4.0',
     ],
@@ -1,4 +1,8 @@
 __version__ = "0.2.0"
 
 
-from .core import Task, FlowPath, TaskResult
+from .core import Task, FlowPath, TaskResult, patch_gevent
+from .resources import ResourcePool, close_pools
+from .events import EventHooks
+from .polling import Polling
+from .feeders import Feeder
@@ -0,0 +1,82 @@
+"""
+    Checkpoints of the flow paths, so a long flow which has failed can be
+    resumed from its first unfinished task instead of being run from scratch.
+
+    A FlowPath with a Checkpoint saves it after every task which has finished
+    successfully: the executed path, the task results which can be serialized
+    as JSON, and the trace. A resumed FlowPath skips the tasks it has already
+    finished, and their saved results replace the TaskResult place holders of
+    the tasks it runs. A task whose result cannot be serialized is run again,
+    and so is every task after it, unless the flow runs in parallel, in which
+    case only the tasks depending on it are. The checkpoint is removed once
+    the flow has succeeded, so the next run starts over.
+"""
+import json
+import os
+
+CHECKPOINT_EXTENSION = ".checkpoint.json"
+
+
+def serializable_results(results, task_names):
+    """
+    :param results: <dict> The task results by task name
+    :param task_names: <list>.<str> The tasks whose results are kept
+    :return: <dict> The results which can be serialized as JSON
+    """
+    serializable = {}
+    for name in task_names:
+        try:
+            json.dumps(results.get(name))
+        except (TypeError, ValueError):
+            continue
+        serializable[name] = results.get(name)
+    return serializable
+
+
+class Checkpoint(object):
+
+    def __init__(self, path):
+        """
+        :param path: <str> The JSON file the checkpoint is saved to
+        """
+        self.path = path
+
+    @classmethod
+    def in_directory(cls, directory, name):
+        """
+        :param directory: <str>
+        :param name: <str> The name of the flow path, e.g. its flowfile target
+        :return: <Checkpoint>
+        """
+        return cls(os.path.join(directory, name + CHECKPOINT_EXTENSION))
+
+    def save(self, state):
+        """
+        Replace the saved checkpoint. It is written to a temporary file first,
+        so a crash while saving keeps the previous one
+        :param state: <dict> The executed_path, results and trace
+        :return:
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w") as checkpoint_file:
+            json.dump(state, checkpoint_file)
+        os.replace(temporary_path, self.path)
+
+    def load(self):
+        """
+        :return: <dict> The saved state, or None if there is no checkpoint
+        """
+        try:
+            with open(self.path) as checkpoint_file:
+                return json.load(checkpoint_file)
+        except FileNotFoundError:
+            return None
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
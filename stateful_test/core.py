@@ -1,10 +1,17 @@
-from gevent import monkey; monkey.patch_all()
-import gevent
-import copy
 import contextlib
+import itertools
 import time
-from .helpers import cast_to_args, cast_to_kwargs, format_time
-from .log_config import LOG_DICT, TASK_DICT
+from .checkpoint import serializable_results
+from .events import FLOW_END, FLOW_START, TASK_END, TASK_START, VERIFICATION_END
+from .executors import (DEFAULT_THREAD_POOL_SIZE, EXECUTORS, GREENLET_EXECUTOR,
+                        ExecutorPools, default_executors)
+from .feeders import feed, feeders_in, partition_feeders
+from .helpers import cast_to_args, cast_to_kwargs, clock_ns
+from .histogram import LatencyStats
+from .records import FlowRecord, TaskRecord
+from .resources import (checkout, checkout_async, close_pools, pools_in,
+                        release)
+from .shared import PROCESS_SCOPE, SCOPES, SharedResults, process_results
 import traceback
 
 
@@ -37,72 +44,252 @@ class ResultFunctionError(Exception):
                          " when executing!!".format(task_name))
 
 
+class TaskDependencyError(Exception):
+    def __init__(self, task_name, reason):
+        super().__init__("Task {} dependencies are wrong: {}!!"
+                         .format(task_name, reason))
+
+
 class RunFailException(Exception):
     def __init__(self, task_name):
         super().__init__("The task {} result was unexpected!!".format(task_name))
 
 
+class TaskTimeoutError(Exception):
+    def __init__(self, task_name, timeout):
+        super().__init__("Task {} did not finish within {} seconds!!"
+                         .format(task_name, timeout))
+
+
+class FlowTimeoutError(Exception):
+    def __init__(self, timeout):
+        super().__init__("The flow did not finish within {} seconds!!"
+                         .format(timeout))
+
+
+class InvalidRunOptions(Exception):
+    def __init__(self, reason):
+        super().__init__("Invalid run options: {}!!".format(reason))
+
+
+class ShardError(Exception):
+    def __init__(self, pid, reason):
+        super().__init__("The worker process {} running a shard {}!!"
+                         .format(pid, reason))
+
+
+_gevent_patched = False
+
+
+def patch_gevent():
+    """
+    Monkey patch the standard library with gevent, so the blocking calls of the
+    tasks yield to the other greenlets. Importing the library does not patch
+    anything: it is done once, when the first run which needs gevent starts.
+    A flowfile can call it at the top, before importing other libraries, so
+    they are patched from the beginning
+    :return:
+    """
+    global _gevent_patched
+    if not _gevent_patched:
+        from gevent import monkey
+        monkey.patch_all()
+        _gevent_patched = True
+
+
+def _is_cancellation(e):
+    """
+    :return: <bool> True if the exception cancels the greenlet or coroutine
+        from outside, e.g. gevent.Timeout, GreenletExit or CancelledError
+    """
+    return not isinstance(e, (Exception, KeyboardInterrupt, SystemExit))
+
+
+@contextlib.contextmanager
+def deadline(timeout, on_timeout):
+    """
+    Cancel the block if it has not finished within the timeout. The
+    cancellation is cooperative: it takes place as soon as the block yields to
+    the gevent hub
+    :param timeout: <float> Seconds, or None for no deadline
+    :param on_timeout: <function> Returns the exception to raise instead
+    :return:
+    """
+    if timeout is None:
+        yield
+        return
+    patch_gevent()
+    import gevent
+    timer = gevent.Timeout(timeout)
+    timer.start()
+    try:
+        yield
+    except gevent.Timeout as e:
+        if e is not timer:
+            raise
+        raise on_timeout()
+    finally:
+        timer.close()
+
+
+async def wait_for(awaitable, timeout, on_timeout):
+    """
+    The deadline counterpart to be awaited from an asyncio event loop
+    """
+    if timeout is None:
+        return await awaitable
+    import asyncio
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise on_timeout()
+
+
 @contextlib.contextmanager
-def task_trace(log_dict, task_name):
+def task_trace(flow_record, task_name, stats=None):
     # What would be best than creating non idempotent functions in order to
     # build a library aimed to testing stateful systems
-    t = time.time()
-    task_dict = copy.deepcopy(TASK_DICT)
-    log_dict["tasks"][task_name] = task_dict
-    task_dict["status"]["task"] = "SUCCESS"
+    task_record = TaskRecord()
+    flow_record.tasks[task_name] = task_record
+    task_record.task_status = "SUCCESS"
+    task_record.start_ns = clock_ns()
     try:
         yield
+    except TaskTimeoutError as e:
+        task_record.task_status = "TIMEOUT"
+        raise e
     except Exception as e:
-        task_dict["status"]["task"] = "ERROR"
+        task_record.task_status = "ERROR"
+        raise e
+    except BaseException as e:
+        if _is_cancellation(e):
+            task_record.task_status = "TIMEOUT"
         raise e
     finally:
-        task_dict["execution_time"] = format_time(t)
+        task_record.end_ns = clock_ns()
+        if stats is not None:
+            # The gross execution time, the pool and queue waits included
+            stats.record_execution(task_name, task_record.execution_ns // 1000)
 
 
 @contextlib.contextmanager
-def verification_trace(log_dict, task_name):
-    t = time.time()
-    # I have the dict already saved in the log dictionary
-    task_dict = log_dict["tasks"][task_name]
-    task_dict["status"]["verification"] = "SUCCESS"
+def verification_trace(flow_record, task_name, stats=None):
+    # I have the record already saved in the flow record
+    task_record = flow_record.tasks[task_name]
+    task_record.verification_status = "SUCCESS"
+    task_record.verification_start_ns = clock_ns()
     try:
         yield
     except RunFailException as e:
-        task_dict["status"]["verification"] = "FAILED"
+        task_record.verification_status = "FAILED"
+        raise e
+    except TaskTimeoutError as e:
+        task_record.verification_status = "TIMEOUT"
         raise e
     except Exception as e:
-        task_dict["status"]["verification"] = "ERROR"
+        task_record.verification_status = "ERROR"
+        raise e
+    except BaseException as e:
+        if _is_cancellation(e):
+            task_record.verification_status = "TIMEOUT"
         raise e
     finally:
-        task_dict["verification_time"] = format_time(t)
+        task_record.verification_end_ns = clock_ns()
+        if stats is not None:
+            # The gross verification time, as the execution one
+            stats.record_verification(task_name,
+                                      task_record.verification_ns // 1000)
 
 
 @contextlib.contextmanager
-def flow_trace(log_dict):
-    t = time.time()
-    log_dict["status"] = "SUCCESS"
+def flow_trace(flow_record, stats=None):
+    flow_record.status = "SUCCESS"
+    flow_record.start_ns = clock_ns()
     try:
         yield
     except RunFailException as e:
-        log_dict["status"] = "FAILED"
+        flow_record.status = "FAILED"
+    except (TaskTimeoutError, FlowTimeoutError):
+        flow_record.status = "TIMEOUT"
     except Exception:
-        log_dict["status"] = "ERROR"
+        flow_record.status = "ERROR"
         traceback.print_exc()
+    except BaseException as e:
+        if _is_cancellation(e):
+            # The flow was cancelled from outside, e.g. by the run timeout.
+            # Its trace is kept, but the cancellation goes on
+            flow_record.status = "TIMEOUT"
+        raise e
     finally:
-        log_dict["total_elapsed_time"] = format_time(t)
+        flow_record.end_ns = clock_ns()
+        if stats is not None:
+            stats.record_flow(flow_record.latency_ns // 1000)
+
+
+AT_ONCE_MODE = "at_once"
+POOL_MODE = "pool"
+RAMP_UP_MODE = "ramp_up"
+ARRIVAL_RATE_MODE = "arrival_rate"
+
+CONSTANT_ARRIVALS = "constant"
+POISSON_ARRIVALS = "poisson"
+
+RAMP_UP_PHASE = RAMP_UP_MODE
+HOLD_PHASE = "hold"
+
+GEVENT_BACKEND = "gevent"
+ASYNCIO_BACKEND = "asyncio"
+
+
+def shard_options(options, index, count, flow_count):
+    """
+    Split the arrival rate and the max flows in flight of the run among the
+    shards, e.g. the worker processes, so together they keep to the run ones
+    instead of multiplying them. The flows are dealt to the shards in turn, so
+    the rate of a shard is in proportion to its flows, while the max flows in
+    flight are split evenly, the first shards getting the remainder
+    :param options: <dict> The run options, or None
+    :param index: <int> The shard index, from 0 to count - 1
+    :param count: <int> The number of shards
+    :param flow_count: <int> The number of flows of the run
+    :return: <dict> The options of the shard
+    """
+    options = dict(options or {})
+    if options.get("mode") != ARRIVAL_RATE_MODE:
+        return options
+    rate = options.get("rate")
+    shard_flows = len(range(index, flow_count, count))
+    # A shard with no flows does not start any
+    if isinstance(rate, (int, float)) and rate > 0 and shard_flows:
+        options["rate"] = rate * shard_flows / flow_count
+    max_in_flight = options.get("max_in_flight")
+    if isinstance(max_in_flight, int) and max_in_flight >= 1:
+        if max_in_flight < count:
+            raise InvalidRunOptions("max_in_flight cannot be lower than the "
+                                    "number of shards")
+        options["max_in_flight"] = (max_in_flight // count
+                                    + (index < max_in_flight % count))
+    return options
 
 
 class TaskResult(object):
     # This class is just a place holder to be used when specifying the
     # check_result functions for a Task class. If you want to use the task result
-    # as a variable input, you can set this place holder
-    pass
+    # as a variable input, you can set this place holder.
+    # If it is given another task (or task name), the placeholder is replaced by
+    # the result of that task of the same flow path, which the task then
+    # depends on. It can be used in the task arguments as well
+    def __init__(self, task=None):
+        self.task_name = task.name if isinstance(task, Task) else task
 
 
 class Task(object):
 
     def __init__(self, name, task_function=None, task_args=None, task_kwargs=None,
-                 result_function=None, result_args=None, result_kwargs=None):
+                 result_function=None, result_args=None, result_kwargs=None,
+                 depends_on=None, timeout=None, poll=None, shared=None,
+                 ttl=None, executor=None, result_executor=None,
+                 shared_key=None):
         """
         Define a task to be executed. You must define a task_function when
         instantiating or using the add_execution_task function. Further,
@@ -120,8 +307,53 @@ class Task(object):
             pass them here as a dictionary
         :param result_kwargs: <dict> If your result_function uses keyword arguments,
             pass them here as a dictionary
+        :param depends_on: <list>.<Task> or <list>.<str> The tasks of the same flow
+            path which must have finished before running this one. The tasks
+            whose results are used through a TaskResult place holder are
+            dependencies as well
+        :param timeout: <float> Max seconds the task function, and then the
+            result function, can run. They are cancelled once it is exceeded,
+            as soon as they yield to the gevent hub or the asyncio event loop,
+            and the task or its verification gets a TIMEOUT status
+        :param poll: <Polling> If given, the result function is called again,
+            as the polling policy says, until it returns True. The timeout
+            applies to every call, and a call which raises or times out is a
+            failed attempt as well. If the last attempt raised, its error is
+            raised
+        :param shared: <str> "run" or "process". If given, the task is run once
+            and its result is shared by the flows of the same run, or of the
+            same process, instead of being run by every flow
+        :param ttl: <float> Seconds a shared result is reused for. The task is
+            run again by the first flow reaching it after that. Forever if None
+        :param executor: <str> "greenlet" (default), "thread" or "process".
+            Where the task function runs: in the flow greenlet, or offloaded
+            to the thread or process pool of the run, so a blocking or CPU
+            bound function does not stall the other flows
+        :param result_executor: <str> Where the result function runs, as the
+            executor does
+        :param shared_key: The hashable key the result is shared by. Default:
+            the task name and the module and qualified name of the task
+            function, so the unrelated tasks of the same name do not share it
+
+        A ResourcePool given in the task or result arguments is replaced by
+        one of its instances while the function runs, and a Feeder, or one of
+        its fields, by the row the flow has drawn
         """
         self.name = name
+        self.depends_on = [t.name if isinstance(t, Task) else t
+                           for t in cast_to_args(depends_on)]
+        self.timeout = timeout
+        self.poll = poll
+        if shared is not None and shared not in SCOPES:
+            raise ValueError("Unknown shared scope {}".format(shared))
+        self.shared = shared
+        self.ttl = ttl
+        self.__shared_key = shared_key
+        for value in (executor, result_executor):
+            if value is not None and value not in EXECUTORS:
+                raise ValueError("Unknown executor {}".format(value))
+        self.executor = executor
+        self.result_executor = result_executor
 
         self.__task_function = task_function
         self.__task_args = cast_to_args(task_args)
@@ -133,61 +365,341 @@ class Task(object):
 
         self.__result = None
         self.__task_run = None
+        # The feeder rows drawn by the task when it is run out of a flow path
+        self.__rows = None
+        # The nanoseconds spent waiting for the resource pools, if any is used
+        self.pool_wait_ns = None
+        # The nanoseconds the offloaded task and result functions were queued
+        # for a worker, respectively
+        self.queue_wait_ns = None
+        self.verification_queue_wait_ns = None
+        # The number of times the result function has been called
+        self.verification_attempts = None
+        # CACHE_HIT or CACHE_MISS if the task is shared
+        self.cache_status = None
 
     @property
     def result(self):
         if self.__result is None:
-            return TaskResult()
+            return TaskResult(self)
         else:
             return self.__result
 
+    @property
+    def dependencies(self):
+        """
+        :return: <set>.<str> The names of the tasks this one depends on
+        """
+        dependencies = set(self.depends_on)
+        for value in itertools.chain(self.__task_args, self.__task_kwargs.values(),
+                                     self.__result_args,
+                                     self.__result_kwargs.values()):
+            if (isinstance(value, TaskResult) and value.task_name is not None
+                    and value.task_name != self.name):
+                dependencies.add(value.task_name)
+        return dependencies
+
+    @property
+    def feeders(self):
+        """
+        :return: <list>.<Feeder> The feeders whose rows are used in the task or
+            result arguments
+        """
+        return feeders_in(itertools.chain(
+            self.__task_args, self.__task_kwargs.values(), self.__result_args,
+            self.__result_kwargs.values()))
+
+    @property
+    def shared_key(self):
+        """
+        :return: The key the result is shared by, if the task is shared
+        """
+        if self.__shared_key is not None:
+            return self.__shared_key
+        function = self.__task_function
+        return (self.name, getattr(function, "__module__", None),
+                getattr(function, "__qualname__", type(function).__qualname__))
+
+    @property
+    def resource_pools(self):
+        """
+        :return: <list>.<ResourcePool> The pools given in the task or result
+            arguments
+        """
+        return pools_in(itertools.chain(
+            self.__task_args, self.__task_kwargs.values(), self.__result_args,
+            self.__result_kwargs.values()))
+
+    def __resolve(self, value, results):
+        value = feed(value, results)
+        if not isinstance(value, TaskResult):
+            return value
+        if value.task_name is None or value.task_name == self.name:
+            return self.__result
+        if results is not None and value.task_name in results:
+            return results[value.task_name]
+        return value
+
     @result.setter
     def result(self, function_result):
         self.__result = function_result
 
-    def run(self):
-        """
-        Run the main task
-        :return:
-        """
+    def __task_call(self, results):
         if not self.__task_function:
             raise TaskNotDefined(self.name)
         if self.__task_run:
             raise TaskAlreadyRunException(self.name)
+        if results is None:
+            results = self.__rows = {f: f.next_row() for f in self.feeders}
         try:
-            self.__result = self.__task_function(*self.__task_args,
-                                                 **self.__task_kwargs)
-            self.__task_run = True
+            args = [self.__resolve(a, results) for a in self.__task_args]
+            kwargs = {k: self.__resolve(v, results)
+                      for k, v in self.__task_kwargs.items()}
         except Exception:
             raise TaskError(self.name)
+        return args, kwargs
+
+    def __timeout_error(self):
+        return TaskTimeoutError(self.name, self.timeout)
 
-    def check_result(self):
+    def __call(self, function, args, kwargs, error, executor, executors):
         """
-        If a verification result function was given. Execute it and success
-        if this one return a positive boolean value
+        Call a function with the pooled resources checked out. The timeout
+        covers the wait for a free instance as well
+        """
+        try:
+            if self.timeout is None:
+                return self.__invoke(function, args, kwargs, error, executor,
+                                     executors)
+            with deadline(self.timeout, self.__timeout_error):
+                return self.__invoke(function, args, kwargs, error, executor,
+                                     executors)
+        except TaskTimeoutError:
+            raise
+        except Exception:
+            raise error(self.name)
+
+    def __invoke(self, function, args, kwargs, error, executor, executors):
+        args, kwargs, instances = self.__add_pool_wait(checkout(args, kwargs))
+        try:
+            if executor in (None, GREENLET_EXECUTOR):
+                return function(*args, **kwargs)
+            return self.__offloaded(error, *(executors or default_executors).call(
+                executor, function, args, kwargs))
+        finally:
+            release(instances)
+
+    def __offloaded(self, error, queue_wait_ns, succeeded, value):
+        """
+        :param error: <class> TaskError or ResultFunctionError, which tells
+            whether the task or the result function was offloaded
+        """
+        if error is ResultFunctionError:
+            self.verification_queue_wait_ns = (
+                (self.verification_queue_wait_ns or 0) + queue_wait_ns)
+        else:
+            self.queue_wait_ns = (self.queue_wait_ns or 0) + queue_wait_ns
+        if not succeeded:
+            raise value
+        return value
+
+    async def __call_async(self, function, args, kwargs, error, executor,
+                           executors):
+        import inspect
+        try:
+            args, kwargs, instances = self.__add_pool_wait(
+                await checkout_async(args, kwargs))
+            try:
+                if executor in (None, GREENLET_EXECUTOR):
+                    result = function(*args, **kwargs)
+                    if inspect.isawaitable(result):
+                        result = await result
+                else:
+                    result = self.__offloaded(
+                        error, *await (executors or default_executors).call_async(
+                            executor, function, args, kwargs))
+            finally:
+                release(instances)
+        except Exception:
+            raise error(self.name)
+        return result
+
+    def __add_pool_wait(self, checked_out):
+        args, kwargs, instances, wait_ns = checked_out
+        if instances:
+            self.pool_wait_ns = (self.pool_wait_ns or 0) + wait_ns
+        return args, kwargs, instances
+
+    def __shared_results(self, shared_results):
+        """
+        :return: <SharedResults> The results of the task scope. A task shared
+            by run which is run out of a ConcurrentFlows run gets its own
+        """
+        if self.shared == PROCESS_SCOPE:
+            return process_results
+        return SharedResults() if shared_results is None else shared_results
+
+    def run(self, results=None, shared_results=None, executors=None):
+        """
+        Run the main task
+        :param results: <dict> The results of other tasks, by task name, and
+            the feeder rows of the flow, by feeder, to replace the place
+            holders with
+        :param shared_results: <SharedResults> The results shared by the run,
+            if the task is shared by run
+        :param executors: <ExecutorPools> The pools of the run, if the task
+            function is offloaded. Default: the process-wide ones
         :return:
         """
-        if not self.__result_function:
-            # If there is not a defined a result function. It is assumed the task
-            # has completed successfully
-            return True
+        args, kwargs = self.__task_call(results)
+        if self.shared is None:
+            self.__run(args, kwargs, executors)
+            return
+        self.cache_status, self.__result = self.__shared_results(
+            shared_results).get_or_run(
+                self.shared_key, self.ttl, lambda: self.__run(args, kwargs, executors))
+        self.__task_run = True
+
+    def __run(self, args, kwargs, executors):
+        self.__result = self.__call(self.__task_function, args, kwargs,
+                                    TaskError, self.executor, executors)
+        self.__task_run = True
+        return self.__result
+
+    async def run_async(self, results=None, shared_results=None,
+                        executors=None):
+        """
+        Run the main task from an asyncio event loop. If the task function is a
+        coroutine function, it is awaited, unless it is offloaded
+        :param results: <dict> The results of other tasks, by task name, and
+            the feeder rows of the flow, by feeder, to replace the place
+            holders with
+        :param shared_results: <SharedResults> The results shared by the run,
+            if the task is shared by run
+        :param executors: <ExecutorPools> The pools of the run, if the task
+            function is offloaded. Default: the process-wide ones
+        :return:
+        """
+        args, kwargs = self.__task_call(results)
+        if self.shared is None:
+            await self.__run_async(args, kwargs, executors)
+            return
+        self.cache_status, self.__result = await self.__shared_results(
+            shared_results).get_or_run_async(
+                self.shared_key, self.ttl,
+                lambda: self.__run_async(args, kwargs, executors))
+        self.__task_run = True
+
+    async def __run_async(self, args, kwargs, executors):
+        self.__result = await wait_for(
+            self.__call_async(self.__task_function, args, kwargs, TaskError,
+                              self.executor, executors),
+            self.timeout, self.__timeout_error)
+        self.__task_run = True
+        return self.__result
+
+    def __result_call(self, results):
         if self.__result is None:
             # If there isn't a result, the task was not run, and the result verification
             # cannot be called yet
             raise TaskNotRunError(self.name)
+        if results is None:
+            results = self.__rows
         try:
-            mutated_args = [self.__result if isinstance(a, TaskResult) else a
-                            for a in self.__result_args]
-            fail_or_success = self.__result_function(*mutated_args,
-                                                     **self.__result_kwargs)
+            mutated_args = [self.__resolve(a, results) for a in self.__result_args]
+            mutated_kwargs = {k: self.__resolve(v, results)
+                              for k, v in self.__result_kwargs.items()}
         except Exception:
             raise ResultFunctionError(self.name)
+        return mutated_args, mutated_kwargs
 
+    def __check_boolean(self, fail_or_success):
         if not isinstance(fail_or_success, bool):
             raise TypeError("The expected Type for the task {} result function"
                             " must be boolean".format(self.name))
         return fail_or_success
 
+    def check_result(self, results=None, executors=None):
+        """
+        If a verification result function was given. Execute it and success
+        if this one return a positive boolean value
+        :param results: <dict> The results of other tasks, by task name, and
+            the feeder rows of the flow, by feeder, to replace the place
+            holders with
+        :param executors: <ExecutorPools> The pools of the run, if the result
+            function is offloaded. Default: the process-wide ones
+        :return:
+        """
+        if not self.__result_function:
+            # If there is not a defined a result function. It is assumed the task
+            # has completed successfully
+            return True
+        args, kwargs = self.__result_call(results)
+        self.verification_attempts = 0
+        error = None
+        for delay in self.__poll_delays():
+            if delay:
+                time.sleep(delay)
+            self.verification_attempts += 1
+            try:
+                if self.__check_once(args, kwargs, executors):
+                    return True
+                error = None
+            except Exception as e:
+                error = e
+        if error is not None:
+            raise error
+        return False
+
+    def __poll_delays(self):
+        return (0,) if self.poll is None else self.poll.delays()
+
+    def __check_once(self, args, kwargs, executors):
+        fail_or_success = self.__call(self.__result_function, args, kwargs,
+                                      ResultFunctionError, self.result_executor,
+                                      executors)
+        return self.__check_boolean(fail_or_success)
+
+    async def check_result_async(self, results=None, executors=None):
+        """
+        The check_result counterpart to be used from an asyncio event loop. If
+        the result function is a coroutine function, it is awaited, unless it
+        is offloaded
+        :param results: <dict> The results of other tasks, by task name, and
+            the feeder rows of the flow, by feeder, to replace the place
+            holders with
+        :param executors: <ExecutorPools> The pools of the run, if the result
+            function is offloaded. Default: the process-wide ones
+        :return:
+        """
+        import asyncio
+        if not self.__result_function:
+            return True
+        args, kwargs = self.__result_call(results)
+        self.verification_attempts = 0
+        error = None
+        for delay in self.__poll_delays():
+            if delay:
+                await asyncio.sleep(delay)
+            self.verification_attempts += 1
+            try:
+                if await self.__check_once_async(args, kwargs, executors):
+                    return True
+                error = None
+            except Exception as e:
+                error = e
+        if error is not None:
+            raise error
+        return False
+
+    async def __check_once_async(self, args, kwargs, executors):
+        fail_or_success = await wait_for(
+            self.__call_async(self.__result_function, args, kwargs,
+                              ResultFunctionError, self.result_executor,
+                              executors),
+            self.timeout, self.__timeout_error)
+        return self.__check_boolean(fail_or_success)
+
     def add_execution_task(self, task_function, args=None, kwargs=None):
         """
         Add a execution task
@@ -200,38 +712,73 @@ class Task(object):
         self.__task_args = cast_to_args(args)
         self.__task_kwargs = cast_to_kwargs(kwargs)
 
-    def add_result_function(self, result_function, args=None, kwargs=None):
+    def add_result_function(self, result_function, args=None, kwargs=None,
+                            poll=None):
         """
         Add a result function to be exectude after the task. The return value
         must be a boolean
         :param result_function: <function>
         :param args: The positional arguments of the function
         :param kwargs: The keyword arguments of the function
+        :param poll: <Polling> If given, the result function is polled until
+            it returns True, even if some attempts raise
         :return: <bool>
         """
         self.__result_function = result_function
         self.__result_args = cast_to_args(args)
         self.__result_kwargs = cast_to_kwargs(kwargs)
+        if poll is not None:
+            self.poll = poll
 
     def copy(self):
         return Task(
             self.name, task_function=self.__task_function, task_args=self.__task_args,
             task_kwargs=self.__task_kwargs, result_function=self.__result_function,
-            result_args=self.__result_args, result_kwargs=self.__result_kwargs
+            result_args=self.__result_args, result_kwargs=self.__result_kwargs,
+            depends_on=self.depends_on, timeout=self.timeout, poll=self.poll,
+            shared=self.shared, ttl=self.ttl, executor=self.executor,
+            result_executor=self.result_executor, shared_key=self.__shared_key
         )
 
 
 class FlowPath(object):
 
-    def __init__(self, task_path):
+    def __init__(self, task_path, parallel=False, timeout=None):
         """
         This is the flow the tasks will follow. A logging will be collected when
         calling the run function
         :param task_path: <list>.<Task>
+        :param parallel: <bool> If True, every task is run as soon as the tasks
+            it depends on have finished, so the independent tasks run
+            concurrently. Otherwise, the tasks are run following the path order
+        :param timeout: <float> Max seconds the whole flow can run. The running
+            tasks are cancelled once it is exceeded, and the flow gets a
+            TIMEOUT status
         """
         self.path = cast_to_args(task_path)
+        self.parallel = parallel
+        self.timeout = timeout
+        # The results of the finished tasks, by task name, and the rows drawn
+        # from the feeders, by feeder
+        self.__results = {}
 
-        self.log = copy.deepcopy(LOG_DICT)
+        self.record = FlowRecord()
+        # If set, the task and flow timings are recorded in it as well
+        self.stats = None
+        # If set, <RunProgress>. It is told about every finished task and flow
+        self.progress = None
+        # If set, <EventHooks>. The lifecycle events are fired on it
+        self.events = None
+        # If set, <SharedResults>. The results of the tasks shared by run
+        self.shared_results = None
+        # If set, <ExecutorPools>. The pools the offloaded functions run in
+        self.executors = None
+        # If set, <Checkpoint>. It is saved after every task which succeeds
+        self.checkpoint = None
+        # The names of the tasks finished by a previous run, which are skipped
+        self.__restored = set()
+        # The results saved to the checkpoint, by task name
+        self.__checkpoint_results = {}
 
     def add_task(self, task):
         """
@@ -244,7 +791,7 @@ class FlowPath(object):
 
     def __check_result(self, task):
         try:
-            fail_or_success = task.check_result()
+            fail_or_success = task.check_result(self.__results, self.executors)
         except Exception as e:
             raise e
 
@@ -254,68 +801,500 @@ class FlowPath(object):
         return fail_or_success
 
     def __run_task(self, task):
+        try:
+            self.__run_and_check(task)
+        finally:
+            if self.progress is not None:
+                self.progress.task_finished(task.name,
+                                            self.record.tasks[task.name])
+
+    def __run_and_check(self, task):
+        events = self.events
+        if events is not None:
+            events.fire(TASK_START, flow_path=self, task=task)
         # First, run the task
-        with task_trace(self.log, task.name):
-            try:
-                task.run()
-            except Exception:
-                raise TaskError(task.name)
+        try:
+            with task_trace(self.record, task.name, self.stats):
+                try:
+                    task.run(self.__results, self.shared_results,
+                             self.executors)
+                except TaskTimeoutError:
+                    raise
+                except Exception:
+                    raise TaskError(task.name)
+                finally:
+                    self.__keep_task_trace(task)
+        finally:
+            if events is not None:
+                events.fire(TASK_END, flow_path=self, task=task,
+                            record=self.record.tasks[task.name])
+        self.__keep_result(task)
         # Then, check the result function returns a True value
-        with verification_trace(self.log, task.name):
-            expected_result = self.__check_result(task)
-            if expected_result:
-                return
-            else:
-                raise RunFailException(task.name)
+        try:
+            with verification_trace(self.record, task.name, self.stats):
+                try:
+                    expected_result = self.__check_result(task)
+                finally:
+                    self.__keep_task_trace(task)
+                if not expected_result:
+                    raise RunFailException(task.name)
+        finally:
+            if events is not None:
+                events.fire(VERIFICATION_END, flow_path=self, task=task,
+                            record=self.record.tasks[task.name])
+
+    def __keep_task_trace(self, task):
+        task_record = self.record.tasks[task.name]
+        task_record.pool_wait_ns = task.pool_wait_ns
+        task_record.queue_wait_ns = task.queue_wait_ns
+        task_record.verification_queue_wait_ns = task.verification_queue_wait_ns
+        task_record.verification_attempts = task.verification_attempts
+        task_record.cache = task.cache_status
+
+    def __keep_result(self, task):
+        result = task.result
+        self.__results[task.name] = (None if isinstance(result, TaskResult)
+                                     else result)
+
+    async def __run_task_async(self, task):
+        try:
+            await self.__run_and_check_async(task)
+        finally:
+            if self.progress is not None:
+                self.progress.task_finished(task.name,
+                                            self.record.tasks[task.name])
+
+    async def __run_and_check_async(self, task):
+        events = self.events
+        if events is not None:
+            events.fire(TASK_START, flow_path=self, task=task)
+        try:
+            with task_trace(self.record, task.name, self.stats):
+                try:
+                    await task.run_async(self.__results, self.shared_results,
+                                         self.executors)
+                except TaskTimeoutError:
+                    raise
+                except Exception:
+                    raise TaskError(task.name)
+                finally:
+                    self.__keep_task_trace(task)
+        finally:
+            if events is not None:
+                events.fire(TASK_END, flow_path=self, task=task,
+                            record=self.record.tasks[task.name])
+        self.__keep_result(task)
+        try:
+            with verification_trace(self.record, task.name, self.stats):
+                try:
+                    expected_result = await task.check_result_async(
+                        self.__results, self.executors)
+                finally:
+                    self.__keep_task_trace(task)
+                if not expected_result:
+                    raise RunFailException(task.name)
+        finally:
+            if events is not None:
+                events.fire(VERIFICATION_END, flow_path=self, task=task,
+                            record=self.record.tasks[task.name])
+
+    def resume(self, state=None):
+        """
+        Skip the tasks finished by a previous run of the flow path, as saved in
+        its checkpoint. Their results and traces are restored. Call it before
+        running the flow path
+        :param state: <dict> The saved state. Default: the one of the
+            checkpoint attribute
+        :return: <list>.<str> The names of the skipped tasks
+        """
+        if state is None and self.checkpoint is not None:
+            state = self.checkpoint.load()
+        if not state:
+            return []
+        results = state["results"]
+        finished = [name for name in state["executed_path"] if name in results]
+        restored = []
+        if self.parallel:
+            # A finished task is skipped if the ones it depends on are as well
+            tasks = {t.name: t for t in self.path}
+            for name in finished:
+                if name in tasks and tasks[name].dependencies <= set(restored):
+                    restored.append(name)
+        else:
+            for task in self.path:
+                if task.name not in finished:
+                    break
+                restored.append(task.name)
+
+        traces = state.get("trace", {}).get("tasks", {})
+        tasks = {t.name: t for t in self.path}
+        for name in restored:
+            tasks[name].result = results[name]
+            self.__results[name] = results[name]
+            self.__checkpoint_results[name] = results[name]
+            task_record = (TaskRecord.from_dict(traces[name]) if name in traces
+                           else TaskRecord())
+            task_record.resumed = True
+            self.record.tasks[name] = task_record
+            self.record.executed_path.append(name)
+        self.__restored = set(restored)
+        return restored
+
+    def __task_done(self, task):
+        self.record.executed_path.append(task.name)
+        if self.checkpoint is None:
+            return
+        self.__checkpoint_results.update(
+            serializable_results(self.__results, [task.name]))
+        self.checkpoint.save({
+            "executed_path": list(self.record.executed_path),
+            "results": self.__checkpoint_results,
+            "trace": self.record.to_dict(),
+        })
+
+    def __finish_checkpoint(self):
+        if self.checkpoint is not None and self.record.status == "SUCCESS":
+            self.checkpoint.remove()
 
     def __compute_log_aggregations(self):
         total_exec_time = total_verif_time = 0
-        for t, values in self.log.get("tasks").items():
-            task_exec_time = values.get("execution_time")
+        for t, task_record in self.record.tasks.items():
+            task_exec_time = task_record.execution_ns
             if task_exec_time:
                 total_exec_time += task_exec_time
-            task_verif_time = values.get("task_verif_time")
+            task_verif_time = task_record.verification_ns
             if task_verif_time:
                 total_verif_time += task_verif_time
-        self.log["total_execution_time"] = total_exec_time
-        self.log["total_verification_time"] = total_verif_time
+        self.record.total_execution_ns = total_exec_time
+        self.record.total_verification_ns = total_verif_time
+
+    @property
+    def log(self):
+        """
+        :return: <dict> The execution log, built from the trace record
+        """
+        return self.record.to_dict()
+
+    def __check_dependencies(self):
+        """
+        Check every dependency is a task of the path, and that there are no
+        cycles. If the path is not run in parallel, every task must come after
+        the tasks it depends on
+        """
+        names = {t.name for t in self.path}
+        for task in self.path:
+            unknown = task.dependencies.difference(names)
+            if unknown:
+                raise TaskDependencyError(task.name, "unknown tasks {}"
+                                          .format(sorted(unknown)))
+        done = set()
+        if not self.parallel:
+            for task in self.path:
+                if not task.dependencies <= done:
+                    raise TaskDependencyError(task.name,
+                                              "they come later in the path")
+                done.add(task.name)
+            return
+        pending = list(self.path)
+        while pending:
+            ready = [t for t in pending if t.dependencies <= done]
+            if not ready:
+                raise TaskDependencyError(pending[0].name, "there is a cycle")
+            for task in ready:
+                pending.remove(task)
+                done.add(task.name)
+
+    def __draw_rows(self):
+        """
+        Draw the row of every feeder the tasks use, so they all get the same
+        one. The rows are kept with the task results, keyed by feeder
+        :return:
+        """
+        for task in self.path:
+            for feeder in task.feeders:
+                if feeder not in self.__results:
+                    self.__results[feeder] = feeder.next_row()
+
+    def __run_in_order(self):
+        for task in self.path:
+            if task.name in self.__restored:
+                continue
+            self.__run_task(task)
+            self.__task_done(task)
+
+    def __run_in_parallel(self):
+        patch_gevent()
+        import gevent
+        import gevent.queue
+        finished = gevent.queue.Queue()
+
+        def _run_and_report(task):
+            try:
+                self.__run_task(task)
+            except Exception as e:
+                finished.put((task, e))
+            else:
+                finished.put((task, None))
+
+        pending = [t for t in self.path if t.name not in self.__restored]
+        running, done = set(), set(self.__restored)
+        jobs = []
+        error = None
+        try:
+            while pending or running:
+                # Once a task has failed, no new tasks are started, but the
+                # running ones are let finish so their traces are complete
+                if error is None:
+                    ready = [t for t in pending if t.dependencies <= done]
+                    for task in ready:
+                        pending.remove(task)
+                        running.add(task.name)
+                        jobs.append(gevent.spawn(_run_and_report, task))
+                if not running:
+                    break
+                task, e = finished.get()
+                running.remove(task.name)
+                if e is None:
+                    done.add(task.name)
+                    self.__task_done(task)
+                elif error is None:
+                    error = e
+        finally:
+            # If the flow is cancelled, so are its running tasks
+            gevent.killall([job for job in jobs if not job.dead])
+        if error is not None:
+            raise error
+
+    async def __run_in_order_async(self):
+        for task in self.path:
+            if task.name in self.__restored:
+                continue
+            await self.__run_task_async(task)
+            self.__task_done(task)
+
+    async def __run_in_parallel_async(self):
+        import asyncio
+        finished = asyncio.Queue()
+
+        async def _run_and_report(task):
+            try:
+                await self.__run_task_async(task)
+            except Exception as e:
+                finished.put_nowait((task, e))
+            else:
+                finished.put_nowait((task, None))
+
+        pending = [t for t in self.path if t.name not in self.__restored]
+        running, done = set(), set(self.__restored)
+        jobs = []
+        error = None
+        try:
+            while pending or running:
+                if error is None:
+                    ready = [t for t in pending if t.dependencies <= done]
+                    for task in ready:
+                        pending.remove(task)
+                        running.add(task.name)
+                        jobs.append(asyncio.ensure_future(_run_and_report(task)))
+                if not running:
+                    break
+                task, e = await finished.get()
+                running.remove(task.name)
+                if e is None:
+                    done.add(task.name)
+                    self.__task_done(task)
+                elif error is None:
+                    error = e
+        finally:
+            cancelled = [job for job in jobs if not job.done()]
+            for job in cancelled:
+                job.cancel()
+            if cancelled:
+                await asyncio.wait(cancelled)
+        if error is not None:
+            raise error
+
+    def __timeout_error(self):
+        return FlowTimeoutError(self.timeout)
+
+    def execute(self):
+        """
+        Run the Flow Path following the order given in the path list, or the
+        task dependencies if it is run in parallel, without converting the trace
+        to the log dictionary
+        :return: <FlowRecord> Returns the execution trace record
+        """
+        self.record.path = [t.name for t in self.path]
+        if self.progress is not None:
+            self.progress.flow_started()
+        if self.events is not None:
+            self.events.fire(FLOW_START, flow_path=self)
+        try:
+            with flow_trace(self.record, self.stats):
+                self.__check_dependencies()
+                self.__draw_rows()
+                with deadline(self.timeout, self.__timeout_error):
+                    if self.parallel:
+                        self.__run_in_parallel()
+                    else:
+                        self.__run_in_order()
+        finally:
+            self.__finish_record()
+        return self.record
 
     def run(self):
         """
         Run the Flow Path following the order given in the path list
         :return: <dict> Returns the execution log
         """
-        self.log["path"] = [t.name for t in self.path]
-        with flow_trace(self.log):
-            for task in self.path:
-                self.__run_task(task)
-                self.log["executed_path"].append(task.name)
+        return self.execute().to_dict()
 
+    async def execute_async(self):
+        """
+        The execute counterpart to be run from an asyncio event loop. The
+        coroutine task and result functions are awaited
+        :return: <FlowRecord> Returns the execution trace record
+        """
+        self.record.path = [t.name for t in self.path]
+        if self.progress is not None:
+            self.progress.flow_started()
+        if self.events is not None:
+            self.events.fire(FLOW_START, flow_path=self)
+        try:
+            with flow_trace(self.record, self.stats):
+                self.__check_dependencies()
+                self.__draw_rows()
+                await wait_for(self.__run_in_parallel_async() if self.parallel
+                               else self.__run_in_order_async(),
+                               self.timeout, self.__timeout_error)
+        finally:
+            self.__finish_record()
+        return self.record
+
+    def __finish_record(self):
+        """
+        Complete the trace once the flow has finished, or has been cancelled
+        :return:
+        """
         self.__compute_log_aggregations()
-        return self.log
+        self.__finish_checkpoint()
+        if self.progress is not None:
+            self.progress.flow_finished(self.record)
+        if self.events is not None:
+            self.events.fire(FLOW_END, flow_path=self, record=self.record)
+
+    async def run_async(self):
+        """
+        Run the Flow Path from an asyncio event loop
+        :return: <dict> Returns the execution log
+        """
+        record = await self.execute_async()
+        return record.to_dict()
 
     def copy(self):
         tasks_copy = [t.copy() for t in self.path]
-        return FlowPath(tasks_copy)
+        return FlowPath(tasks_copy, parallel=self.parallel, timeout=self.timeout)
+
+
+# The code of the FlowPath methods running a task. Their frames hold it in the
+# "task" local, so a stack sample can be attributed to the task it belongs to
+TASK_FRAME_CODES = (FlowPath._FlowPath__run_and_check.__code__,
+                    FlowPath._FlowPath__run_and_check_async.__code__)
 
 
 class ConcurrentFlows(object):
     """
     If you want to run concurrent flows, you can instantiate this class
-    with a dictionary of FlowPath instances
+    with a dictionary of FlowPath instances, or with a flow factory so the
+    flows are only created when they are about to run
     """
-    def __init__(self, flow_dict=None):
+    def __init__(self, flow_dict=None, flow_factory=None, flow_count=None):
+        """
+        :param flow_dict: <dict>.<FlowPath> The flow paths, by flow id
+        :param flow_factory: <function> or <generator>. A function which gets the
+            flow id and returns a new FlowPath, or a generator of FlowPath
+            instances. The flows are created just in time, as the run mode lets
+            them start, and dropped once they have finished. The flow ids are
+            consecutive integers starting at 0
+        :param flow_count: <int> The number of flows to create with the
+            flow_factory. It can be omitted for a finite generator
+        """
+        if flow_dict is not None and flow_factory is not None:
+            raise ValueError("Either a flow_dict or a flow_factory can be given")
+        if callable(flow_factory) and flow_count is None:
+            raise ValueError("A flow_count must be given with a factory function")
         self.flow_list = {} if flow_dict is None else flow_dict
+        self.flow_factory = flow_factory
+        self.flow_count = flow_count
 
+        # Overrides the flows to run, to run a shard of them
+        self.__flow_ids = None
         self.__logs = None
+        self.__keep_logs = True
+        self.__on_flow_end = None
+        self.stats = LatencyStats()
+        # If set, <RunProgress>. Every flow reports its progress to it
+        self.progress = None
+        # If set, <EventHooks>. Every flow fires its lifecycle events on it
+        self.events = None
+        # The results of the tasks shared by run, kept for the run only
+        self.shared_results = SharedResults()
+        # The thread and process pools of the offloaded functions, which are
+        # closed at the end of every run
+        self.executors = ExecutorPools()
+        # The wall time of the last run
+        self.elapsed_ns = None
+        self.__start_ns = None
+        self.__iterations = None
+        self.__deadline = None
+        self.__run_deadline = None
+        # The flows started at an arrival rate run once each
+        self.__open_loop = False
 
     @property
     def logs(self):
+        if self.__logs is None:
+            return None
+        # The records are only converted to log dictionaries when read
+        for fid, log in self.__logs.items():
+            if isinstance(log, FlowRecord):
+                self.__logs[fid] = log.to_dict()
         return self.__logs
 
+    @property
+    def records(self):
+        """
+        :return: <dict> The flow trace records by flow id, or the logs of the
+            flows whose records have already been converted
+        """
+        return self.__logs
+
+    @property
+    def percentiles(self):
+        """
+        :return: <dict> The execution and verification time percentiles by task
+            name, and the flows elapsed time percentiles, in milliseconds
+        """
+        return self.stats.report()
+
+    @property
+    def throughput(self):
+        """
+        :return: <dict> The number of flow iterations run, including the failed
+            ones, the run wall time in seconds, and the iterations per second
+        """
+        iterations = self.stats.flows.count
+        elapsed = None if self.elapsed_ns is None else self.elapsed_ns / 1e9
+        return {
+            "iterations": iterations,
+            "elapsed": elapsed,
+            "iterations_per_second": (iterations / elapsed if elapsed
+                                      else None),
+        }
+
     @logs.setter
     def logs(self, log_list):
-        self.__logs = {ld[0]: ld[1].value for ld in log_list}
+        self.__logs = {ld[0]: ld[1] for ld in log_list}
 
     def add_flow(self, flow_id, flow):
         """
@@ -329,25 +1308,781 @@ class ConcurrentFlows(object):
         else:
             self.flow_list.append(flow)
 
+    def flow_ids(self):
+        """
+        :return: <list> The ids of the flows to run. They are unknown until the
+            flows are created if the flow factory is a generator
+        """
+        if self.__flow_ids is not None:
+            return list(self.__flow_ids)
+        if self.flow_factory is None:
+            return list(self.flow_list)
+        if callable(self.flow_factory):
+            return list(range(self.flow_count))
+        raise InvalidRunOptions("the ids of the flows created by a generator are "
+                                "unknown beforehand")
+
+    def subset(self, flow_ids):
+        """
+        :param flow_ids: <list> Some of the flow ids
+        :return: <ConcurrentFlows> A new instance which only runs the given flows
+        """
+        if self.flow_factory is None:
+            shard = ConcurrentFlows({fid: self.flow_list[fid] for fid in flow_ids})
+        else:
+            shard = ConcurrentFlows(flow_factory=self.flow_factory,
+                                    flow_count=self.flow_count)
+            shard.__flow_ids = list(flow_ids)
+        shard.progress = self.progress
+        shard.events = self.events
+        return shard
+
+    def __iter_flows(self):
+        """
+        :return: <generator> The (flow id, flow path) tuples to run. The flow
+            paths are created as the generator is consumed if there is a factory
+        """
+        if self.flow_factory is None:
+            for fid in (self.flow_list if self.__flow_ids is None
+                        else self.__flow_ids):
+                yield fid, self.flow_list[fid]
+        elif callable(self.flow_factory):
+            for fid in self.flow_ids():
+                yield fid, self.flow_factory(fid)
+        else:
+            fids = (itertools.count() if self.flow_count is None
+                    else range(self.flow_count))
+            for fid, flow_path in zip(fids, self.flow_factory):
+                yield fid, flow_path
+
     def __run_flows_at_once(self):
         """
         Run all the flow path at the same time.
         :return:
         """
-        id_list, path_jobs = [], []
-        for fid, flow_path in self.flow_list.items():
-            id_list.append(fid)
-            path_jobs.append(gevent.spawn(flow_path.run))
-        gevent.joinall(path_jobs)
-        self.logs = zip(id_list, path_jobs)
+        patch_gevent()
+        import gevent.pool
+        flows = list(self.__iter_flows())
+        concurrency = len(flows)
+        path_jobs = gevent.pool.Group()
+        # Pop the flows so they are dropped as soon as they finish
+        flows.reverse()
+        while flows:
+            fid, flow_path = flows.pop()
+            self.__start_flow(path_jobs, fid, flow_path, AT_ONCE_MODE, concurrency)
+        self.__join(path_jobs)
 
-    def run(self, options=None):
+    def __remaining(self, timeout=None):
         """
-        Run all the specified flows according to the passed options. The default
-        running behaviour is to run all the flow Paths at once.
-        :param options:
+        :param timeout: <float> Seconds to wait, or None to wait forever
+        :return: <float> The seconds to wait, shortened to the run deadline
+        """
+        if self.__run_deadline is None:
+            return timeout
+        remaining = max(0, self.__run_deadline - time.monotonic())
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def __join(self, path_jobs):
+        if not path_jobs.join(timeout=self.__remaining()):
+            # Cancel the flows still running once the run timeout is exceeded.
+            # They keep their traces, with a TIMEOUT status, and the
+            # GreenletExit they end with is not raised any further
+            path_jobs.kill()
+
+    def __start_flow(self, path_jobs, fid, flow_path, phase, concurrency,
+                     callback=None):
+        self.__prepare_flow(fid, flow_path, phase, concurrency)
+        path_jobs.spawn(self.__run_flow, fid, flow_path, callback)
+
+    def __prepare_flow(self, fid, flow_path, phase, concurrency):
+        if self.__keep_logs:
+            # Keep the logs in the order the flows are started
+            self.__logs[fid] = None
+        flow_path.stats = self.stats
+        flow_path.progress = self.progress
+        flow_path.events = self.events
+        flow_path.shared_results = self.shared_results
+        flow_path.executors = self.executors
+        self.__pools.update(dict.fromkeys(
+            pool for task in flow_path.path for pool in task.resource_pools))
+        flow_path.record.phase = phase
+        flow_path.record.concurrency = concurrency
+
+    def __finish_flow(self, fid, record):
+        if self.__keep_logs:
+            self.__logs[fid] = record
+        if self.__on_flow_end is not None:
+            self.__on_flow_end(fid, record.to_dict())
+
+    def __slot_done(self, iterations):
+        """
+        :param iterations: <int> The iterations a flow slot has already run
+        :return: <bool> True if the slot must not run any more iterations
+        """
+        if (self.__run_deadline is not None
+                and time.monotonic() >= self.__run_deadline):
+            return True
+        if self.__open_loop and iterations:
+            return True
+        if self.__iterations is None and self.__deadline is None:
+            return iterations >= 1
+        if self.__iterations is not None and iterations >= self.__iterations:
+            return True
+        return self.__deadline is not None and time.monotonic() >= self.__deadline
+
+    def __iterate(self, fid, flow_path):
+        """
+        :return: <generator> The flow path to run on every iteration of the
+            slot. A finished flow path cannot run again, so the following
+            iterations run copies of it, with new tasks
+        """
+        phase, concurrency = flow_path.record.phase, flow_path.record.concurrency
+        iterations = 0
+        while not self.__slot_done(iterations):
+            if iterations:
+                flow_path = flow_path.copy()
+                self.__prepare_flow(fid, flow_path, phase, concurrency)
+            flow_path.record.iteration = iterations
+            yield flow_path
+            iterations += 1
+
+    def __run_flow(self, fid, flow_path, callback=None):
+        try:
+            for iteration in self.__iterate(fid, flow_path):
+                try:
+                    iteration.execute()
+                finally:
+                    # A flow cancelled by the run timeout keeps its trace
+                    self.__finish_flow(fid, iteration.record)
+        finally:
+            if callback is not None:
+                callback()
+
+    async def __run_flow_async(self, fid, flow_path, callback=None):
+        try:
+            for iteration in self.__iterate(fid, flow_path):
+                try:
+                    await iteration.execute_async()
+                finally:
+                    self.__finish_flow(fid, iteration.record)
+        finally:
+            if callback is not None:
+                callback()
+
+    def __run_flows_scheduled(self, concurrency_limit, tick):
+        """
+        Run the flow paths keeping the number of flows in flight under the limit
+        given by the concurrency_limit function. This function is called with the
+        elapsed seconds since the run started, and must return a (phase, limit)
+        tuple, or None if no more flows must be started.
+        :param concurrency_limit: <function>
+        :param tick: <float> Max seconds to wait before checking the limit again
         :return:
         """
-        if not options:
+        patch_gevent()
+        import gevent.event
+        import gevent.pool
+        slot_freed = gevent.event.Event()
+        in_flight = [0]
+
+        def _free_slot():
+            in_flight[0] -= 1
+            slot_freed.set()
+
+        flows = self.__iter_flows()
+        path_jobs = gevent.pool.Group()
+        start = time.monotonic()
+        while True:
+            while True:
+                phase_limit = concurrency_limit(time.monotonic() - start)
+                if phase_limit is None or in_flight[0] < phase_limit[1]:
+                    break
+                if self.__slot_done(0):
+                    break
+                slot_freed.clear()
+                slot_freed.wait(timeout=self.__remaining(tick))
+            if phase_limit is None or self.__slot_done(0):
+                break
+            # The flow is only created once there is a free slot for it
+            fid, flow_path = next(flows, (None, None))
+            if flow_path is None:
+                break
+            phase, limit = phase_limit
+            in_flight[0] += 1
+            self.__start_flow(path_jobs, fid, flow_path, phase, limit,
+                              callback=_free_slot)
+            del flow_path
+        self.__join(path_jobs)
+
+    def __admit_arrival(self, fid, flow_path, intended_ns, in_flight,
+                        max_in_flight, max_lag_ns, late_after_ns):
+        """
+        Account an arrival, and prepare its flow unless it is dropped
+        :param intended_ns: <int> The clock_ns the flow was scheduled at
+        :param in_flight: <int> The number of flows running
+        :return: <bool> True if the flow must be started
+        """
+        lag_ns = max(0, clock_ns() - intended_ns)
+        if ((max_in_flight is not None and in_flight >= max_in_flight)
+                or (max_lag_ns is not None and lag_ns > max_lag_ns)):
+            self.stats.record_dropped_start()
+            return False
+        self.stats.record_start_lag(lag_ns // 1000, late=lag_ns > late_after_ns)
+        self.__prepare_flow(fid, flow_path, ARRIVAL_RATE_MODE, in_flight + 1)
+        flow_path.record.intended_start_ns = intended_ns
+        return True
+
+    def __arrival_wait(self, intended_ns):
+        """
+        :return: <float> The seconds to wait for the next arrival, or None if
+            it is due after the run duration or timeout
+        """
+        intended = intended_ns / 1e9
+        for deadline in (self.__deadline, self.__run_deadline):
+            if deadline is not None and intended >= deadline:
+                return None
+        return max(0, intended - time.monotonic())
+
+    def __run_flows_open_loop(self, next_interval_ns, max_in_flight, max_lag_ns,
+                              late_after_ns):
+        """
+        Start the flow paths at their scheduled arrival times, however many
+        flows are still in flight, so a slow system under test does not slow
+        down the load. A flow is started late if the arrivals outpace the
+        scheduler, and it is dropped if it would be too late or too many flows
+        are in flight
+        :param next_interval_ns: <function> It returns the nanoseconds between
+            an arrival and the next one
+        :param max_in_flight: <int> Drop the arrivals once these many flows are
+            in flight. Never dropped if None
+        :param max_lag_ns: <int> Drop the arrivals which would start later
+            than this after their scheduled time. Never dropped if None
+        :param late_after_ns: <int> The starts later than this are late
+        :return:
+        """
+        patch_gevent()
+        import gevent
+        import gevent.pool
+        in_flight = [0]
+
+        def _free_slot():
+            in_flight[0] -= 1
+
+        flows = self.__iter_flows()
+        path_jobs = gevent.pool.Group()
+        intended_ns = clock_ns()
+        while True:
+            wait = self.__arrival_wait(intended_ns)
+            if wait is None:
+                break
+            if wait:
+                gevent.sleep(wait)
+            fid, flow_path = next(flows, (None, None))
+            if flow_path is None:
+                break
+            if self.__admit_arrival(fid, flow_path, intended_ns, in_flight[0],
+                                    max_in_flight, max_lag_ns, late_after_ns):
+                in_flight[0] += 1
+                path_jobs.spawn(self.__run_flow, fid, flow_path, _free_slot)
+            del flow_path
+            intended_ns += next_interval_ns()
+        self.__join(path_jobs)
+
+    async def __run_flows_open_loop_async(self, next_interval_ns, max_in_flight,
+                                          max_lag_ns, late_after_ns):
+        """
+        The asyncio counterpart of __run_flows_open_loop
+        """
+        import asyncio
+        in_flight = [0]
+
+        def _free_slot():
+            in_flight[0] -= 1
+
+        flows = self.__iter_flows()
+        path_jobs = set()
+        intended_ns = clock_ns()
+        while True:
+            wait = self.__arrival_wait(intended_ns)
+            if wait is None:
+                break
+            if wait:
+                await asyncio.sleep(wait)
+            fid, flow_path = next(flows, (None, None))
+            if flow_path is None:
+                break
+            if self.__admit_arrival(fid, flow_path, intended_ns, in_flight[0],
+                                    max_in_flight, max_lag_ns, late_after_ns):
+                in_flight[0] += 1
+                job = asyncio.ensure_future(
+                    self.__run_flow_async(fid, flow_path, callback=_free_slot))
+                path_jobs.add(job)
+                job.add_done_callback(path_jobs.discard)
+            del flow_path
+            intended_ns += next_interval_ns()
+        await self.__join_async(set(path_jobs))
+
+    async def __run_flows_at_once_async(self):
+        import asyncio
+        flows = list(self.__iter_flows())
+        concurrency = len(flows)
+        path_jobs = []
+        flows.reverse()
+        while flows:
+            fid, flow_path = flows.pop()
+            self.__prepare_flow(fid, flow_path, AT_ONCE_MODE, concurrency)
+            path_jobs.append(asyncio.ensure_future(
+                self.__run_flow_async(fid, flow_path)))
+        await self.__join_async(path_jobs)
+
+    async def __join_async(self, path_jobs):
+        import asyncio
+        if not path_jobs:
+            return
+        _, running = await asyncio.wait(path_jobs, timeout=self.__remaining())
+        if running:
+            for job in running:
+                job.cancel()
+            # The flows end cancelled, which asyncio.wait does not raise
+            await asyncio.wait(running)
+
+    async def __run_flows_scheduled_async(self, concurrency_limit, tick):
+        """
+        The asyncio counterpart of __run_flows_scheduled
+        """
+        import asyncio
+        slot_freed = asyncio.Event()
+        in_flight = [0]
+
+        def _free_slot():
+            in_flight[0] -= 1
+            slot_freed.set()
+
+        flows = self.__iter_flows()
+        path_jobs = set()
+        start = time.monotonic()
+        while True:
+            while True:
+                phase_limit = concurrency_limit(time.monotonic() - start)
+                if phase_limit is None or in_flight[0] < phase_limit[1]:
+                    break
+                if self.__slot_done(0):
+                    break
+                slot_freed.clear()
+                try:
+                    await asyncio.wait_for(slot_freed.wait(),
+                                           self.__remaining(tick))
+                except asyncio.TimeoutError:
+                    pass
+            if phase_limit is None or self.__slot_done(0):
+                break
+            fid, flow_path = next(flows, (None, None))
+            if flow_path is None:
+                break
+            phase, limit = phase_limit
+            in_flight[0] += 1
+            self.__prepare_flow(fid, flow_path, phase, limit)
+            job = asyncio.ensure_future(
+                self.__run_flow_async(fid, flow_path, callback=_free_slot))
+            # Forget the finished jobs, so their flows can be dropped
+            path_jobs.add(job)
+            job.add_done_callback(path_jobs.discard)
+            del flow_path
+        await self.__join_async(set(path_jobs))
+
+    @staticmethod
+    def __pool_limit(options):
+        """
+        Run the flow paths using a fixed size worker pool. No more than
+        "pool_size" flows will be in flight at the same time
+        :param options: <dict>
+        :return: <tuple> The concurrency limit function and tick
+        """
+        pool_size = options.get("pool_size")
+        if not isinstance(pool_size, int) or pool_size < 1:
+            raise InvalidRunOptions("pool_size must be a positive integer")
+        return (lambda elapsed: (POOL_MODE, pool_size)), None
+
+    @staticmethod
+    def __ramp_up_limit(options):
+        """
+        Increase the number of flows in flight from "start_concurrency" to
+        "max_concurrency" along "ramp_time" seconds, and then hold the max
+        concurrency until every flow has been run, or "hold_time" seconds have
+        elapsed. If "steps" is given, the concurrency is increased in that
+        number of equal steps instead of linearly
+        :param options: <dict>
+        :return: <tuple> The concurrency limit function and tick
+        """
+        max_concurrency = options.get("max_concurrency")
+        if not isinstance(max_concurrency, int) or max_concurrency < 1:
+            raise InvalidRunOptions("max_concurrency must be a positive integer")
+        start_concurrency = options.get("start_concurrency", 1)
+        if (not isinstance(start_concurrency, int)
+                or not 1 <= start_concurrency <= max_concurrency):
+            raise InvalidRunOptions("start_concurrency must be an integer between "
+                                    "1 and max_concurrency")
+        ramp_time = options.get("ramp_time", 0)
+        if ramp_time < 0:
+            raise InvalidRunOptions("ramp_time cannot be negative")
+        steps = options.get("steps")
+        if steps is not None and (not isinstance(steps, int) or steps < 1):
+            raise InvalidRunOptions("steps must be a positive integer")
+        hold_time = options.get("hold_time")
+
+        increment = max_concurrency - start_concurrency
+        # The limit changes once per step, or once per added flow when linear
+        tick = ramp_time / (steps or max(increment, 1)) or hold_time
+
+        def _concurrency_limit(elapsed):
+            if elapsed >= ramp_time:
+                if hold_time is not None and elapsed >= ramp_time + hold_time:
+                    return None
+                return HOLD_PHASE, max_concurrency
+            progress = elapsed / ramp_time
+            if steps:
+                progress = int(progress * steps) / steps
+            return RAMP_UP_PHASE, start_concurrency + int(increment * progress)
+
+        return _concurrency_limit, tick
+
+    @staticmethod
+    def __arrival_schedule(options):
+        """
+        Start the flows at "rate" flows per second, whatever the number of
+        flows in flight. The "arrivals" are either "constant", evenly spaced,
+        or "poisson", with exponentially distributed gaps. The flows which
+        would be started more than "max_lag" seconds late, or while
+        "max_in_flight" flows are running, are dropped
+        :param options: <dict>
+        :return: <tuple> The arguments of __run_flows_open_loop
+        """
+        import random
+        rate = options.get("rate")
+        if not isinstance(rate, (int, float)) or rate <= 0:
+            raise InvalidRunOptions("rate must be a positive number")
+        if options.get("iterations") is not None:
+            raise InvalidRunOptions("every flow started at an arrival rate runs "
+                                    "once, so iterations cannot be given")
+        arrivals = options.get("arrivals", CONSTANT_ARRIVALS)
+        interval_ns = 1e9 / rate
+        if arrivals == CONSTANT_ARRIVALS:
+            next_interval_ns = (lambda: interval_ns)
+        elif arrivals == POISSON_ARRIVALS:
+            next_interval_ns = (lambda: random.expovariate(rate) * 1e9)
+        else:
+            raise InvalidRunOptions("unknown arrivals {}".format(arrivals))
+        max_in_flight = options.get("max_in_flight")
+        if max_in_flight is not None and (not isinstance(max_in_flight, int)
+                                          or max_in_flight < 1):
+            raise InvalidRunOptions("max_in_flight must be a positive integer")
+        max_lag = options.get("max_lag")
+        if max_lag is not None and max_lag < 0:
+            raise InvalidRunOptions("max_lag cannot be negative")
+        # A start is late once the next arrival is due
+        return (next_interval_ns, max_in_flight,
+                None if max_lag is None else max_lag * 1e9, interval_ns)
+
+    def __concurrency_limit(self, mode, options):
+        if mode == POOL_MODE:
+            return self.__pool_limit(options)
+        return self.__ramp_up_limit(options)
+
+    def __run_flows_multiprocess(self, options):
+        """
+        Shard the flow paths across "processes" forked worker processes. Each
+        worker runs its shard with its own gevent hub, following the rest of the
+        options, so any concurrency limit applies per process, but the arrival
+        rate and max flows in flight are split among them. The logs are
+        sent back to this process and merged keeping the flow ids. If a worker
+        fails or dies, the run raises a ShardError once every worker is done
+        :param options: <dict>
+        :return:
+        """
+        import multiprocessing
+        processes = options.get("processes")
+        if not isinstance(processes, int) or processes < 1:
+            raise InvalidRunOptions("processes must be a positive integer")
+        # Every worker process runs its own gevent hub
+        patch_gevent()
+        try:
+            context = multiprocessing.get_context("fork")
+        except ValueError:
+            raise InvalidRunOptions("the multi-process backend needs the fork "
+                                    "start method")
+        worker_options = {k: v for k, v in options.items() if k != "processes"}
+        id_list = self.flow_ids()
+        shards = [id_list[i::processes] for i in range(processes)]
+
+        workers = []
+        for index, shard in enumerate(shards):
+            if not shard:
+                continue
+            reader, writer = context.Pipe(duplex=False)
+            worker = context.Process(target=self.__run_shard, args=(
+                shard, shard_options(worker_options, index, processes,
+                                     len(id_list)),
+                (index, processes), writer))
+            worker.start()
+            writer.close()
+            workers.append((worker, reader))
+
+        shard_logs = {}
+        try:
+            for worker, reader in workers:
+                logs, stats = self.__receive_shard(worker, reader)
+                if self.progress is not None:
+                    # The worker processes progress is only known as they finish
+                    self.progress.add_records(logs.values())
+                if self.__keep_logs:
+                    shard_logs.update(logs)
+                if self.__on_flow_end is not None:
+                    for fid, record in logs.items():
+                        self.__on_flow_end(fid, record.to_dict())
+                self.stats.merge(stats)
+        except BaseException:
+            # The run has failed, so the other shards are not awaited
+            for worker, _ in workers:
+                if worker.is_alive():
+                    worker.terminate()
+            raise
+        finally:
+            for worker, reader in workers:
+                reader.close()
+                worker.join()
+        if self.__keep_logs:
+            self.__logs = {fid: shard_logs[fid] for fid in id_list
+                           if fid in shard_logs}
+
+    @staticmethod
+    def __receive_shard(worker, reader):
+        """
+        :return: <tuple> The flow records and the stats of the worker shard
+        """
+        import gevent.socket
+        # Do not block the hub while the worker is running
+        gevent.socket.wait_read(reader.fileno())
+        try:
+            error, shard = reader.recv()
+        except EOFError:
+            worker.join()
+            raise ShardError(worker.pid, "exited with code {} before sending "
+                                         "its logs".format(worker.exitcode))
+        if error is not None:
+            raise ShardError(worker.pid, "failed:\n{}".format(error))
+        return shard
+
+    def __run_shard(self, shard, options, partition, writer):
+        """
+        Run a shard in the worker process, and send back either the error
+        traceback, or the flow records and stats
+        :param partition: <tuple> The shard index and the number of shards,
+            which select the feeder rows of the shard
+        """
+        partition_feeders(*partition)
+        shard_flows = self.subset(shard)
+        # The parent process accounts the progress once the shard is back
+        shard_flows.progress = None
+        try:
+            result = None, (shard_flows.execute(options), shard_flows.stats)
+        except Exception:
+            result = traceback.format_exc(), None
+        finally:
+            # Tear down the pooled resources the worker process has created
+            close_pools()
+        writer.send(result)
+        writer.close()
+
+    def __start_run(self, options, on_flow_end, keep_logs):
+        """
+        Reset the run state and validate the options
+        :return: <tuple> The run mode and backend
+        """
+        self.stats = LatencyStats()
+        self.shared_results = SharedResults()
+        self.executors = self.__executor_pools(options or {})
+        # The resource pools used by the flows run, in a dict to keep them once
+        self.__pools = {}
+        self.__logs = {}
+        self.__keep_logs = keep_logs
+        self.__on_flow_end = on_flow_end
+        self.__start_ns = clock_ns()
+        self.__iterations, self.__deadline = self.__soak_limits(options or {})
+        self.__run_deadline = self.__run_timeout_deadline(options or {})
+        mode = (options or {}).get("mode", AT_ONCE_MODE)
+        if mode not in (AT_ONCE_MODE, POOL_MODE, RAMP_UP_MODE, ARRIVAL_RATE_MODE):
+            raise InvalidRunOptions("unknown mode {}".format(mode))
+        self.__open_loop = mode == ARRIVAL_RATE_MODE
+        backend = (options or {}).get("backend", GEVENT_BACKEND)
+        if backend not in (GEVENT_BACKEND, ASYNCIO_BACKEND):
+            raise InvalidRunOptions("unknown backend {}".format(backend))
+        return mode, backend
+
+    @staticmethod
+    def __soak_limits(options):
+        """
+        :param options: <dict>
+        :return: <tuple> The iterations per flow slot and the monotonic
+            deadline of the run. Each one is None if not limited
+        """
+        iterations = options.get("iterations")
+        if iterations is not None and (not isinstance(iterations, int)
+                                       or iterations < 1):
+            raise InvalidRunOptions("iterations must be a positive integer")
+        duration = options.get("duration")
+        if duration is not None and (not isinstance(duration, (int, float))
+                                     or duration <= 0):
+            raise InvalidRunOptions("duration must be a positive number")
+        deadline = None if duration is None else time.monotonic() + duration
+        return iterations, deadline
+
+    @staticmethod
+    def __run_timeout_deadline(options):
+        """
+        :param options: <dict>
+        :return: <float> The monotonic time the run must finish at, or None
+        """
+        timeout = options.get("timeout")
+        if timeout is None:
+            return None
+        if not isinstance(timeout, (int, float)) or timeout <= 0:
+            raise InvalidRunOptions("timeout must be a positive number")
+        return time.monotonic() + timeout
+
+    @staticmethod
+    def __executor_pools(options):
+        """
+        :param options: <dict>
+        :return: <ExecutorPools> The pools the offloaded functions of the run
+            run in
+        """
+        sizes = {"thread_pool_size": DEFAULT_THREAD_POOL_SIZE,
+                 "process_pool_size": None}
+        for key in sizes:
+            size = options.get(key, sizes[key])
+            if size is not None and (not isinstance(size, int) or size < 1):
+                raise InvalidRunOptions("{} must be a positive integer"
+                                        .format(key))
+            sizes[key] = size
+        return ExecutorPools(**sizes)
+
+    def __finish_run(self):
+        self.elapsed_ns = clock_ns() - self.__start_ns
+        self.executors.close()
+        for pool in self.__pools:
+            pool.close_idle()
+        # Drop the flows whose greenlet died before recording their trace
+        self.__logs = {fid: record for fid, record in self.__logs.items()
+                       if record is not None}
+        return self.records
+
+    async def __run_flows_async(self, mode, options):
+        if mode == AT_ONCE_MODE:
+            await self.__run_flows_at_once_async()
+        elif mode == ARRIVAL_RATE_MODE:
+            await self.__run_flows_open_loop_async(
+                *self.__arrival_schedule(options))
+        else:
+            await self.__run_flows_scheduled_async(
+                *self.__concurrency_limit(mode, options))
+
+    def execute(self, options=None, on_flow_end=None, keep_logs=True):
+        """
+        Run the flows as the run method does, without converting the traces to
+        the log dictionaries
+        :return: <dict>.<FlowRecord> The flow trace records, by flow id
+        """
+        mode, backend = self.__start_run(options, on_flow_end, keep_logs)
+        if (options or {}).get("processes") is not None:
+            self.__run_flows_multiprocess(options)
+        elif backend == ASYNCIO_BACKEND:
+            import asyncio
+            asyncio.run(self.__run_flows_async(mode, options))
+        elif mode == AT_ONCE_MODE:
             self.__run_flows_at_once()
+        elif mode == ARRIVAL_RATE_MODE:
+            self.__run_flows_open_loop(*self.__arrival_schedule(options))
+        else:
+            self.__run_flows_scheduled(*self.__concurrency_limit(mode, options))
+        return self.__finish_run()
+
+    async def execute_async(self, options=None, on_flow_end=None, keep_logs=True):
+        """
+        The execute counterpart to be awaited from a running asyncio event loop.
+        The flows are always run with the asyncio backend
+        :return: <dict>.<FlowRecord> The flow trace records, by flow id
+        """
+        mode, _ = self.__start_run(options, on_flow_end, keep_logs)
+        if (options or {}).get("processes") is not None:
+            raise InvalidRunOptions("the flows cannot be sharded across processes "
+                                    "from a running event loop")
+        await self.__run_flows_async(mode, options)
+        return self.__finish_run()
+
+    def run(self, options=None, on_flow_end=None, keep_logs=True):
+        """
+        Run all the specified flows according to the passed options. The default
+        running behaviour is to run all the flow Paths at once.
+        :param options: <dict> The "mode" key selects how the flows are run:
+            * "at_once": Every flow path is run at the same time (default)
+            * "pool": At most "pool_size" flows are run at the same time
+            * "ramp_up": The number of flows run at the same time grows from
+                "start_concurrency" (default 1) to "max_concurrency" along
+                "ramp_time" seconds, linearly or in a given number of "steps".
+                Then, that concurrency is held until every flow has run or
+                "hold_time" seconds have elapsed
+            * "arrival_rate": The flows are started at "rate" flows per second,
+                however many are still in flight, with "constant" (default) or
+                "poisson" "arrivals", until every flow has run or "duration"
+                seconds have elapsed. Every flow runs once. The flow latencies
+                are measured from the time each flow was scheduled at, so a
+                late start is accounted in them, and the percentiles report
+                the start lag and the number of late starts. The flows which
+                would start "max_lag" seconds late, or while "max_in_flight"
+                flows are running, are dropped and counted
+            Each flow log records the "phase" it was run in and the "concurrency"
+            limit at the time it was started.
+            The flows are soak tested if "iterations" or "duration" is given:
+            each flow slot runs its flow path again and again, up to
+            "iterations" times, or until "duration" seconds have elapsed since
+            the run started. Every iteration runs a copy of the flow path, and
+            no new slot starts after the duration. The flow log is the last
+            iteration one, and on_flow_end gets every iteration log. Every
+            iteration is aggregated in the percentiles and throughput
+            properties.
+            The task and result functions offloaded to a "thread" or "process"
+            executor share pools of "thread_pool_size" threads (default 10)
+            and "process_pool_size" worker processes (default the number of
+            CPUs), created for the run.
+            If "timeout" is given, no flow is started after that many seconds,
+            and the flows still running are cancelled. They keep their logs,
+            with a TIMEOUT status. If "processes" is given, the flows
+            are sharded across that number of worker processes, each one
+            running its shard with the selected mode. The "rate" is split
+            among them in proportion to their shard, and "max_in_flight",
+            which cannot be lower than "processes", evenly.
+            The "backend" key selects the execution engine:
+            * "gevent": Every flow runs in a greenlet (default)
+            * "asyncio": Every flow runs as an asyncio task, and the coroutine
+                task and result functions are awaited. The plain functions are
+                called directly, so they must not block the event loop
+            The task and flow timings are aggregated in the percentiles property
+        :param on_flow_end: <function> If given, it is called with the flow id and
+            the flow log as soon as each flow finishes, e.g. to stream the logs.
+            When the flows are sharded across processes, it is called as each
+            shard finishes
+        :param keep_logs: <bool> If False, the flow logs are not kept once
+            the on_flow_end function has got them, so the memory used by the run
+            does not grow with the number of flows
+        :return: <dict> The flow logs, by flow id
+        """
+        self.execute(options, on_flow_end, keep_logs)
+        return self.logs
+
+    async def run_async(self, options=None, on_flow_end=None, keep_logs=True):
+        """
+        The run counterpart to be awaited from a running asyncio event loop
+        :return: <dict> The flow logs, by flow id
+        """
+        await self.execute_async(options, on_flow_end, keep_logs)
         return self.logs
@@ -0,0 +1,256 @@
+"""
+    Master/worker distributed execution. The design follows the locust one:
+    the master and every worker load the same flowfile. The master hands out
+    slices of each ConcurrentFlows to the connected workers, and merges their
+    logs back into the same output an in-process run produces.
+
+    The messages are JSON lines sent over a TCP socket, or over a Unix socket
+    when the host is given as "unix:<path>"
+"""
+import json
+import logging
+import socket
+import time
+
+from .core import deadline, patch_gevent, shard_options
+from .feeders import partition_feeders
+from .helpers import clock_ns
+from .histogram import LatencyStats
+
+DEFAULT_MASTER_HOST = "127.0.0.1"
+DEFAULT_MASTER_PORT = 5557
+DEFAULT_ACCEPT_TIMEOUT = 60
+
+UNIX_PREFIX = "unix:"
+
+logger = logging.getLogger(__name__)
+
+
+class DistributedError(Exception):
+    def __init__(self, reason):
+        super().__init__("Distributed run failed: {}!!".format(reason))
+
+
+class Connection(object):
+    """
+    A JSON lines message channel over a connected socket
+    """
+    def __init__(self, sock):
+        self.sock = sock
+        self.__reader = sock.makefile("rb")
+
+    def send(self, message):
+        self.sock.sendall(json.dumps(message).encode() + b"\n")
+
+    def recv(self):
+        line = self.__reader.readline()
+        if not line:
+            raise DistributedError("connection closed by peer")
+        return json.loads(line.decode())
+
+    def close(self):
+        self.__reader.close()
+        self.sock.close()
+
+
+def _socket_address(host, port):
+    if host.startswith(UNIX_PREFIX):
+        return socket.AF_UNIX, host[len(UNIX_PREFIX):]
+    return socket.AF_INET, (host, port)
+
+
+class MasterRunner(object):
+
+    def __init__(self, flowpaths, concurrent_flows, host=DEFAULT_MASTER_HOST,
+                 port=DEFAULT_MASTER_PORT, expect_workers=1,
+                 accept_timeout=DEFAULT_ACCEPT_TIMEOUT):
+        """
+        Distribute the flowfile targets among the workers. The ConcurrentFlows
+        flows are split in as many slices as workers, while every FlowPath is run
+        by a single worker, one after another, as an in-process run would do
+        :param flowpaths: <dict> The FlowPath instances, by name
+        :param concurrent_flows: <dict> The ConcurrentFlows instances, by name
+        :param host: <str> The address to listen on
+        :param port: <int> The TCP port to listen on. Use 0 to get any free one
+        :param expect_workers: <int> The number of workers to wait for
+        :param accept_timeout: <float> Max seconds to wait for the workers to
+            connect. The run fails if they have not by then. Forever if None
+        """
+        if not isinstance(expect_workers, int) or expect_workers < 1:
+            raise ValueError("expect_workers must be a positive integer")
+        self.flowpaths = flowpaths
+        self.concurrent_flows = concurrent_flows
+        self.expect_workers = expect_workers
+        self.accept_timeout = accept_timeout
+
+        patch_gevent()
+        family, address = _socket_address(host, port)
+        self.server = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(address)
+        self.server.listen(expect_workers)
+
+        self.workers = []
+
+    @property
+    def address(self):
+        return self.server.getsockname()
+
+    def __accept_timeout_error(self):
+        return DistributedError(
+            "only {} of the {} workers connected within {} seconds".format(
+                len(self.workers), self.expect_workers, self.accept_timeout))
+
+    def __accept_workers(self):
+        with deadline(self.accept_timeout, self.__accept_timeout_error):
+            self.__accept_every_worker()
+
+    def __accept_every_worker(self):
+        while len(self.workers) < self.expect_workers:
+            sock, _ = self.server.accept()
+            connection = Connection(sock)
+            message = connection.recv()
+            if message.get("type") != "hello":
+                connection.close()
+                continue
+            self.workers.append(connection)
+            logger.info("Worker connected ({}/{})".format(len(self.workers),
+                                                          self.expect_workers))
+
+    @staticmethod
+    def __request(connection, message):
+        connection.send(message)
+        reply = connection.recv()
+        if reply.get("type") == "error":
+            raise DistributedError(reply.get("message"))
+        return reply
+
+    def __run_concurrent_flows(self, name, obj):
+        import gevent
+        flow_ids = obj.flow_ids()
+        indexes = list(range(len(flow_ids)))
+        worker_no = len(self.workers)
+        start_ns = clock_ns()
+        jobs = [gevent.spawn(self.__request, connection,
+                             {"type": "run", "target": name,
+                              "indexes": indexes[i::worker_no],
+                              "flow_count": len(indexes),
+                              "partition": [i, worker_no]})
+                for i, connection in enumerate(self.workers)]
+        gevent.joinall(jobs, raise_error=True)
+        obj.elapsed_ns = clock_ns() - start_ns
+
+        obj.stats = LatencyStats()
+        for job in jobs:
+            obj.stats.merge(LatencyStats.from_state(job.value["stats"]))
+        shard_logs = dict(log for job in jobs for log in job.value["logs"])
+        obj.logs = [(flow_ids[i], shard_logs[i]) for i in indexes
+                    if i in shard_logs]
+        return obj.logs
+
+    def run(self):
+        """
+        Wait for the expected workers, run every target on them and return the
+        merged logs, by target name
+        :return: <dict>
+        """
+        out_dict = {}
+        try:
+            self.__accept_workers()
+            for name, obj in self.concurrent_flows.items():
+                logger.info("Distributing execution of Concurrent Flows {}"
+                            .format(name))
+                out_dict[name] = self.__run_concurrent_flows(name, obj)
+
+            for i, name in enumerate(self.flowpaths):
+                logger.info("Distributing execution of Flow Path {}".format(name))
+                connection = self.workers[i % len(self.workers)]
+                out_dict[name] = self.__request(
+                    connection, {"type": "run", "target": name})["logs"]
+        finally:
+            self.close()
+        return out_dict
+
+    def close(self):
+        for connection in self.workers:
+            try:
+                connection.send({"type": "quit"})
+            except OSError:
+                pass
+            connection.close()
+        self.server.close()
+
+
+class WorkerRunner(object):
+
+    def __init__(self, flowpaths, concurrent_flows, host=DEFAULT_MASTER_HOST,
+                 port=DEFAULT_MASTER_PORT, connect_timeout=10, run_options=None):
+        """
+        Run the targets slices the master hands out, until it says to quit
+        :param flowpaths: <dict> The FlowPath instances, by name
+        :param concurrent_flows: <dict> The ConcurrentFlows instances, by name
+        :param host: <str> The master address
+        :param port: <int> The master TCP port
+        :param connect_timeout: <float> Seconds to keep retrying the connection
+            to a master which is not listening yet
+        :param run_options: <dict> The options to run the ConcurrentFlows slices
+            with (see ConcurrentFlows.run)
+        """
+        self.flowpaths = flowpaths
+        self.concurrent_flows = concurrent_flows
+        self.host = host
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.run_options = run_options
+
+    def __connect(self):
+        import gevent
+        family, address = _socket_address(self.host, self.port)
+        connect_deadline = time.monotonic() + self.connect_timeout
+        while True:
+            sock = socket.socket(family, socket.SOCK_STREAM)
+            try:
+                sock.connect(address)
+                return Connection(sock)
+            except OSError:
+                sock.close()
+                if time.monotonic() >= connect_deadline:
+                    raise DistributedError("could not connect to the master")
+                gevent.sleep(0.1)
+
+    def __run_target(self, message):
+        name = message["target"]
+        if name in self.flowpaths:
+            return {"logs": self.flowpaths[name].run()}
+        obj = self.concurrent_flows[name]
+        flow_ids = obj.flow_ids()
+        indexes = {flow_ids[i]: i for i in message["indexes"]}
+        # Every worker draws the feeder rows of its own partition
+        partition_feeders(*message["partition"])
+        shard = obj.subset(list(indexes))
+        # The workers split the arrival rate of the run, by their flows
+        options = shard_options(self.run_options, *message["partition"],
+                                message["flow_count"])
+        logs = [(indexes[fid], log)
+                for fid, log in shard.run(options).items()]
+        return {"logs": logs, "stats": shard.stats.to_state()}
+
+    def run(self):
+        patch_gevent()
+        connection = self.__connect()
+        try:
+            connection.send({"type": "hello"})
+            while True:
+                message = connection.recv()
+                if message.get("type") == "quit":
+                    break
+                try:
+                    result = self.__run_target(message)
+                except Exception as e:
+                    connection.send({"type": "error", "message": repr(e)})
+                else:
+                    result["type"] = "result"
+                    connection.send(result)
+        finally:
+            connection.close()
@@ -0,0 +1,55 @@
+"""
+    Lifecycle hooks of the runs. Listeners are registered on an EventHooks
+    instance, which is set as the events attribute of the FlowPath and
+    ConcurrentFlows instances to follow. Nothing is fired when no EventHooks is
+    set, so the runs do not pay for the hooks unless they are used.
+
+    The listeners are called with keyword arguments:
+
+    * flow_start: flow_path
+    * flow_end: flow_path, record (the FlowRecord, with the flow timings)
+    * task_start: flow_path, task
+    * task_end: flow_path, task, record (the TaskRecord). The task result is
+        task.result
+    * verification_end: flow_path, task, record (the TaskRecord)
+"""
+import traceback
+
+FLOW_START = "flow_start"
+FLOW_END = "flow_end"
+TASK_START = "task_start"
+TASK_END = "task_end"
+VERIFICATION_END = "verification_end"
+
+EVENTS = (FLOW_START, FLOW_END, TASK_START, TASK_END, VERIFICATION_END)
+
+
+class EventHooks(object):
+
+    def __init__(self):
+        self.__listeners = {}
+
+    def add_listener(self, event, listener):
+        """
+        :param event: <str> One of the EVENTS
+        :param listener: <function> Called with the event keyword arguments
+        :return:
+        """
+        if event not in EVENTS:
+            raise ValueError("Unknown event {}".format(event))
+        self.__listeners.setdefault(event, []).append(listener)
+
+    def remove_listener(self, event, listener):
+        self.__listeners.get(event, []).remove(listener)
+
+    def fire(self, event, **payload):
+        """
+        Call the event listeners. A failing listener does not stop the run
+        :param event: <str>
+        :return:
+        """
+        for listener in self.__listeners.get(event, ()):
+            try:
+                listener(**payload)
+            except Exception:
+                traceback.print_exc()
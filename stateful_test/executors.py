@@ -0,0 +1,326 @@
+"""
+    Executors the task and result functions run in. By default, they run in
+    the greenlet (or asyncio task) of their flow, which suits the functions
+    waiting on the network, but a function which blocks without yielding, e.g.
+    a C extension call or a CPU bound computation, stalls every other flow of
+    the hub while it runs. Such a function can be offloaded instead to:
+
+    * thread: a pool of native threads, for the blocking calls which release
+      the GIL, e.g. file or legacy client I/O
+    * process: a pool of forked worker processes, for the CPU bound work. The
+      function, its arguments and its result are sent through pipes, so they
+      must be picklable: the function must be defined at the top level of a
+      module or flowfile
+
+    The pools are bounded and shared by every flow of a ConcurrentFlows run,
+    which creates them as the run starts and closes them as it ends. An
+    offloaded function waits in the queue until a worker is free, and that
+    wait is recorded in the task trace apart from the execution and
+    verification times, which include it, while the net execution and
+    verification times leave it out. The hub, or the event loop, keeps running
+    the other flows meanwhile. A timed out function cannot be interrupted in a
+    thread, so its result is dropped when it finishes, while a worker process
+    running it is killed and replaced.
+"""
+import os
+import sys
+
+from .helpers import clock_ns
+from .resources import ResourcePool
+
+GREENLET_EXECUTOR = "greenlet"
+THREAD_EXECUTOR = "thread"
+PROCESS_EXECUTOR = "process"
+EXECUTORS = (GREENLET_EXECUTOR, THREAD_EXECUTOR, PROCESS_EXECUTOR)
+
+DEFAULT_THREAD_POOL_SIZE = 10
+
+
+class WorkerProcessError(Exception):
+    def __init__(self, pid, reason):
+        super().__init__("The worker process {} {}!!".format(pid, reason))
+
+
+def _threading_patched():
+    if "gevent" not in sys.modules:
+        return False
+    from gevent import monkey
+    return monkey.is_module_patched("threading")
+
+
+def _timed_call(function, args, kwargs):
+    """
+    :return: <tuple> The clock_ns the function started at, whether it
+        succeeded, and its result or the exception it raised
+    """
+    start_ns = clock_ns()
+    try:
+        return start_ns, True, function(*args, **kwargs)
+    except Exception as e:
+        return start_ns, False, e
+
+
+def _resolve(future, async_result):
+    """
+    Pass the outcome of a gevent AsyncResult on to an asyncio future
+    """
+    if future.done():
+        return
+    if async_result.successful():
+        future.set_result(async_result.value)
+    else:
+        future.set_exception(async_result.exception)
+
+
+def _serve(requests, responses, inherited):
+    """
+    The loop of a worker process: run every function received, one at a time,
+    until it gets None
+    """
+    for connection in inherited:
+        connection.close()
+    if "gevent" in sys.modules:
+        # The greenlets inherited from the parent process must never run here,
+        # so the functions which yield get a hub of their own
+        from gevent.hub import Hub, set_hub
+        set_hub(Hub(default=False))
+    while True:
+        try:
+            request = requests.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        start_ns, succeeded, value = _timed_call(*request)
+        try:
+            responses.send((start_ns, succeeded, value))
+        except Exception as e:
+            responses.send((start_ns, False, WorkerProcessError(
+                os.getpid(),
+                "could not send back the result: {!r}".format(e))))
+
+
+class _ProcessWorker(object):
+    """
+    A forked worker process, started on demand, and its pipes
+    """
+    def __init__(self):
+        self.process = None
+        self.__requests = None
+        self.__responses = None
+
+    def fileno(self):
+        return self.__responses.fileno()
+
+    def start(self):
+        import multiprocessing
+        context = multiprocessing.get_context("fork")
+        requests, self.__requests = context.Pipe(duplex=False)
+        self.__responses, responses = context.Pipe(duplex=False)
+        self.process = context.Process(
+            target=_serve, daemon=True,
+            args=(requests, responses, (self.__requests, self.__responses)))
+        self.process.start()
+        requests.close()
+        responses.close()
+
+    def send(self, function, args, kwargs):
+        if self.process is None:
+            self.start()
+        self.__requests.send((function, args, kwargs))
+
+    def receive(self):
+        """
+        :return: <tuple> The clock_ns the function started at, whether it
+            succeeded, and its result or the exception it raised
+        """
+        try:
+            return self.__responses.recv()
+        except EOFError:
+            self.process.join()
+            raise WorkerProcessError(self.process.pid, "exited with code {}"
+                                     .format(self.process.exitcode))
+
+    def kill(self):
+        """
+        Kill the process, e.g. when the function it runs has timed out. A new
+        one is started by the next function sent
+        :return:
+        """
+        if self.process is None:
+            return
+        self.process.kill()
+        self.__close()
+
+    def stop(self):
+        if self.process is None:
+            return
+        try:
+            self.__requests.send(None)
+        except OSError:
+            pass
+        self.__close()
+
+    def __close(self):
+        self.__requests.close()
+        self.__responses.close()
+        self.process.join()
+        self.process = None
+
+
+class ExecutorPools(object):
+    """
+    The bounded thread and process pools the offloaded functions run in. Each
+    pool is created the first time it is used
+    """
+    def __init__(self, thread_pool_size=DEFAULT_THREAD_POOL_SIZE,
+                 process_pool_size=None):
+        """
+        :param thread_pool_size: <int> The max number of native threads
+        :param process_pool_size: <int> The max number of worker processes.
+            Default: the number of CPUs
+        """
+        self.thread_pool_size = thread_pool_size
+        self.process_pool_size = process_pool_size or os.cpu_count() or 1
+        self.discard()
+
+    def discard(self):
+        """
+        Forget the pools without closing them, e.g. the ones a forked process
+        has inherited from its parent
+        :return:
+        """
+        # The gevent pool, and the concurrent.futures one used from an
+        # asyncio event loop when threading is not patched
+        self.__thread_pool = None
+        self.__thread_executor = None
+        self.__process_pool = None
+
+    def __threads(self):
+        if self.__thread_pool is None:
+            import gevent.threadpool
+            self.__thread_pool = gevent.threadpool.ThreadPool(
+                self.thread_pool_size)
+        return self.__thread_pool
+
+    def __threads_async(self):
+        if self.__thread_executor is None:
+            import concurrent.futures
+            self.__thread_executor = concurrent.futures.ThreadPoolExecutor(
+                self.thread_pool_size)
+        return self.__thread_executor
+
+    def __processes(self):
+        if self.__process_pool is None:
+            self.__process_pool = ResourcePool(
+                "worker processes", _ProcessWorker, self.process_pool_size,
+                teardown=_ProcessWorker.stop)
+        return self.__process_pool
+
+    def call(self, executor, function, args, kwargs):
+        """
+        Run a function in a pool, waiting for it without blocking the gevent
+        hub
+        :param executor: <str> "thread" or "process"
+        :param function: <function>
+        :param args: <list>
+        :param kwargs: <dict>
+        :return: <tuple> The nanoseconds the function was queued for, whether
+            it succeeded, and its result or the exception it raised
+        """
+        submitted_ns = clock_ns()
+        if executor == THREAD_EXECUTOR:
+            start_ns, succeeded, value = self.__threads().spawn(
+                _timed_call, function, args, kwargs).get()
+        else:
+            start_ns, succeeded, value = self.__call_in_process(function, args,
+                                                                kwargs)
+        return start_ns - submitted_ns, succeeded, value
+
+    def __call_in_process(self, function, args, kwargs):
+        import gevent.socket
+        pool = self.__processes()
+        worker = pool.acquire()
+        try:
+            worker.send(function, args, kwargs)
+            gevent.socket.wait_read(worker.fileno())
+            return worker.receive()
+        except BaseException:
+            # The worker may still be running the function, e.g. timed out
+            worker.kill()
+            raise
+        finally:
+            pool.release(worker)
+
+    async def call_async(self, executor, function, args, kwargs):
+        """
+        The call counterpart to be awaited from an asyncio event loop
+        """
+        submitted_ns = clock_ns()
+        if executor == THREAD_EXECUTOR:
+            start_ns, succeeded, value = await self.__call_in_thread_async(
+                function, args, kwargs)
+        else:
+            start_ns, succeeded, value = await self.__call_in_process_async(
+                function, args, kwargs)
+        return start_ns - submitted_ns, succeeded, value
+
+    async def __call_in_thread_async(self, function, args, kwargs):
+        import asyncio
+        loop = asyncio.get_running_loop()
+        if not _threading_patched():
+            return await loop.run_in_executor(self.__threads_async(),
+                                              _timed_call, function, args,
+                                              kwargs)
+        # The threads of concurrent.futures would be greenlets, so the gevent
+        # pool is used. Its hub runs whenever the patched event loop waits
+        future = loop.create_future()
+        self.__threads().spawn(_timed_call, function, args, kwargs).rawlink(
+            lambda result: loop.call_soon_threadsafe(_resolve, future, result))
+        return await future
+
+    async def __call_in_process_async(self, function, args, kwargs):
+        import asyncio
+        loop = asyncio.get_running_loop()
+        pool = self.__processes()
+        worker = await pool.acquire_async()
+        try:
+            worker.send(function, args, kwargs)
+            readable = loop.create_future()
+            loop.add_reader(worker.fileno(), lambda: readable.done()
+                            or readable.set_result(None))
+            try:
+                await readable
+            finally:
+                loop.remove_reader(worker.fileno())
+            return worker.receive()
+        except BaseException:
+            worker.kill()
+            raise
+        finally:
+            pool.release(worker)
+
+    def close(self):
+        """
+        Stop the threads, once they have finished their functions, and the
+        worker processes. New pools are created if they are used again
+        :return:
+        """
+        thread_pool, thread_executor, process_pool = (
+            self.__thread_pool, self.__thread_executor, self.__process_pool)
+        self.discard()
+        if thread_pool is not None:
+            thread_pool.kill()
+        if thread_executor is not None:
+            thread_executor.shutdown(wait=False)
+        if process_pool is not None:
+            process_pool.close()
+
+
+# The pools of the tasks run out of a ConcurrentFlows run
+default_executors = ExecutorPools()
+
+
+if hasattr(os, "register_at_fork"):
+    # The threads and worker processes belong to the parent process
+    os.register_at_fork(after_in_child=default_executors.discard)
@@ -0,0 +1,307 @@
+"""
+    Data feeders, which stream the rows of a CSV or JSON lines file into the
+    task arguments, e.g. a distinct user for every flow, instead of building
+    every parameter list up front.
+
+    A Feeder given in the arguments of a Task (or its result function) is
+    replaced by a row of the file, and feeder["field"] by a field of that row,
+    in the same way a TaskResult place holder is replaced by a task result.
+    Every flow draws one row of each feeder its tasks use as it starts, so all
+    of its tasks get the same row. A CSV row is a dictionary keyed by the
+    header fields, or a list if the file has no header, and a JSON lines row is
+    the decoded JSON value. Every row must fit in one line, as quoted line
+    breaks are not supported.
+
+    The rows are read on demand from the file, either memory mapped or through
+    a buffered file, so the memory used does not grow with the dataset. The
+    policy selects the rows drawn:
+
+    * sequential: the rows in the file order, once each. Drawing a row after
+      the last one fails the flow (default)
+    * circular: the rows in the file order, starting over after the last one
+    * random: a random row every time, with replacement. The row is found from
+      a random byte offset, so the longer the previous line is, the likelier a
+      row is drawn: the rows of similar length are drawn uniformly
+
+    The flows of a process share the feeder position. A forked process opens
+    the file again and reads it on its own, with the random policy seeded
+    again for it. When the flows are sharded across processes, or distributed
+    workers, every shard draws the sequential and circular rows of its own
+    partition: one row out of the number of shards, offset by the shard index,
+    so no row is drawn twice by the shards.
+"""
+import csv
+import json
+import mmap
+import os
+import random
+import threading
+import weakref
+
+SEQUENTIAL_POLICY = "sequential"
+CIRCULAR_POLICY = "circular"
+RANDOM_POLICY = "random"
+POLICIES = (SEQUENTIAL_POLICY, CIRCULAR_POLICY, RANDOM_POLICY)
+
+CSV_FORMAT = "csv"
+JSONL_FORMAT = "jsonl"
+FORMATS = {".csv": CSV_FORMAT, ".jsonl": JSONL_FORMAT}
+
+DEFAULT_BUFFER_SIZE = 1 << 16
+
+# Every feeder, so a forked process can forget the files of its parent
+_feeders = weakref.WeakSet()
+
+
+class FeederExhausted(Exception):
+    def __init__(self, path):
+        super().__init__("The feeder {} has no more rows!!".format(path))
+
+
+class FeederField(object):
+    """
+    Place holder of a field of the row a feeder gives to the flow
+    """
+    __slots__ = ("feeder", "field")
+
+    def __init__(self, feeder, field):
+        self.feeder = feeder
+        self.field = field
+
+
+class Feeder(object):
+
+    def __init__(self, path, policy=SEQUENTIAL_POLICY, file_format=None,
+                 header=True, delimiter=",", use_mmap=False,
+                 buffer_size=DEFAULT_BUFFER_SIZE, seed=None):
+        """
+        Define a feeder of the rows of a file
+        :param path: <str> The CSV or JSON lines file
+        :param policy: <str> "sequential" (default), "circular" or "random"
+        :param file_format: <str> "csv" or "jsonl". Default: the one of the
+            file extension
+        :param header: <bool> If the first CSV line holds the field names. The
+            rows are lists otherwise
+        :param delimiter: <str> The CSV field delimiter
+        :param use_mmap: <bool> Memory map the file instead of reading it
+            through a buffered file
+        :param buffer_size: <int> The bytes of the buffered reads
+        :param seed: The seed of the random policy. Every forked process
+            mixes its pid in it, so they do not draw the same rows
+        """
+        if policy not in POLICIES:
+            raise ValueError("Unknown feeder policy {}".format(policy))
+        if file_format is None:
+            file_format = FORMATS.get(os.path.splitext(path)[1].lower())
+        if file_format not in FORMATS.values():
+            raise ValueError("The feeder file {} must be CSV or JSON lines"
+                             .format(path))
+        self.path = path
+        self.policy = policy
+        self.file_format = file_format
+        self.header = header and file_format == CSV_FORMAT
+        self.delimiter = delimiter
+        self.use_mmap = use_mmap
+        self.buffer_size = buffer_size
+        self.seed = seed
+        self.__random = random.Random(seed)
+        # The sequential and circular rows drawn are the ones whose index
+        # modulo the partition count is the partition index
+        self.__partition = (0, 1)
+        self.discard()
+        _feeders.add(self)
+
+    def __getitem__(self, field):
+        """
+        :param field: The field name, or index if the rows are lists
+        :return: <FeederField> The place holder of that field of the row
+        """
+        return FeederField(self, field)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def discard(self):
+        """
+        Forget the open file without closing it, e.g. the one a forked process
+        has inherited from its parent
+        :return:
+        """
+        self.__file = None
+        self.__opened_file = None
+        self.__lock = threading.Lock()
+        self.fields = None
+        # The byte offsets of the first row and of the end of the file
+        self.__data_start = None
+        self.__data_end = None
+        # The index of the next row read in the file order
+        self.__row_index = 0
+
+    def reseed(self):
+        """
+        Seed the random policy again, e.g. in a forked process, so it does not
+        draw the same rows as its parent
+        :return:
+        """
+        self.__random.seed(os.urandom(16) if self.seed is None
+                           else "{}-{}".format(self.seed, os.getpid()))
+
+    def partition(self, index, count):
+        """
+        Draw only the sequential and circular rows of a partition, e.g. the
+        one of a shard of the flows, from the first row
+        :param index: <int> The partition index, from 0 to count - 1
+        :param count: <int> The number of partitions
+        :return:
+        """
+        if not 0 <= index < count:
+            raise ValueError("The partition index must be in [0, {})"
+                             .format(count))
+        if (index, count) != self.__partition:
+            self.close()
+            self.__partition = (index, count)
+
+    def __open(self):
+        opened_file = open(self.path, "rb", buffering=self.buffer_size)
+        try:
+            size = os.fstat(opened_file.fileno()).st_size
+            if self.use_mmap and size:
+                self.__file = mmap.mmap(opened_file.fileno(), 0,
+                                        access=mmap.ACCESS_READ)
+            else:
+                self.__file = opened_file
+            if self.header:
+                self.fields = self.__parse(
+                    self.__file.readline().decode("utf-8-sig"))
+            self.__data_start = self.__file.tell()
+            self.__data_end = size
+        except Exception:
+            opened_file.close()
+            raise
+        self.__opened_file = opened_file
+
+    def __parse(self, line):
+        if self.file_format == JSONL_FORMAT:
+            return json.loads(line)
+        return next(csv.reader([line], delimiter=self.delimiter))
+
+    def __row(self, line):
+        if self.file_format == CSV_FORMAT and self.fields is not None:
+            return dict(zip(self.fields, self.__parse(line)))
+        return self.__parse(line)
+
+    def __next_line(self, wrap, partitioned=True):
+        """
+        :param wrap: <bool> Start over from the first row at the end of the file
+        :param partitioned: <bool> Skip the rows out of the partition
+        :return: <bytes> The next line which is not blank, or None at the end
+        """
+        index, count = self.__partition if partitioned else (0, 1)
+        wrapped = False
+        while True:
+            line = self.__file.readline()
+            if not line:
+                if not wrap or wrapped:
+                    return None
+                self.__file.seek(self.__data_start)
+                self.__row_index = 0
+                wrapped = True
+            elif line.strip():
+                row_index = self.__row_index
+                self.__row_index += 1
+                if row_index % count == index:
+                    return line
+
+    def __random_line(self):
+        size = self.__data_end - self.__data_start
+        if size <= 0:
+            return None
+        self.__file.seek(self.__data_start + self.__random.randrange(size))
+        # Skip the line the offset falls in
+        self.__file.readline()
+        return self.__next_line(wrap=True, partitioned=False)
+
+    def next_row(self):
+        """
+        Draw the next row, as the policy says. It is safe to call from several
+        flows at a time
+        :return: The row
+        """
+        with self.__lock:
+            if self.__file is None:
+                self.__open()
+            if self.policy == RANDOM_POLICY:
+                line = self.__random_line()
+            else:
+                line = self.__next_line(wrap=self.policy == CIRCULAR_POLICY)
+        if line is None:
+            raise FeederExhausted(self.path)
+        return self.__row(line.decode("utf-8"))
+
+    def close(self):
+        """
+        Close the file. It is opened again, from the first row, if the feeder
+        is used again
+        :return:
+        """
+        with self.__lock:
+            feeder_file, opened_file = self.__file, self.__opened_file
+            self.discard()
+        if feeder_file is not None and feeder_file is not opened_file:
+            feeder_file.close()
+        if opened_file is not None:
+            opened_file.close()
+
+
+def feeders_in(values):
+    """
+    :param values: The arguments of a function
+    :return: <list>.<Feeder> The feeders whose rows are used in the arguments
+    """
+    feeders = []
+    for value in values:
+        if isinstance(value, FeederField):
+            value = value.feeder
+        if isinstance(value, Feeder) and value not in feeders:
+            feeders.append(value)
+    return feeders
+
+
+def feed(value, rows):
+    """
+    :param value: An argument of a function
+    :param rows: <dict> The rows drawn by the flow, by feeder
+    :return: The row, or row field, a feeder place holder stands for, or the
+        argument itself
+    """
+    if isinstance(value, Feeder):
+        return rows[value]
+    if isinstance(value, FeederField):
+        return rows[value.feeder][value.field]
+    return value
+
+
+def partition_feeders(index, count):
+    """
+    Partition the rows of every feeder, e.g. in the process running a shard
+    :param index: <int> The shard index
+    :param count: <int> The number of shards
+    :return:
+    """
+    for feeder in list(_feeders):
+        feeder.partition(index, count)
+
+
+def _discard_feeders():
+    for feeder in list(_feeders):
+        feeder.discard()
+        feeder.reseed()
+
+
+if hasattr(os, "register_at_fork"):
+    # Neither the file position nor the random sequence must be shared with
+    # the parent process
+    os.register_at_fork(after_in_child=_discard_feeders)
@@ -21,5 +21,30 @@ def cast_to_kwargs(kwarg_values):
         raise ValueError("{} is not a dictionary type".format(str(kwarg_values)))
 
 
-def format_time(t_last):
-    return round((time.time() - t_last) * 1000)
+# Monotonic clock for the traces. On Linux it is shared by every process of
+# the machine, so the traces of different processes share the same timeline
+clock_ns = time.monotonic_ns
+
+# Number of decimals of the milliseconds durations in the logs
+_time_precision = 0
+
+
+def set_time_precision(digits):
+    """
+    Set the precision of the durations in the logs
+    :param digits: <int> The number of decimals of the milliseconds. With 0, the
+        default, the durations are integer milliseconds
+    :return:
+    """
+    global _time_precision
+    if not isinstance(digits, int) or not 0 <= digits <= 6:
+        raise ValueError("The time precision must be an integer between 0 and 6")
+    _time_precision = digits
+
+
+def format_duration(duration_ns):
+    if duration_ns is None:
+        return None
+    if not _time_precision:
+        return round(duration_ns / 10**6)
+    return round(duration_ns / 10**6, _time_precision)
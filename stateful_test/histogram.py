@@ -0,0 +1,256 @@
+"""
+    Mergeable latency histograms with bounded memory, in the style of the HDR
+    histograms. Values are bucketed with a fixed number of significant digits,
+    so a histogram never keeps the samples themselves, and two histograms
+    can be merged by adding up their bucket counts.
+"""
+import math
+
+DEFAULT_SIGNIFICANT_DIGITS = 3
+DEFAULT_PERCENTILES = (50, 90, 95, 99, 99.9)
+
+
+class LatencyHistogram(object):
+
+    def __init__(self, significant_digits=DEFAULT_SIGNIFICANT_DIGITS):
+        """
+        A histogram of non negative integer values, e.g. latencies in
+        microseconds. Every value is recorded with a relative error lower than
+        10 ** -significant_digits
+        :param significant_digits: <int> between 1 and 5
+        """
+        if not 1 <= significant_digits <= 5:
+            raise ValueError("significant_digits must be between 1 and 5")
+        self.significant_digits = significant_digits
+        # Values lower than sub_bucket_count are recorded exactly. Every time
+        # the value doubles beyond it, the bucket width doubles too
+        self.__sub_bucket_bits = math.ceil(math.log2(2 * 10 ** significant_digits))
+        self.__sub_bucket_count = 1 << self.__sub_bucket_bits
+        self.__sub_bucket_half = self.__sub_bucket_count >> 1
+
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def __index(self, value):
+        if value < self.__sub_bucket_count:
+            return value
+        shift = value.bit_length() - self.__sub_bucket_bits
+        return (self.__sub_bucket_count + (shift - 1) * self.__sub_bucket_half
+                + (value >> shift) - self.__sub_bucket_half)
+
+    def __highest_equivalent_value(self, index):
+        if index < self.__sub_bucket_count:
+            return index
+        shift, sub_bucket = divmod(index - self.__sub_bucket_count,
+                                   self.__sub_bucket_half)
+        shift += 1
+        return ((sub_bucket + self.__sub_bucket_half + 1) << shift) - 1
+
+    def record(self, value, count=1):
+        """
+        Record a value
+        :param value: <int> A non negative value
+        :param count: <int> The number of times the value is recorded
+        :return:
+        """
+        value = int(value)
+        if value < 0:
+            raise ValueError("Cannot record the negative value {}".format(value))
+        index = self.__index(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.count += count
+        self.total += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        """
+        Add the other histogram values to this one
+        :param other: <LatencyHistogram> A histogram with the same precision
+        :return: <LatencyHistogram> self
+        """
+        if other.significant_digits != self.significant_digits:
+            raise ValueError("Cannot merge histograms with different precision")
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def percentile(self, percentile):
+        """
+        :param percentile: <float> between 0 and 100
+        :return: <int> The highest value equivalent to the one at the given
+            percentile, or None if the histogram is empty
+        """
+        if not self.count:
+            return None
+        target = max(1, math.ceil(self.count * percentile / 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self.__highest_equivalent_value(index), self.max)
+        return self.max
+
+    def summary(self, percentiles=DEFAULT_PERCENTILES, scale=1):
+        """
+        :param percentiles: <tuple>.<float> The percentiles to report
+        :param scale: <float> Divide every reported value by it, e.g. 1000 to
+            report microsecond samples in milliseconds
+        :return: <dict>
+        """
+        def _scaled(value):
+            return None if value is None else value / scale
+
+        summary = {
+            "count": self.count,
+            "min": _scaled(self.min),
+            "max": _scaled(self.max),
+            "mean": _scaled(self.mean),
+        }
+        for p in percentiles:
+            summary["p{:g}".format(p)] = _scaled(self.percentile(p))
+        return summary
+
+    def to_state(self):
+        """
+        :return: <dict> A JSON serializable state to rebuild the histogram from
+        """
+        return {
+            "significant_digits": self.significant_digits,
+            "counts": [[i, c] for i, c in self.counts.items()],
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        histogram = cls(state["significant_digits"])
+        histogram.counts = {i: c for i, c in state["counts"]}
+        histogram.count = state["count"]
+        histogram.total = state["total"]
+        histogram.min = state["min"]
+        histogram.max = state["max"]
+        return histogram
+
+
+class LatencyStats(object):
+    """
+    The latency histograms of a run: execution and verification times by task
+    name, and the elapsed time of the whole flows. Samples are microseconds,
+    while the reports are given in milliseconds, as the flow logs are.
+    The flows started at an arrival rate add the lag of their starts, and the
+    number of starts which were late or dropped
+    """
+    EXECUTION = "execution"
+    VERIFICATION = "verification"
+
+    def __init__(self, significant_digits=DEFAULT_SIGNIFICANT_DIGITS):
+        self.significant_digits = significant_digits
+        self.tasks = {}
+        self.flows = LatencyHistogram(significant_digits)
+        self.start_lag = LatencyHistogram(significant_digits)
+        self.late_starts = 0
+        self.dropped_starts = 0
+
+    def __task_histogram(self, task_name, kind):
+        task_histograms = self.tasks.get(task_name)
+        if task_histograms is None:
+            task_histograms = self.tasks[task_name] = {}
+        histogram = task_histograms.get(kind)
+        if histogram is None:
+            histogram = task_histograms[kind] = LatencyHistogram(
+                self.significant_digits)
+        return histogram
+
+    def record_execution(self, task_name, elapsed_us):
+        self.__task_histogram(task_name, self.EXECUTION).record(elapsed_us)
+
+    def record_verification(self, task_name, elapsed_us):
+        self.__task_histogram(task_name, self.VERIFICATION).record(elapsed_us)
+
+    def record_flow(self, elapsed_us):
+        self.flows.record(elapsed_us)
+
+    def record_start_lag(self, lag_us, late=False):
+        self.start_lag.record(lag_us)
+        if late:
+            self.late_starts += 1
+
+    def record_dropped_start(self):
+        self.dropped_starts += 1
+
+    def merge(self, other):
+        """
+        :param other: <LatencyStats>
+        :return: <LatencyStats> self
+        """
+        for task_name, task_histograms in other.tasks.items():
+            for kind, histogram in task_histograms.items():
+                self.__task_histogram(task_name, kind).merge(histogram)
+        self.flows.merge(other.flows)
+        self.start_lag.merge(other.start_lag)
+        self.late_starts += other.late_starts
+        self.dropped_starts += other.dropped_starts
+        return self
+
+    def report(self, percentiles=DEFAULT_PERCENTILES):
+        """
+        :param percentiles: <tuple>.<float> The percentiles to report
+        :return: <dict> The percentile tables, in milliseconds, by task name.
+            If the flows were started at an arrival rate, the start lag table
+            and the late and dropped starts as well
+        """
+        report = {
+            "tasks": {
+                task_name: {kind: histogram.summary(percentiles, scale=1000)
+                            for kind, histogram in task_histograms.items()}
+                for task_name, task_histograms in self.tasks.items()
+            },
+            "flows": self.flows.summary(percentiles, scale=1000),
+        }
+        if self.start_lag.count or self.dropped_starts:
+            report["arrivals"] = {
+                "start_lag": self.start_lag.summary(percentiles, scale=1000),
+                "late": self.late_starts,
+                "dropped": self.dropped_starts,
+            }
+        return report
+
+    def to_state(self):
+        return {
+            "significant_digits": self.significant_digits,
+            "tasks": {task_name: {kind: histogram.to_state()
+                                  for kind, histogram in task_histograms.items()}
+                      for task_name, task_histograms in self.tasks.items()},
+            "flows": self.flows.to_state(),
+            "start_lag": self.start_lag.to_state(),
+            "late_starts": self.late_starts,
+            "dropped_starts": self.dropped_starts,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        stats = cls(state["significant_digits"])
+        stats.tasks = {task_name: {kind: LatencyHistogram.from_state(h)
+                                   for kind, h in task_histograms.items()}
+                       for task_name, task_histograms in state["tasks"].items()}
+        stats.flows = LatencyHistogram.from_state(state["flows"])
+        if "start_lag" in state:
+            stats.start_lag = LatencyHistogram.from_state(state["start_lag"])
+            stats.late_starts = state["late_starts"]
+            stats.dropped_starts = state["dropped_starts"]
+        return stats
@@ -4,7 +4,14 @@ LOG_DICT = {
     "total_execution_time": None,
     "total_verification_time": None,
     "total_elapsed_time": None,
+    "start_ns": None,
+    "end_ns": None,
     "executed_path": [],
+    "phase": None,
+    "concurrency": None,
+    "iteration": None,
+    "intended_start_ns": None,
+    "start_lag": None,
 
     "tasks": {}
 }
@@ -12,6 +19,19 @@ LOG_DICT = {
 TASK_DICT = {
       "execution_time": None,
       "verification_time": None,
+      "net_execution_time": None,
+      "net_verification_time": None,
+      "start_offset": None,
+      "start_ns": None,
+      "end_ns": None,
+      "verification_start_ns": None,
+      "verification_end_ns": None,
+      "pool_wait_time": None,
+      "queue_wait_time": None,
+      "verification_queue_wait_time": None,
+      "verification_attempts": None,
+      "cache": None,
+      "resumed": False,
       "status": {
         "task": None,
         "verification": None
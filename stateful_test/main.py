@@ -3,14 +3,41 @@
     * Acknowledgments for the locust library team, from which I have
     borrowed many functions and code structure
 """
-import importlib
+import fnmatch
+import functools
+import glob
+import importlib.machinery
+import itertools
 import logging
 import json
 import os
+import re
 import sys
+import time
 from optparse import OptionParser
 
-from .core import FlowPath, ConcurrentFlows
+from .checkpoint import Checkpoint
+from .core import (ARRIVAL_RATE_MODE, ASYNCIO_BACKEND, CONSTANT_ARRIVALS,
+                   GEVENT_BACKEND, POISSON_ARRIVALS, FlowPath, ConcurrentFlows,
+                   patch_gevent)
+from .distributed import (DEFAULT_ACCEPT_TIMEOUT, DEFAULT_MASTER_HOST,
+                          DEFAULT_MASTER_PORT, MasterRunner, WorkerRunner)
+from .events import EventHooks
+from .helpers import set_time_precision
+from .progress import ProgressReporter, RunProgress
+from .resources import close_pools
+from .sharding import TIMINGS_KEY, load_durations, parse_shard, select_shard
+from .sinks import JSONL_EXTENSION, JsonlSink
+
+# Flowfile targets cannot start with an underscore, so this key never collides
+PERCENTILES_KEY = "_percentiles"
+THROUGHPUT_KEY = "_throughput"
+
+JSON_FORMAT = "json"
+JSONL_FORMAT = "jsonl"
+
+DEFAULT_PROGRESS_INTERVAL = 5
+DEFAULT_CHECKPOINT_DIR = ".checkpoints"
 
 
 def parse_options():
@@ -20,7 +47,10 @@ def parse_options():
         '-f', '--flowfile',
         dest='flowfile',
         default='flowfile',
-        help='Python file with the flow path, e.g. "../api_test.py. Default: flowfile"'
+        help='Python file with the flow path, e.g. "../api_test.py". A directory '
+             'or a glob pattern, e.g. "scenarios/**/*.py", runs the targets of '
+             'every flowfile found, named <flowfile path>::<target>. '
+             'Default: flowfile'
     )
 
     parser.add_option(
@@ -32,6 +62,244 @@ def parse_options():
         help="Path to log file. If not set, log will go to stdout/stderr",
     )
 
+    parser.add_option(
+        '--output-format',
+        action='store',
+        type='choice',
+        choices=[JSON_FORMAT, JSONL_FORMAT],
+        dest='output_format',
+        default=None,
+        help="json: dump every log once all the flows have finished. jsonl: "
+             "stream one JSON line per finished flow. Default: jsonl if the "
+             "output file ends in {}, json otherwise".format(JSONL_EXTENSION),
+    )
+
+    parser.add_option(
+        '-t', '--targets',
+        action='store',
+        type='str',
+        dest='targets',
+        default=None,
+        help="Comma separated names or glob patterns of the flowfile targets "
+             "to run, e.g. \"checkout_*,login\". Default: every target",
+    )
+
+    parser.add_option(
+        '--shard',
+        action='store',
+        type='str',
+        dest='shard',
+        default=None,
+        help="Run only the shard I/N of the selected targets, e.g. 2/4. The "
+             "shards are stable, and balanced by the --durations of the "
+             "targets",
+    )
+
+    parser.add_option(
+        '--durations',
+        action='store',
+        type='str',
+        dest='durations',
+        default=None,
+        help="Comma separated paths or glob patterns of the result files of "
+             "previous runs. The _timings they report weigh the targets "
+             "when sharding",
+    )
+
+    parser.add_option(
+        '--parallel-targets',
+        action='store',
+        type='int',
+        dest='parallel_targets',
+        default=1,
+        help="Run up to PARALLEL_TARGETS targets at the same time. The targets "
+             "must be independent of each other. Ignored by the master and "
+             "the workers. Default: 1, one after another",
+    )
+
+    parser.add_option(
+        '--backend',
+        action='store',
+        type='choice',
+        choices=[GEVENT_BACKEND, ASYNCIO_BACKEND],
+        dest='backend',
+        default=GEVENT_BACKEND,
+        help="Execution engine of the flows. gevent monkey patches the standard "
+             "library before loading the flowfile. asyncio runs the flows in an "
+             "event loop and patches nothing. Default: {}".format(GEVENT_BACKEND),
+    )
+
+    parser.add_option(
+        '--time-precision',
+        action='store',
+        type='int',
+        dest='time_precision',
+        default=0,
+        help="Number of decimals of the milliseconds durations in the log. "
+             "Default: 0",
+    )
+
+    parser.add_option(
+        '--iterations',
+        action='store',
+        type='int',
+        dest='iterations',
+        default=None,
+        help="Soak test the Concurrent Flows: run every flow ITERATIONS times",
+    )
+
+    parser.add_option(
+        '--duration',
+        action='store',
+        type='float',
+        dest='duration',
+        default=None,
+        help="Soak test the Concurrent Flows: run every flow again and again "
+             "for DURATION seconds",
+    )
+
+    parser.add_option(
+        '--timeout',
+        action='store',
+        type='float',
+        dest='timeout',
+        default=None,
+        help="Run every Concurrent Flows within TIMEOUT seconds: no flow is "
+             "started later, and the ones still running are cancelled with a "
+             "TIMEOUT status",
+    )
+
+    parser.add_option(
+        '--arrival-rate',
+        action='store',
+        type='float',
+        dest='arrival_rate',
+        default=None,
+        help="Start the flows of every Concurrent Flows at ARRIVAL_RATE flows "
+             "per second, however many are in flight. Their latencies are "
+             "measured from their scheduled start, and the start lag and late "
+             "starts are reported in the percentiles. With --worker, it is the "
+             "rate of the whole distributed run, split among the workers",
+    )
+
+    parser.add_option(
+        '--arrivals',
+        action='store',
+        type='choice',
+        choices=[CONSTANT_ARRIVALS, POISSON_ARRIVALS],
+        dest='arrivals',
+        default=CONSTANT_ARRIVALS,
+        help="How the --arrival-rate flows are spaced: evenly, or as a Poisson "
+             "process. Default: {}".format(CONSTANT_ARRIVALS),
+    )
+
+    parser.add_option(
+        '--progress',
+        action='store',
+        type='float',
+        dest='progress_interval',
+        default=None,
+        help="Write a progress snapshot to stderr every PROGRESS_INTERVAL "
+             "seconds: the flows started and finished, the throughput and the "
+             "task latencies since the previous snapshot. Ignored by the master",
+    )
+
+    parser.add_option(
+        '--progress-port',
+        action='store',
+        type='int',
+        dest='progress_port',
+        default=None,
+        help="Serve the last progress snapshot as JSON on this local port. "
+             "Implies --progress, every {} seconds unless given"
+             .format(DEFAULT_PROGRESS_INTERVAL),
+    )
+
+    parser.add_option(
+        '--profile',
+        action='store',
+        type='str',
+        dest='profile_file',
+        default=None,
+        help="Sample the client side CPU of the tasks, and write its hot spots "
+             "by task name as JSON to PROFILE_FILE. Ignored by the master",
+    )
+
+    parser.add_option(
+        '--checkpoint-dir',
+        action='store',
+        type='str',
+        dest='checkpoint_dir',
+        default=None,
+        help="Save a checkpoint of every Flow Path in CHECKPOINT_DIR after each "
+             "task which succeeds. It is removed once the flow succeeds",
+    )
+
+    parser.add_option(
+        '--resume',
+        action='store_true',
+        dest='resume',
+        default=False,
+        help="Resume every Flow Path from its checkpoint, skipping the tasks "
+             "it has already finished. Implies --checkpoint-dir {} unless given"
+             .format(DEFAULT_CHECKPOINT_DIR),
+    )
+
+    parser.add_option(
+        '--master',
+        action='store_true',
+        dest='master',
+        default=False,
+        help="Run as a master, handing out the flows to the connected workers",
+    )
+
+    parser.add_option(
+        '--worker',
+        action='store_true',
+        dest='worker',
+        default=False,
+        help="Run as a worker, running the flows the master hands out",
+    )
+
+    parser.add_option(
+        '--master-host',
+        action='store',
+        type='str',
+        dest='master_host',
+        default=DEFAULT_MASTER_HOST,
+        help="Address the master listens on, or the workers connect to. Use "
+             "unix:<path> for a Unix socket. Default: {}".format(DEFAULT_MASTER_HOST),
+    )
+
+    parser.add_option(
+        '--master-port',
+        action='store',
+        type='int',
+        dest='master_port',
+        default=DEFAULT_MASTER_PORT,
+        help="TCP port the master listens on, or the workers connect to. "
+             "Default: {}".format(DEFAULT_MASTER_PORT),
+    )
+
+    parser.add_option(
+        '--expect-workers',
+        action='store',
+        type='int',
+        dest='expect_workers',
+        default=1,
+        help="Number of workers the master waits for before starting. Default: 1",
+    )
+
+    parser.add_option(
+        '--accept-timeout',
+        action='store',
+        type='float',
+        dest='accept_timeout',
+        default=DEFAULT_ACCEPT_TIMEOUT,
+        help="Max seconds the master waits for the expected workers to "
+             "connect. Default: {}".format(DEFAULT_ACCEPT_TIMEOUT),
+    )
+
     opts, args = parser.parse_args()
     return parser, opts, args
 
@@ -80,6 +348,35 @@ def find_flowfile(flowfile):
     return None
 
 
+def _is_flowfile(path):
+    return (path.endswith('.py')
+            and not os.path.basename(path).startswith('_'))
+
+
+def find_flowfiles(flowfile):
+    """
+    Locate the flowfiles given as a directory or a glob pattern, searched
+    recursively, or a single flowfile as find_flowfile does. The modules whose
+    name starts with an underscore are skipped
+    :return: <list>.<str> The sorted absolute paths
+    """
+    expanded = os.path.expanduser(flowfile)
+    if glob.has_magic(expanded):
+        paths = [p for p in glob.glob(expanded, recursive=True)
+                 if _is_flowfile(p) or _is_package(p)]
+    elif os.path.isdir(expanded) and not _is_package(expanded):
+        paths = []
+        for directory, subdirectories, filenames in os.walk(expanded):
+            subdirectories[:] = [d for d in subdirectories
+                                 if not d.startswith(('.', '_'))]
+            paths.extend(os.path.join(directory, f) for f in filenames
+                         if _is_flowfile(f))
+    else:
+        path = find_flowfile(flowfile)
+        return [path] if path else []
+    return sorted(os.path.abspath(p) for p in paths)
+
+
 def is_flowpath(tup):
     """
         Takes (name, object) tuple, returns True if it's a public FlowPath subclass.
@@ -103,12 +400,13 @@ def is_concurrent_flows(tup):
     )
 
 
-def load_flowfile(path):
+def load_flowfile(path, module_name=None):
     """
     Import given flowfile path and return (docstring, callables).
     Specifically, the flowfile's ``__doc__`` attribute (a string) and a
     dictionary of ``{'name': callable}`` containing all callables which pass
     the "is_flowpath" test.
+    The module is named after the flowfile, unless a module_name is given
     """
 
     def __import_flowfile__(filename, path):
@@ -116,7 +414,8 @@ def load_flowfile(path):
         Loads the flowfile as a module, similar to performing `import`
         """
         source = (importlib.machinery.
-                  SourceFileLoader(os.path.splitext(flowfile)[0], path))
+                  SourceFileLoader(module_name or os.path.splitext(flowfile)[0],
+                                   path))
         imported = source.load_module()
         return imported
 
@@ -159,6 +458,46 @@ def load_flowfile(path):
     return imported.__doc__, flowpaths, concurrent_flows
 
 
+def load_flowfiles(paths):
+    """
+    Import every flowfile. A single one is loaded as load_flowfile does.
+    Otherwise, the targets are named <flowfile path>::<target>, with the path
+    relative to the working directory, so the targets of different flowfiles
+    never collide
+    :param paths: <list>.<str>
+    :return: <tuple> The FlowPath and ConcurrentFlows targets, by name
+    """
+    if len(paths) == 1:
+        _, flowpaths, concurrent_flows = load_flowfile(paths[0])
+        return flowpaths, concurrent_flows
+    flowpaths, concurrent_flows = {}, {}
+    for path in paths:
+        relative_path = os.path.relpath(path)
+        # Flowfiles of different directories can share the same file name
+        module_name = "flowfile_" + re.sub(r"\W", "_",
+                                           os.path.splitext(relative_path)[0])
+        _, file_flowpaths, file_concurrent_flows = load_flowfile(path,
+                                                                 module_name)
+        for targets, file_targets in ((flowpaths, file_flowpaths),
+                                      (concurrent_flows, file_concurrent_flows)):
+            targets.update(("{}::{}".format(relative_path, name), obj)
+                           for name, obj in file_targets.items())
+    return flowpaths, concurrent_flows
+
+
+def shard_targets(flowpaths, concurrent_flows, shard, durations=None):
+    """
+    :param shard: <tuple> The 1-based shard index and the number of shards
+    :param durations: <dict> The seconds the targets took, by target name
+    :return: <tuple> The FlowPath and ConcurrentFlows targets of the shard
+    """
+    names = set(select_shard(list(itertools.chain(concurrent_flows, flowpaths)),
+                             shard, durations))
+    return ({name: obj for name, obj in flowpaths.items() if name in names},
+            {name: obj for name, obj in concurrent_flows.items()
+             if name in names})
+
+
 def write_log(out_dict, output_file=None):
     if output_file:
         with open(output_file, 'w') as log_file:
@@ -167,34 +506,315 @@ def write_log(out_dict, output_file=None):
         print(json.dumps(out_dict, indent=4))
 
 
+def stream_log(out_dict, sink, concurrent_flows):
+    """
+    Write an already collected output to a streaming sink
+    """
+    for path_name, log in out_dict.items():
+        if path_name in concurrent_flows:
+            for flow_id, flow_log in log.items():
+                sink.write_flow(path_name, flow_id, flow_log)
+        else:
+            sink.write_target(path_name, log)
+
+
+def select_targets(targets, patterns):
+    """
+    :param targets: <dict> The targets by name
+    :param patterns: <list>.<str> Target names or glob patterns
+    :return: <dict> The targets matching any pattern, in the same order
+    """
+    return {name: obj for name, obj in targets.items()
+            if any(fnmatch.fnmatchcase(name, p) for p in patterns)}
+
+
+def _run_target(path_name, obj, sink, run_options):
+    logger = logging.getLogger(__name__)
+    if isinstance(obj, ConcurrentFlows):
+        logger.info("Starting execution of Concurrent Flows {}".format(path_name))
+        on_flow_end = (functools.partial(sink.write_flow, path_name)
+                       if sink is not None else None)
+        # The streamed logs are not needed in memory anymore
+        return obj.run(run_options, on_flow_end=on_flow_end,
+                       keep_logs=sink is None)
+    logger.info("Starting execution of Flow Path {}".format(path_name))
+    if run_options["backend"] == ASYNCIO_BACKEND:
+        import asyncio
+        log = asyncio.run(obj.run_async())
+    else:
+        log = obj.run()
+    if sink is not None:
+        sink.write_target(path_name, log)
+    return log
+
+
+async def _run_target_async(path_name, obj, sink, run_options):
+    logger = logging.getLogger(__name__)
+    if isinstance(obj, ConcurrentFlows):
+        logger.info("Starting execution of Concurrent Flows {}".format(path_name))
+        on_flow_end = (functools.partial(sink.write_flow, path_name)
+                       if sink is not None else None)
+        return await obj.run_async(run_options, on_flow_end=on_flow_end,
+                                   keep_logs=sink is None)
+    logger.info("Starting execution of Flow Path {}".format(path_name))
+    log = await obj.run_async()
+    if sink is not None:
+        sink.write_target(path_name, log)
+    return log
+
+
+def run_targets(flowpaths, concurrent_flows, sink=None, backend=GEVENT_BACKEND,
+                run_options=None, parallel_targets=1, timings=None):
+    """
+    Run every target in this process. If a sink is given, the logs are streamed
+    to it as soon as each flow finishes. The ConcurrentFlows are run with the
+    given run_options
+    :param parallel_targets: <int> The max number of targets run at the same
+        time. By default, they are run one after another
+    :param timings: <dict> If given, the wall time of every target, in
+        seconds, is recorded in it by target name
+    :return: <dict> The logs by target name, the ConcurrentFlows first
+    """
+    run_options = dict(run_options or {}, backend=backend)
+    targets = list(itertools.chain(concurrent_flows.items(), flowpaths.items()))
+    out_dict = {path_name: None for path_name, _ in targets}
+    timings = {} if timings is None else timings
+
+    def _run(target):
+        path_name, obj = target
+        start = time.perf_counter()
+        out_dict[path_name] = _run_target(path_name, obj, sink, run_options)
+        timings[path_name] = time.perf_counter() - start
+
+    async def _run_async(target, slots):
+        path_name, obj = target
+        async with slots:
+            start = time.perf_counter()
+            out_dict[path_name] = await _run_target_async(path_name, obj, sink,
+                                                          run_options)
+            timings[path_name] = time.perf_counter() - start
+
+    async def _run_all_async():
+        slots = asyncio.Semaphore(parallel_targets)
+        await asyncio.gather(*(_run_async(target, slots) for target in targets))
+
+    if parallel_targets <= 1 or len(targets) <= 1:
+        for target in targets:
+            _run(target)
+    elif backend == ASYNCIO_BACKEND:
+        import asyncio
+        asyncio.run(_run_all_async())
+    else:
+        patch_gevent()
+        import gevent.pool
+        gevent.pool.Pool(parallel_targets).map(_run, targets)
+    return out_dict
+
+
+def cli_run_options(options):
+    """
+    :return: <dict> The run options of the ConcurrentFlows given in the
+        command line
+    """
+    run_options = {"iterations": options.iterations,
+                   "duration": options.duration,
+                   "timeout": options.timeout}
+    if options.arrival_rate is not None:
+        run_options.update(mode=ARRIVAL_RATE_MODE, rate=options.arrival_rate,
+                           arrivals=options.arrivals)
+    return {k: v for k, v in run_options.items() if v is not None}
+
+
+def create_reporter(options, flowpaths, concurrent_flows):
+    """
+    Start reporting the progress of every target, if asked for
+    :return: <ProgressReporter> or None
+    """
+    if options.progress_interval is None and options.progress_port is None:
+        return None
+    progress = RunProgress()
+    for obj in itertools.chain(flowpaths.values(), concurrent_flows.values()):
+        obj.progress = progress
+    reporter = ProgressReporter(
+        progress, interval=options.progress_interval or DEFAULT_PROGRESS_INTERVAL,
+        http_port=options.progress_port)
+    reporter.start()
+    return reporter
+
+
+def setup_checkpoints(options, flowpaths):
+    """
+    Save the checkpoints of every Flow Path, and resume them, if asked for
+    """
+    logger = logging.getLogger(__name__)
+    checkpoint_dir = options.checkpoint_dir
+    if checkpoint_dir is None and options.resume:
+        checkpoint_dir = DEFAULT_CHECKPOINT_DIR
+    if checkpoint_dir is None:
+        return
+    for path_name, obj in flowpaths.items():
+        obj.checkpoint = Checkpoint.in_directory(checkpoint_dir, path_name)
+        if options.resume:
+            skipped = obj.resume()
+            if skipped:
+                logger.info("Resuming Flow Path {} after the tasks {}"
+                            .format(path_name, ", ".join(skipped)))
+
+
+def create_profiler(options, flowpaths, concurrent_flows):
+    """
+    Start profiling the tasks of every target, if asked for
+    :return: <TaskProfiler> or None
+    """
+    if options.profile_file is None:
+        return None
+    from .profiler import TaskProfiler
+    events = EventHooks()
+    profiler = TaskProfiler()
+    profiler.attach(events)
+    for obj in itertools.chain(flowpaths.values(), concurrent_flows.values()):
+        obj.events = events
+    profiler.start()
+    return profiler
+
+
+def stop_observers(options, reporter, profiler):
+    if reporter is not None:
+        reporter.stop()
+    if profiler is not None:
+        profiler.stop()
+        profiler.write(options.profile_file)
+
+
 def main():
     parser, options, arguments = parse_options()
 
-    flowfile = find_flowfile(options.flowfile)
+    flowfiles = find_flowfiles(options.flowfile)
     logger = logging.getLogger(__name__)
 
-    if not flowfile:
+    try:
+        set_time_precision(options.time_precision)
+    except ValueError as e:
+        logger.error(str(e))
+        sys.exit(1)
+
+    if not flowfiles:
         logger.error(
             "Could not find any flowfile! Ensure file ends in '.py'"
             " and see --help for available options.")
         sys.exit(1)
 
-    docstring, flowpaths, concurrent_flows = load_flowfile(flowfile)
+    shard = None
+    if options.shard:
+        try:
+            shard = parse_shard(options.shard)
+        except ValueError as e:
+            logger.error(str(e))
+            sys.exit(1)
+
+    if options.master or options.worker or options.backend == GEVENT_BACKEND:
+        # Patch before the flowfile imports any library, as importing
+        # stateful_test does not patch anything by itself
+        patch_gevent()
+
+    flowpaths, concurrent_flows = load_flowfiles(flowfiles)
 
     if not flowpaths and not concurrent_flows:
         logger.error("No FlowPath or ConcurrentFlows instances found!")
         sys.exit(1)
 
-    out_dict = {}
-    for path_name, obj in concurrent_flows.items():
-        logger.info("Starting execution of Concurrent Flows {}".format(path_name))
-        out_dict[path_name] = obj.run()
+    if options.targets:
+        patterns = [p.strip() for p in options.targets.split(",") if p.strip()]
+        flowpaths = select_targets(flowpaths, patterns)
+        concurrent_flows = select_targets(concurrent_flows, patterns)
+        if not flowpaths and not concurrent_flows:
+            logger.error("No target matches {}!".format(options.targets))
+            sys.exit(1)
 
-    for path_name, obj in flowpaths.items():
-        logger.info("Starting execution of Flow Path {}".format(path_name))
-        out_dict[path_name] = obj.run()
+    if shard is not None:
+        durations = (load_durations(options.durations.split(","))
+                     if options.durations else None)
+        flowpaths, concurrent_flows = shard_targets(flowpaths, concurrent_flows,
+                                                    shard, durations)
+        logger.info("Running the {} targets of the shard {}".format(
+            len(flowpaths) + len(concurrent_flows), options.shard))
+
+    if options.parallel_targets < 1:
+        logger.error("--parallel-targets must be a positive integer")
+        sys.exit(1)
+
+    if options.master and options.worker:
+        logger.error("The --master and --worker options cannot be used together")
+        sys.exit(1)
+
+    if options.master and options.expect_workers < 1:
+        logger.error("--expect-workers must be a positive integer")
+        sys.exit(1)
+
+    # The master does not run any flow itself
+    reporter = profiler = None
+    if not options.master:
+        reporter = create_reporter(options, flowpaths, concurrent_flows)
+        profiler = create_profiler(options, flowpaths, concurrent_flows)
+        setup_checkpoints(options, flowpaths)
+
+    if options.worker:
+        try:
+            WorkerRunner(flowpaths, concurrent_flows, host=options.master_host,
+                         port=options.master_port,
+                         run_options=dict(cli_run_options(options),
+                                          backend=options.backend)).run()
+        finally:
+            close_pools()
+            stop_observers(options, reporter, profiler)
+        return
+
+    output_format = options.output_format
+    if output_format is None:
+        output_format = (JSONL_FORMAT if options.outputfile
+                         and options.outputfile.endswith(JSONL_EXTENSION)
+                         else JSON_FORMAT)
+    sink = None
+    if output_format == JSONL_FORMAT:
+        sink = JsonlSink(options.outputfile or sys.stdout)
+
+    try:
+        if options.master:
+            out_dict = MasterRunner(flowpaths, concurrent_flows,
+                                    host=options.master_host,
+                                    port=options.master_port,
+                                    expect_workers=options.expect_workers,
+                                    accept_timeout=options.accept_timeout
+                                    ).run()
+            if sink is not None:
+                stream_log(out_dict, sink, concurrent_flows)
+        else:
+            timings = {}
+            out_dict = run_targets(flowpaths, concurrent_flows, sink=sink,
+                                   backend=options.backend,
+                                   run_options=cli_run_options(options),
+                                   parallel_targets=options.parallel_targets,
+                                   timings=timings)
+            out_dict[TIMINGS_KEY] = timings
+            if sink is not None:
+                sink.write_target(TIMINGS_KEY, timings)
+
+        if concurrent_flows:
+            out_dict[PERCENTILES_KEY] = {name: obj.percentiles
+                                         for name, obj in concurrent_flows.items()}
+            out_dict[THROUGHPUT_KEY] = {name: obj.throughput
+                                        for name, obj in concurrent_flows.items()}
+            if sink is not None:
+                sink.write_target(PERCENTILES_KEY, out_dict[PERCENTILES_KEY])
+                sink.write_target(THROUGHPUT_KEY, out_dict[THROUGHPUT_KEY])
+    finally:
+        close_pools()
+        stop_observers(options, reporter, profiler)
+        if sink is not None:
+            sink.close()
 
-    write_log(out_dict, output_file=options.outputfile)
+    if sink is None:
+        write_log(out_dict, output_file=options.outputfile)
     if options.outputfile:
         logger.info("You can review the execution results in {}"
                     .format(options.outputfile))
@@ -0,0 +1,68 @@
+"""
+    Polling of the result functions, for the systems which are eventually
+    consistent. Instead of sleeping a fixed time in the task before verifying
+    it, the result function is called again and again until it returns True,
+    waiting longer between the attempts, so every flow waits only as long as
+    the system takes to converge.
+
+    An attempt which raises, or times out, is failed as well, e.g. while the
+    record read is not found yet. If the last attempt raised, the
+    verification gets the status of its error instead of FAILED.
+"""
+import random
+import time
+
+DEFAULT_INTERVAL = 0.1
+DEFAULT_DEADLINE = 10
+
+
+class Polling(object):
+
+    def __init__(self, interval=DEFAULT_INTERVAL, backoff=1, max_interval=None,
+                 jitter=0, deadline=DEFAULT_DEADLINE, max_attempts=None):
+        """
+        Define how a result function is polled
+        :param interval: <float> Seconds to wait before the second attempt
+        :param backoff: <float> The wait is multiplied by it after every attempt
+        :param max_interval: <float> Max seconds to wait between two attempts
+        :param jitter: <float> between 0 and 1. Every wait is randomly
+            lengthened or shortened up to this fraction of it, so the flows
+            do not poll in lockstep
+        :param deadline: <float> No attempt is started later than these seconds
+            after the first one. The verification fails if the result function
+            has not returned True by then
+        :param max_attempts: <int> Max number of attempts, if given
+        """
+        if interval < 0 or backoff < 1 or not 0 <= jitter <= 1:
+            raise ValueError("The interval cannot be negative, the backoff lower "
+                             "than 1, nor the jitter out of [0, 1]")
+        if max_attempts is not None and max_attempts < 1:
+            raise ValueError("max_attempts must be positive")
+        self.interval = interval
+        self.backoff = backoff
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+
+    def delays(self):
+        """
+        :return: <generator>.<float> The seconds to wait before every attempt.
+            The first attempt does not wait, and it stops once the attempts are
+            exhausted or the next one would start after the deadline
+        """
+        start = time.monotonic()
+        yield 0
+        interval = self.interval
+        attempts = 1
+        while self.max_attempts is None or attempts < self.max_attempts:
+            delay = interval
+            if self.jitter:
+                delay *= 1 + random.uniform(-self.jitter, self.jitter)
+            if time.monotonic() + delay - start > self.deadline:
+                return
+            yield delay
+            attempts += 1
+            interval *= self.backoff
+            if self.max_interval is not None:
+                interval = min(interval, self.max_interval)
@@ -0,0 +1,170 @@
+"""
+    Sampling per-task profiler. A real OS thread samples the stacks of the
+    running threads at a given interval, and every sample whose stack is
+    running a task of a FlowPath is aggregated under that task name, so the hot
+    spots of the client side CPU are reported by task.
+
+    A deterministic profiler such as cProfile cannot tell the flows apart, as
+    the greenlets or coroutines of every flow interleave in the same thread.
+    The stack of a sample does tell which task it belongs to. Under gevent or
+    asyncio, a task waiting on IO is not on any stack, so the samples
+    approximate the CPU time.
+
+    The number of calls and the traced times by task come from the task_end
+    and verification_end events.
+"""
+import collections
+import json
+import sys
+
+from .core import TASK_FRAME_CODES
+from .events import TASK_END, VERIFICATION_END
+
+DEFAULT_INTERVAL = 0.005
+DEFAULT_TOP = 10
+
+
+def _original_thread_functions():
+    """
+    :return: <tuple> The start_new_thread, allocate_lock, get_ident and sleep
+        functions of the standard library, even if gevent has patched them
+    """
+    import _thread
+    import time
+    if "gevent.monkey" in sys.modules:
+        from gevent import monkey
+        return tuple(monkey.get_original(module, name) for module, name in (
+            ("_thread", "start_new_thread"), ("_thread", "allocate_lock"),
+            ("_thread", "get_ident"), ("time", "sleep")))
+    return (_thread.start_new_thread, _thread.allocate_lock, _thread.get_ident,
+            time.sleep)
+
+
+def _function_label(code):
+    return "{} ({}:{})".format(code.co_name, code.co_filename,
+                               code.co_firstlineno)
+
+
+class TaskProfiler(object):
+
+    def __init__(self, interval=DEFAULT_INTERVAL):
+        """
+        :param interval: <float> Seconds between samples
+        """
+        if interval <= 0:
+            raise ValueError("The sampling interval must be positive")
+        self.interval = interval
+        # <dict> by task name: the calls and traced times, and the samples
+        self.calls = collections.Counter()
+        self.execution_ns = collections.Counter()
+        self.verification_ns = collections.Counter()
+        self.samples = collections.Counter()
+        self.self_samples = collections.defaultdict(collections.Counter)
+        self.cumulative_samples = collections.defaultdict(collections.Counter)
+
+        self.__running = False
+        self.__stopped = None
+
+    def attach(self, events):
+        """
+        Listen to the task events
+        :param events: <EventHooks>
+        :return:
+        """
+        events.add_listener(TASK_END, self.__on_task_end)
+        events.add_listener(VERIFICATION_END, self.__on_verification_end)
+
+    def __on_task_end(self, flow_path, task, record):
+        self.calls[task.name] += 1
+        self.execution_ns[task.name] += record.execution_ns or 0
+
+    def __on_verification_end(self, flow_path, task, record):
+        self.verification_ns[task.name] += record.verification_ns or 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        if self.__running:
+            return
+        start_new_thread, allocate_lock, get_ident, sleep = \
+            _original_thread_functions()
+        self.__stopped = allocate_lock()
+        self.__stopped.acquire()
+        self.__running = True
+        start_new_thread(self.__sample_loop, (get_ident, sleep))
+
+    def stop(self):
+        """
+        Stop sampling, once the sampler thread has finished
+        :return:
+        """
+        if not self.__running:
+            return
+        self.__running = False
+        self.__stopped.acquire()
+        self.__stopped.release()
+
+    def __sample_loop(self, get_ident, sleep):
+        own_thread = get_ident()
+        try:
+            while self.__running:
+                sleep(self.interval)
+                self.__sample(own_thread)
+        finally:
+            self.__stopped.release()
+
+    def __sample(self, own_thread):
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread:
+                continue
+            stack = []
+            while frame is not None and frame.f_code not in TASK_FRAME_CODES:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            if frame is None or not stack:
+                continue
+            task = frame.f_locals.get("task")
+            if task is None:
+                continue
+            self.samples[task.name] += 1
+            self.self_samples[task.name][stack[0]] += 1
+            for code in set(stack):
+                self.cumulative_samples[task.name][code] += 1
+
+    def report(self, top=DEFAULT_TOP):
+        """
+        :param top: <int> The number of hot spots to report by task
+        :return: <dict> By task name: the calls, the traced execution and
+            verification times and the sampled CPU time, in milliseconds, and
+            the functions with most samples, with the percentage of the task
+            samples they were running (self) or on the stack (cumulative)
+        """
+        report = {}
+        for task_name in set(self.calls) | set(self.samples):
+            samples = self.samples[task_name]
+            self_samples = self.self_samples[task_name]
+            hot_spots = [
+                {"function": _function_label(code),
+                 "self": count * 100 / samples,
+                 "cumulative": (self.cumulative_samples[task_name][code] * 100
+                                / samples)}
+                for code, count in self_samples.most_common(top)
+            ]
+            report[task_name] = {
+                "calls": self.calls[task_name],
+                "execution_time": self.execution_ns[task_name] / 1e6,
+                "verification_time": self.verification_ns[task_name] / 1e6,
+                "samples": samples,
+                "sampled_cpu_time": samples * self.interval * 1000,
+                "hot_spots": hot_spots,
+            }
+        return report
+
+    def write(self, path, top=DEFAULT_TOP):
+        with open(path, "w") as report_file:
+            json.dump(self.report(top), report_file, indent=4)
@@ -0,0 +1,233 @@
+"""
+    Live progress of the runs. The flows and tasks update the counters of a
+    RunProgress as they finish, which are plain attributes, so the hot path
+    takes no locks. A ProgressReporter reads them at a given interval and
+    emits rolling snapshots: the flows started and finished by status, the
+    throughput and the task latencies since the previous snapshot.
+
+    The snapshots are written to stderr, and they can be served as JSON on a
+    local HTTP endpoint as well.
+"""
+import json
+import sys
+import threading
+import time
+
+from .histogram import LatencyStats
+
+SNAPSHOT_PERCENTILES = (50, 95, 99)
+
+
+class RunProgress(object):
+    """
+    The counters of the flows and tasks of a run. Set it as the progress
+    attribute of the FlowPath and ConcurrentFlows instances to follow
+    """
+    def __init__(self):
+        self.start = time.monotonic()
+        self.flows_started = 0
+        self.flows_finished = 0
+        self.flows_failed = 0
+        self.flows_errored = 0
+        self.flows_timed_out = 0
+        self.tasks_finished = 0
+        # The task latencies since the last snapshot. The window is replaced
+        # when a snapshot is taken instead of being locked
+        self.window = LatencyStats()
+        self.__window_start = self.start
+        self.__window_tasks = 0
+        self.__window_flows = 0
+
+    def flow_started(self):
+        self.flows_started += 1
+
+    def flow_finished(self, record):
+        """
+        :param record: <FlowRecord> The trace of the finished flow
+        :return:
+        """
+        self.flows_finished += 1
+        if record.status == "FAILED":
+            self.flows_failed += 1
+        elif record.status == "ERROR":
+            self.flows_errored += 1
+        elif record.status == "TIMEOUT":
+            self.flows_timed_out += 1
+
+    def task_finished(self, task_name, task_record):
+        """
+        :param task_name: <str>
+        :param task_record: <TaskRecord> The trace of the finished task
+        :return:
+        """
+        self.tasks_finished += 1
+        execution_ns = task_record.execution_ns
+        if execution_ns is not None:
+            self.window.record_execution(task_name, execution_ns // 1000)
+        verification_ns = task_record.verification_ns
+        if verification_ns is not None:
+            self.window.record_verification(task_name, verification_ns // 1000)
+
+    def add_records(self, records):
+        """
+        Account the flows run somewhere else, e.g. by the worker processes
+        :param records: <iterable>.<FlowRecord>
+        :return:
+        """
+        for record in records:
+            self.flow_started()
+            for task_name, task_record in record.tasks.items():
+                self.task_finished(task_name, task_record)
+            self.flow_finished(record)
+
+    def snapshot(self, percentiles=SNAPSHOT_PERCENTILES):
+        """
+        Take a rolling snapshot. The rates and latencies cover the time since
+        the previous snapshot
+        :param percentiles: <tuple>.<float> The latency percentiles to report
+        :return: <dict>
+        """
+        now = time.monotonic()
+        window, self.window = self.window, LatencyStats()
+        window_seconds = now - self.__window_start
+        tasks, flows = self.tasks_finished, self.flows_finished
+        window_tasks = tasks - self.__window_tasks
+        window_flows = flows - self.__window_flows
+        self.__window_start = now
+        self.__window_tasks, self.__window_flows = tasks, flows
+
+        return {
+            "elapsed": now - self.start,
+            "flows": {
+                "started": self.flows_started,
+                "in_flight": self.flows_started - flows,
+                "finished": flows,
+                "failed": self.flows_failed,
+                "errored": self.flows_errored,
+                "timed_out": self.flows_timed_out,
+            },
+            "tasks_finished": tasks,
+            "flows_per_second": (window_flows / window_seconds
+                                 if window_seconds else None),
+            "tasks_per_second": (window_tasks / window_seconds
+                                 if window_seconds else None),
+            "tasks": window.report(percentiles)["tasks"],
+        }
+
+
+def format_snapshot(snapshot):
+    """
+    :param snapshot: <dict> A RunProgress snapshot
+    :return: <str> A one line summary
+    """
+    flows = snapshot["flows"]
+    line = ("[{:.1f}s] flows started={} in_flight={} finished={} failed={} "
+            "errored={} timed_out={} | {:.1f} tasks/s".format(
+                snapshot["elapsed"], flows["started"], flows["in_flight"],
+                flows["finished"], flows["failed"], flows["errored"],
+                flows["timed_out"], snapshot["tasks_per_second"] or 0))
+    for task_name, latencies in sorted(snapshot["tasks"].items()):
+        execution = latencies.get(LatencyStats.EXECUTION)
+        if execution is None:
+            continue
+        line += " | {} {}".format(task_name, " ".join(
+            "{}={:.1f}ms".format(k, v) for k, v in execution.items()
+            if k.startswith("p") and v is not None))
+    return line
+
+
+class ProgressReporter(object):
+
+    def __init__(self, progress, interval=5, output=None, http_port=None,
+                 http_host="127.0.0.1"):
+        """
+        Emit the snapshots of a RunProgress periodically, from a background
+        thread (a greenlet once gevent has patched the standard library)
+        :param progress: <RunProgress>
+        :param interval: <float> Seconds between snapshots
+        :param output: A text stream to write the snapshots to. Default: stderr
+        :param http_port: <int> If given, the last snapshot is served as JSON
+            on this port. Use 0 to get any free one
+        :param http_host: <str> The address the HTTP endpoint listens on
+        """
+        if interval <= 0:
+            raise ValueError("The progress interval must be positive")
+        self.progress = progress
+        self.interval = interval
+        self.output = output
+        self.last_snapshot = None
+
+        self.__stop = threading.Event()
+        self.__thread = None
+        self.__server = None
+        if http_port is not None:
+            self.__server = self.__create_server(http_host, http_port)
+
+    def __create_server(self, host, port):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        reporter = self
+
+        class SnapshotHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(reporter.last_snapshot).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return ThreadingHTTPServer((host, port), SnapshotHandler)
+
+    @property
+    def address(self):
+        """
+        :return: <tuple> The HTTP endpoint address, or None
+        """
+        return None if self.__server is None else self.__server.server_address
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def report(self):
+        """
+        Take a snapshot and write it
+        :return: <dict> The snapshot
+        """
+        self.last_snapshot = self.progress.snapshot()
+        output = self.output or sys.stderr
+        output.write(format_snapshot(self.last_snapshot) + "\n")
+        output.flush()
+        return self.last_snapshot
+
+    def __loop(self):
+        while not self.__stop.wait(self.interval):
+            self.report()
+
+    def start(self):
+        self.__stop.clear()
+        self.__thread = threading.Thread(target=self.__loop, daemon=True)
+        self.__thread.start()
+        if self.__server is not None:
+            threading.Thread(target=self.__server.serve_forever,
+                             daemon=True).start()
+
+    def stop(self):
+        """
+        Stop reporting, after writing a last snapshot
+        :return:
+        """
+        self.__stop.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        self.report()
+        if self.__server is not None:
+            self.__server.shutdown()
+            self.__server.server_close()
@@ -0,0 +1,189 @@
+"""
+    Compact trace records. The flows and tasks traces are kept in __slots__
+    records while running, and they are only converted to the log dictionary
+    shape (see log_config) when the logs are serialized or read.
+
+    The records keep the raw clock_ns timestamps, while the durations in the
+    log dictionaries are milliseconds, formatted with the configured precision.
+"""
+from .helpers import format_duration
+
+
+def _duration(start_ns, end_ns):
+    if start_ns is None or end_ns is None:
+        return None
+    return end_ns - start_ns
+
+
+class TaskRecord(object):
+    __slots__ = ("start_ns", "end_ns", "verification_start_ns",
+                 "verification_end_ns", "task_status", "verification_status",
+                 "pool_wait_ns", "queue_wait_ns", "verification_queue_wait_ns",
+                 "verification_attempts", "cache", "resumed")
+
+    def __init__(self):
+        self.start_ns = None
+        self.end_ns = None
+        self.verification_start_ns = None
+        self.verification_end_ns = None
+        self.task_status = None
+        self.verification_status = None
+        # The time spent waiting for the resource pools, included in the
+        # execution and verification times
+        self.pool_wait_ns = None
+        # The time the task function, and the result function, offloaded to a
+        # thread or process pool spent queued for a free worker. They are
+        # included in the execution and verification times respectively, which
+        # are the ones aggregated in the stats, while the net times leave them
+        # out
+        self.queue_wait_ns = None
+        self.verification_queue_wait_ns = None
+        # The times the result function was called, more than once if it was
+        # polled until it converged
+        self.verification_attempts = None
+        # HIT or MISS if the task result is shared by the flows
+        self.cache = None
+        # True if the task was run by a previous run of a resumed flow
+        self.resumed = False
+
+    @property
+    def execution_ns(self):
+        return _duration(self.start_ns, self.end_ns)
+
+    @property
+    def verification_ns(self):
+        return _duration(self.verification_start_ns, self.verification_end_ns)
+
+    @property
+    def net_execution_ns(self):
+        """
+        :return: <int> The execution time but the time queued for a worker
+        """
+        execution_ns = self.execution_ns
+        if execution_ns is None:
+            return None
+        return execution_ns - (self.queue_wait_ns or 0)
+
+    @property
+    def net_verification_ns(self):
+        """
+        :return: <int> The verification time but the time queued for a worker
+        """
+        verification_ns = self.verification_ns
+        if verification_ns is None:
+            return None
+        return verification_ns - (self.verification_queue_wait_ns or 0)
+
+    def to_dict(self, flow_start_ns=None):
+        return {
+            "execution_time": format_duration(self.execution_ns),
+            "verification_time": format_duration(self.verification_ns),
+            "net_execution_time": format_duration(self.net_execution_ns),
+            "net_verification_time": format_duration(self.net_verification_ns),
+            "start_offset": format_duration(_duration(flow_start_ns,
+                                                      self.start_ns)),
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "verification_start_ns": self.verification_start_ns,
+            "verification_end_ns": self.verification_end_ns,
+            "pool_wait_time": format_duration(self.pool_wait_ns),
+            "queue_wait_time": format_duration(self.queue_wait_ns),
+            "verification_queue_wait_time": format_duration(
+                self.verification_queue_wait_ns),
+            "verification_attempts": self.verification_attempts,
+            "cache": self.cache,
+            "resumed": self.resumed,
+            "status": {
+                "task": self.task_status,
+                "verification": self.verification_status
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, task_dict):
+        """
+        :param task_dict: <dict> A task log, e.g. the one of a checkpoint
+        :return: <TaskRecord> The record the log was built from. The pool and
+            queue wait times are rounded to the log precision
+        """
+        record = cls()
+        record.start_ns = task_dict.get("start_ns")
+        record.end_ns = task_dict.get("end_ns")
+        record.verification_start_ns = task_dict.get("verification_start_ns")
+        record.verification_end_ns = task_dict.get("verification_end_ns")
+        status = task_dict.get("status") or {}
+        record.task_status = status.get("task")
+        record.verification_status = status.get("verification")
+        pool_wait_time = task_dict.get("pool_wait_time")
+        if pool_wait_time is not None:
+            record.pool_wait_ns = round(pool_wait_time * 10**6)
+        queue_wait_time = task_dict.get("queue_wait_time")
+        if queue_wait_time is not None:
+            record.queue_wait_ns = round(queue_wait_time * 10**6)
+        verification_queue_wait_time = task_dict.get(
+            "verification_queue_wait_time")
+        if verification_queue_wait_time is not None:
+            record.verification_queue_wait_ns = round(
+                verification_queue_wait_time * 10**6)
+        record.verification_attempts = task_dict.get("verification_attempts")
+        record.cache = task_dict.get("cache")
+        record.resumed = bool(task_dict.get("resumed"))
+        return record
+
+
+class FlowRecord(object):
+    __slots__ = ("status", "path", "total_execution_ns", "total_verification_ns",
+                 "start_ns", "end_ns", "executed_path", "phase", "concurrency",
+                 "iteration", "intended_start_ns", "tasks")
+
+    def __init__(self):
+        self.status = ""
+        self.path = []
+        self.total_execution_ns = None
+        self.total_verification_ns = None
+        self.start_ns = None
+        self.end_ns = None
+        self.executed_path = []
+        self.phase = None
+        self.concurrency = None
+        # The iteration of its flow slot, when the flows are soak tested
+        self.iteration = None
+        # The time the flow was scheduled to start at, when the flows are
+        # started at an arrival rate
+        self.intended_start_ns = None
+        # <dict>.<TaskRecord> by task name
+        self.tasks = {}
+
+    @property
+    def elapsed_ns(self):
+        return _duration(self.start_ns, self.end_ns)
+
+    @property
+    def latency_ns(self):
+        """
+        :return: <int> The elapsed time since the flow was scheduled to start,
+            so the time it waited for a late start is accounted as well
+        """
+        if self.intended_start_ns is None:
+            return self.elapsed_ns
+        return _duration(self.intended_start_ns, self.end_ns)
+
+    def to_dict(self):
+        return {
+            "status": self.status,
+            "path": list(self.path),
+            "total_execution_time": format_duration(self.total_execution_ns),
+            "total_verification_time": format_duration(self.total_verification_ns),
+            "total_elapsed_time": format_duration(self.elapsed_ns),
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "executed_path": list(self.executed_path),
+            "phase": self.phase,
+            "concurrency": self.concurrency,
+            "iteration": self.iteration,
+            "intended_start_ns": self.intended_start_ns,
+            "start_lag": format_duration(_duration(self.intended_start_ns,
+                                                   self.start_ns)),
+            "tasks": {name: task.to_dict(self.start_ns)
+                      for name, task in self.tasks.items()}
+        }
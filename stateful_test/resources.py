@@ -0,0 +1,278 @@
+"""
+    Pooled shared resources, e.g. HTTP sessions or database connections, which
+    are reused across the tasks of every flow instead of being opened on every
+    call.
+
+    A ResourcePool given in the arguments of a Task (or its result function)
+    is replaced by one of its instances while the function runs, in the same
+    way a TaskResult place holder is replaced by a task result. The instance is
+    given back to the pool as soon as the function returns, and the time spent
+    waiting for a free one is recorded in the task trace.
+
+    The instances are created on demand, up to the pool size. A
+    ConcurrentFlows run tears down the idle instances of the pools its tasks
+    use as it ends, and close_pools tears down every instance, e.g. at the end
+    of a CLI run.
+"""
+import collections
+import itertools
+import os
+import queue
+import threading
+import traceback
+import weakref
+
+from .helpers import clock_ns
+
+DEFAULT_POOL_SIZE = 10
+
+# Every pool, so they can be closed at the end of the run
+_pools = weakref.WeakSet()
+
+
+class ResourcePoolTimeout(Exception):
+    def __init__(self, pool_name, timeout):
+        super().__init__("No instance of the resource pool {} was free after "
+                         "{} seconds!!".format(pool_name, timeout))
+
+
+class ResourcePool(object):
+
+    def __init__(self, name, factory, size=DEFAULT_POOL_SIZE, teardown=None,
+                 timeout=None):
+        """
+        Define a pool of shared resources
+        :param name: <str> The pool name
+        :param factory: <function> Called with no arguments to create a new
+            instance, e.g. requests.Session
+        :param size: <int> The max number of instances. Once they are all in
+            use, the tasks wait for one to be given back
+        :param teardown: <function> Called with every instance when the pool is
+            closed, e.g. lambda session: session.close()
+        :param timeout: <float> Max seconds to wait for a free instance. The
+            task fails if it is exceeded. Wait forever if None
+        """
+        if not isinstance(size, int) or size < 1:
+            raise ValueError("The pool size must be a positive integer")
+        self.name = name
+        self.factory = factory
+        self.size = size
+        self.teardown = teardown
+        self.timeout = timeout
+        self.discard()
+        _pools.add(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def discard(self):
+        """
+        Forget every instance without tearing them down, e.g. the instances a
+        forked process has inherited from its parent
+        :return:
+        """
+        self.__idle = queue.LifoQueue()
+        self.__instances = []
+        self.__lock = threading.Lock()
+        # The asyncio futures waiting for an instance to be given back
+        self.__waiters = collections.deque()
+
+    def __reserve(self):
+        with self.__lock:
+            if len(self.__instances) >= self.size:
+                return False
+            self.__instances.append(None)
+            return True
+
+    def __create(self):
+        try:
+            instance = self.factory()
+        except Exception:
+            with self.__lock:
+                self.__instances.remove(None)
+            raise
+        with self.__lock:
+            self.__instances[self.__instances.index(None)] = instance
+        return instance
+
+    def acquire(self):
+        """
+        Check out a free instance, creating it if the pool is not full yet, or
+        wait for one to be given back. Under gevent, the wait only blocks the
+        current greenlet
+        :return: The instance
+        """
+        try:
+            return self.__idle.get_nowait()
+        except queue.Empty:
+            pass
+        if self.__reserve():
+            return self.__create()
+        try:
+            return self.__idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise ResourcePoolTimeout(self.name, self.timeout)
+
+    async def acquire_async(self):
+        """
+        The acquire counterpart to be awaited from an asyncio event loop
+        :return: The instance
+        """
+        import asyncio
+        try:
+            return self.__idle.get_nowait()
+        except queue.Empty:
+            pass
+        if self.__reserve():
+            return self.__create()
+        waiter = asyncio.get_running_loop().create_future()
+        self.__waiters.append(waiter)
+        try:
+            return await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            raise ResourcePoolTimeout(self.name, self.timeout)
+
+    def release(self, instance):
+        """
+        Give an instance back to the pool
+        :param instance:
+        :return:
+        """
+        while self.__waiters:
+            waiter = self.__waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(instance)
+                return
+        self.__idle.put(instance)
+
+    def close_idle(self):
+        """
+        Tear down the instances nobody has checked out. The ones in use are
+        kept, and the pool creates new instances if it is used again
+        :return:
+        """
+        instances = []
+        while True:
+            try:
+                instances.append(self.__idle.get_nowait())
+            except queue.Empty:
+                break
+        with self.__lock:
+            for instance in instances:
+                self.__instances.remove(instance)
+        self.__teardown(instances)
+
+    def close(self):
+        """
+        Tear down every instance created by the pool. New instances are created
+        if the pool is used again
+        :return:
+        """
+        with self.__lock:
+            instances = [i for i in self.__instances if i is not None]
+        self.discard()
+        self.__teardown(instances)
+
+    def __teardown(self, instances):
+        if self.teardown is None:
+            return
+        for instance in instances:
+            try:
+                self.teardown(instance)
+            except Exception:
+                traceback.print_exc()
+
+
+def close_pools():
+    """
+    Close every resource pool
+    :return:
+    """
+    for pool in list(_pools):
+        pool.close()
+
+
+def _discard_pools():
+    for pool in list(_pools):
+        pool.discard()
+
+
+if hasattr(os, "register_at_fork"):
+    # The connections must not be shared with the parent process
+    os.register_at_fork(after_in_child=_discard_pools)
+
+
+def pools_in(values):
+    """
+    :param values: The arguments of a function
+    :return: <list>.<ResourcePool> The pools given in the arguments
+    """
+    return list(dict.fromkeys(v for v in values if isinstance(v, ResourcePool)))
+
+
+def _pools_in(args, kwargs):
+    return pools_in(itertools.chain(args, kwargs.values()))
+
+
+def _substitute(args, kwargs, instances):
+    return ([instances.get(a, a) if isinstance(a, ResourcePool) else a
+             for a in args],
+            {k: instances.get(v, v) if isinstance(v, ResourcePool) else v
+             for k, v in kwargs.items()})
+
+
+def checkout(args, kwargs):
+    """
+    Replace the pools given in the function arguments with one of their
+    instances each
+    :param args: <list>
+    :param kwargs: <dict>
+    :return: <tuple> The new args and kwargs, the checked out instances by
+        pool, and the nanoseconds spent waiting for them
+    """
+    pools = _pools_in(args, kwargs)
+    if not pools:
+        return args, kwargs, None, 0
+    start_ns = clock_ns()
+    instances = {}
+    try:
+        for pool in pools:
+            instances[pool] = pool.acquire()
+    except Exception:
+        release(instances)
+        raise
+    wait_ns = clock_ns() - start_ns
+    return _substitute(args, kwargs, instances) + (instances, wait_ns)
+
+
+async def checkout_async(args, kwargs):
+    """
+    The checkout counterpart to be awaited from an asyncio event loop
+    """
+    pools = _pools_in(args, kwargs)
+    if not pools:
+        return args, kwargs, None, 0
+    start_ns = clock_ns()
+    instances = {}
+    try:
+        for pool in pools:
+            instances[pool] = await pool.acquire_async()
+    except Exception:
+        release(instances)
+        raise
+    wait_ns = clock_ns() - start_ns
+    return _substitute(args, kwargs, instances) + (instances, wait_ns)
+
+
+def release(instances):
+    """
+    Give the checked out instances back to their pools
+    :param instances: <dict> The instances by pool, or None
+    :return:
+    """
+    if instances:
+        for pool, instance in instances.items():
+            pool.release(instance)
@@ -0,0 +1,97 @@
+"""
+    Sharding of the flowfile targets across machines, e.g. CI workers. Every
+    shard is given by its 1-based index and the number of shards, as in
+    --shard 2/4, and it runs a stable subset of the targets: the same targets
+    and durations always give the same shards.
+
+    The targets are balanced by the wall time they took in previous runs,
+    read from the _timings of their result files. The longest targets are
+    assigned first, each one to the shard with the least time so far, and the
+    targets without a recorded duration weigh as the median one.
+"""
+import glob
+import json
+import logging
+import statistics
+
+from .sinks import JSONL_EXTENSION, read_jsonl
+
+TIMINGS_KEY = "_timings"
+DEFAULT_WEIGHT = 1.0
+
+
+def parse_shard(shard):
+    """
+    :param shard: <str> "i/n", with i between 1 and n
+    :return: <tuple> The 1-based shard index and the number of shards
+    """
+    try:
+        index, count = (int(part) for part in shard.split("/"))
+    except ValueError:
+        raise ValueError("The shard must be given as i/n, e.g. 1/4")
+    if not 1 <= index <= count:
+        raise ValueError("The shard index must be between 1 and {}"
+                         .format(count))
+    return index, count
+
+
+def load_durations(patterns):
+    """
+    :param patterns: <list>.<str> Paths or glob patterns of result files,
+        either JSON or JSON lines, or of JSON files mapping target names to
+        seconds
+    :return: <dict> The seconds every target took, by target name. A target
+        found in several files takes the latest one given
+    """
+    logger = logging.getLogger(__name__)
+    durations = {}
+    for pattern in patterns:
+        paths = sorted(glob.glob(pattern)) or [pattern]
+        for path in paths:
+            try:
+                if path.endswith(JSONL_EXTENSION):
+                    results = read_jsonl(path)
+                else:
+                    with open(path) as results_file:
+                        results = json.load(results_file)
+            except (OSError, ValueError) as e:
+                logger.warning("Ignoring the durations of {}: {}".format(path, e))
+                continue
+            timings = results.get(TIMINGS_KEY, results)
+            durations.update({name: seconds for name, seconds in timings.items()
+                              if isinstance(seconds, (int, float))})
+    return durations
+
+
+def partition(names, count, durations=None):
+    """
+    :param names: <list>.<str> The target names
+    :param count: <int> The number of shards
+    :param durations: <dict> The seconds the targets took, by target name
+    :return: <list>.<list>.<str> The target names of every shard, in the
+        given order
+    """
+    durations = durations or {}
+    known = [durations[name] for name in names if name in durations]
+    default = statistics.median(known) if known else DEFAULT_WEIGHT
+    weights = {name: durations.get(name, default) for name in names}
+
+    loads = [0.0] * count
+    assigned = {}
+    for name in sorted(names, key=lambda n: (-weights[n], n)):
+        shard = loads.index(min(loads))
+        assigned[name] = shard
+        loads[shard] += weights[name]
+    return [[name for name in names if assigned[name] == shard]
+            for shard in range(count)]
+
+
+def select_shard(names, shard, durations=None):
+    """
+    :param names: <list>.<str> The target names
+    :param shard: <tuple> The 1-based shard index and the number of shards
+    :param durations: <dict> The seconds the targets took, by target name
+    :return: <list>.<str> The target names of the shard
+    """
+    index, count = shard
+    return partition(names, count, durations)[index - 1]
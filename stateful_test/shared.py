@@ -0,0 +1,155 @@
+"""
+    Shared run-once tasks, e.g. fetching an auth token or seeding fixtures,
+    which every flow would otherwise repeat. A task defined as shared is run by
+    the first flow reaching it, and the flows reaching it while it is running
+    wait for that same run instead of repeating it. The following flows reuse
+    its result, until it expires, and every flow gets it as the task result, so
+    the other tasks use it through the TaskResult place holders as usual.
+
+    The results are shared by key, within a scope. The key is the task name
+    along with the module and qualified name of the task function, so the
+    tasks of different flowfiles which happen to have the same name do not
+    share their results, unless the task is given an explicit shared_key:
+
+    * run: the flows of the same ConcurrentFlows run. When the flows run on
+      several processes, every process shares its own results
+    * process: every flow run by the process, across the runs
+
+    The task trace tells whether the result was run (MISS) or shared (HIT).
+    A failed run is not shared with the following flows, which run the task
+    again, while the flows waiting for it fail as well.
+"""
+import os
+import threading
+import time
+
+RUN_SCOPE = "run"
+PROCESS_SCOPE = "process"
+SCOPES = (RUN_SCOPE, PROCESS_SCOPE)
+
+CACHE_HIT = "HIT"
+CACHE_MISS = "MISS"
+
+
+class _Entry(object):
+    __slots__ = ("done", "value", "error", "expires_at", "waiter")
+
+    def __init__(self, waiter):
+        self.done = False
+        self.value = None
+        self.error = None
+        self.expires_at = None
+        # Set once the run has finished, either way
+        self.waiter = waiter
+
+
+class SharedResults(object):
+    """
+    The results of the shared tasks of a scope, by shared key
+    """
+    def __init__(self):
+        self.discard()
+
+    def discard(self):
+        """
+        Forget every result, e.g. the ones a forked process has inherited from
+        its parent
+        :return:
+        """
+        self.__entries = {}
+        self.__lock = threading.Lock()
+
+    def __enter(self, key, create_waiter):
+        """
+        :return: <tuple> The entry of the key, and whether it has just been
+            created, so the caller must run the task
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if (entry is not None and entry.done
+                    and entry.expires_at is not None
+                    and time.monotonic() >= entry.expires_at):
+                entry = None
+            if entry is not None:
+                return entry, False
+            entry = _Entry(create_waiter())
+            self.__entries[key] = entry
+            return entry, True
+
+    def __finish(self, key, entry, ttl):
+        with self.__lock:
+            if entry.done:
+                entry.expires_at = (None if ttl is None
+                                    else time.monotonic() + ttl)
+            elif self.__entries.get(key) is entry:
+                # Failed or cancelled, so the next flow runs it again
+                del self.__entries[key]
+        entry.waiter.set()
+
+    @staticmethod
+    def __shared(entry):
+        if entry.done:
+            return True
+        if entry.error is not None:
+            raise entry.error
+        # The run was cancelled, try again
+        return False
+
+    def get_or_run(self, key, ttl, function):
+        """
+        Run the function, unless its result is already shared or being run.
+        Under gevent, the wait only blocks the current greenlet
+        :param key: The shared key of the task
+        :param ttl: <float> Seconds the result is shared for. Forever if None
+        :param function: <function> Called with no arguments to get the result
+        :return: <tuple> CACHE_HIT or CACHE_MISS, and the result
+        """
+        while True:
+            entry, created = self.__enter(key, threading.Event)
+            if created:
+                break
+            entry.waiter.wait()
+            if self.__shared(entry):
+                return CACHE_HIT, entry.value
+        try:
+            entry.value = function()
+            entry.done = True
+        except Exception as e:
+            entry.error = e
+            raise
+        finally:
+            self.__finish(key, entry, ttl)
+        return CACHE_MISS, entry.value
+
+    async def get_or_run_async(self, key, ttl, coroutine_function):
+        """
+        The get_or_run counterpart to be awaited from an asyncio event loop
+        :param coroutine_function: <function> Called with no arguments to get
+            the awaitable result
+        """
+        import asyncio
+        while True:
+            entry, created = self.__enter(key, asyncio.Event)
+            if created:
+                break
+            await entry.waiter.wait()
+            if self.__shared(entry):
+                return CACHE_HIT, entry.value
+        try:
+            entry.value = await coroutine_function()
+            entry.done = True
+        except Exception as e:
+            entry.error = e
+            raise
+        finally:
+            self.__finish(key, entry, ttl)
+        return CACHE_MISS, entry.value
+
+
+# The results shared by every flow of the process
+process_results = SharedResults()
+
+
+if hasattr(os, "register_at_fork"):
+    # A forked process shares its own results
+    os.register_at_fork(after_in_child=process_results.discard)
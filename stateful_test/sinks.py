@@ -0,0 +1,94 @@
+"""
+    Incremental result streaming. Instead of dumping every log at the end of the
+    run, a JsonlSink appends one compact JSON line per finished flow as soon as
+    it completes, so a crash only loses the lines still in the write buffer.
+    The read_jsonl function rebuilds the nested output write_log produces.
+"""
+import json
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_BUFFER_SIZE = 1 << 16
+
+JSONL_EXTENSION = ".jsonl"
+
+
+class JsonlSink(object):
+
+    def __init__(self, output, batch_size=DEFAULT_BATCH_SIZE, append=False):
+        """
+        :param output: <str> The path of the JSON lines file, or an already open
+            text file object
+        :param batch_size: <int> The number of lines buffered before writing them
+        :param append: <bool> Append to the file instead of truncating it
+        """
+        if isinstance(output, str):
+            self.file = open(output, "a" if append else "w",
+                             buffering=DEFAULT_BUFFER_SIZE)
+            self.__close_file = True
+        else:
+            self.file = output
+            self.__close_file = False
+        self.batch_size = batch_size
+
+        self.__lines = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __write(self, record):
+        self.__lines.append(json.dumps(record, separators=(",", ":")))
+        if len(self.__lines) >= self.batch_size:
+            self.flush()
+
+    def write_flow(self, target, flow_id, log):
+        """
+        Stream the log of one of the flows of a ConcurrentFlows target
+        :param target: <str> The ConcurrentFlows name
+        :param flow_id: The flow id
+        :param log: <dict> The flow log
+        :return:
+        """
+        self.__write({"target": target, "flow_id": flow_id, "log": log})
+
+    def write_target(self, target, log):
+        """
+        Stream the whole output of a target, e.g. the log of a FlowPath
+        :param target: <str> The target name
+        :param log: <dict>
+        :return:
+        """
+        self.__write({"target": target, "log": log})
+
+    def flush(self):
+        if self.__lines:
+            self.file.write("\n".join(self.__lines) + "\n")
+            self.__lines = []
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        if self.__close_file:
+            self.file.close()
+
+
+def read_jsonl(path):
+    """
+    Rebuild the nested output, by target name, from a JSON lines file
+    :param path: <str>
+    :return: <dict>
+    """
+    out_dict = {}
+    with open(path) as jsonl_file:
+        for line in jsonl_file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "flow_id" in record:
+                flow_logs = out_dict.setdefault(record["target"], {})
+                flow_logs[record["flow_id"]] = record["log"]
+            else:
+                out_dict[record["target"]] = record["log"]
+    return out_dict
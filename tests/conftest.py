@@ -0,0 +1,5 @@
+from stateful_test import patch_gevent
+
+# The flows of the tests run with gevent, so patch before any test module
+# imports libraries like ssl
+patch_gevent()
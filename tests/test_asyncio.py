@@ -0,0 +1,91 @@
+"""
+    tests.asyncio
+
+    The asyncio execution engine
+
+"""
+import asyncio
+
+from stateful_test import core
+
+
+class TestAsyncioEngine(object):
+
+    async def __fetch(self, in_flight, max_in_flight):
+        in_flight.append(1)
+        max_in_flight[0] = max(max_in_flight[0], len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.pop()
+        return 200
+
+    async def __check_status(self, status):
+        await asyncio.sleep(0)
+        return status == 200
+
+    def __create_flow_path(self, in_flight, max_in_flight):
+        task = core.Task("fetch", self.__fetch, [in_flight, max_in_flight])
+        task.add_result_function(self.__check_status, core.TaskResult())
+        return core.FlowPath(task)
+
+    def __create_concurrent_flows(self, flow_no, in_flight, max_in_flight):
+        return core.ConcurrentFlows(
+            flow_factory=lambda fid: self.__create_flow_path(in_flight,
+                                                             max_in_flight),
+            flow_count=flow_no)
+
+    def test_at_once(self):
+        in_flight, max_in_flight = [], [0]
+        concurrent_flow = self.__create_concurrent_flows(20, in_flight,
+                                                         max_in_flight)
+        logs = concurrent_flow.run({"backend": "asyncio"})
+        assert len(logs) == 20
+        assert all(log["status"] == "SUCCESS" for log in logs.values())
+        assert max_in_flight[0] == 20
+
+    def test_bounded_concurrency(self):
+        in_flight, max_in_flight = [], [0]
+        concurrent_flow = self.__create_concurrent_flows(20, in_flight,
+                                                         max_in_flight)
+        logs = concurrent_flow.run({"backend": "asyncio", "mode": "pool",
+                                    "pool_size": 4})
+        assert list(logs) == list(range(20))
+        assert max_in_flight[0] == 4
+        assert concurrent_flow.percentiles["tasks"]["fetch"]["execution"][
+            "count"] == 20
+
+    def test_ramp_up(self):
+        in_flight, max_in_flight = [], [0]
+        concurrent_flow = self.__create_concurrent_flows(30, in_flight,
+                                                         max_in_flight)
+        logs = concurrent_flow.run({"backend": "asyncio", "mode": "ramp_up",
+                                    "max_concurrency": 3, "ramp_time": 0.02})
+        assert len(logs) == 30
+        assert logs[29]["phase"] == "hold"
+
+    def test_run_async_in_running_loop(self):
+        in_flight, max_in_flight = [], [0]
+        concurrent_flow = self.__create_concurrent_flows(5, in_flight,
+                                                         max_in_flight)
+        logs = asyncio.run(concurrent_flow.run_async())
+        assert len(logs) == 5
+
+    def test_parallel_flow_path(self):
+        async def _sleep():
+            await asyncio.sleep(0.05)
+            return True
+
+        tasks = [core.Task("a", _sleep), core.Task("b", _sleep),
+                 core.Task("c", _sleep, depends_on=["a", "b"])]
+        log = asyncio.run(core.FlowPath(tasks, parallel=True).run_async())
+        assert log["status"] == "SUCCESS"
+        assert 100 <= log["total_elapsed_time"] < 150
+
+    def test_failed_async_result(self):
+        async def _false(result):
+            return False
+
+        task = core.Task("a", lambda: 1, result_function=_false,
+                         result_args=core.TaskResult())
+        log = asyncio.run(core.FlowPath(task).run_async())
+        assert log["status"] == "FAILED"
+        assert log["tasks"]["a"]["status"]["verification"] == "FAILED"
@@ -0,0 +1,123 @@
+"""
+    tests.checkpoint
+
+    Checkpoints and resumed flow paths
+
+"""
+import asyncio
+import json
+
+from stateful_test import core
+from stateful_test.checkpoint import Checkpoint
+
+
+class Scenario(object):
+    """
+    A flow of steps which fails at a given one until it is fixed
+    """
+    def __init__(self, failing=None):
+        self.calls = []
+        self.failing = failing
+
+    def step(self, name, previous=None):
+        self.calls.append(name)
+        if name == self.failing:
+            raise ValueError("Step {} failed".format(name))
+        return "{}+{}".format(previous, name) if previous else name
+
+    def flow_path(self, names, parallel=False, unserializable=()):
+        tasks = []
+        for i, name in enumerate(names):
+            previous = [core.TaskResult(names[i - 1])] if i else []
+            if name in unserializable:
+                tasks.append(core.Task(name, lambda: object()))
+            else:
+                tasks.append(core.Task(name, self.step, [name] + previous))
+        return core.FlowPath(tasks, parallel=parallel)
+
+
+class TestCheckpoint(object):
+
+    def __run(self, scenario, checkpoint, names, resume=False, **kwargs):
+        flow_path = scenario.flow_path(names, **kwargs)
+        flow_path.checkpoint = checkpoint
+        if resume:
+            flow_path.resume()
+        return flow_path.run()
+
+    def test_saved_after_every_task(self, tmp_path):
+        checkpoint = Checkpoint(str(tmp_path / "flow.json"))
+        log = self.__run(Scenario(failing="c"), checkpoint, ["a", "b", "c", "d"])
+        assert log["status"] == "ERROR"
+        state = checkpoint.load()
+        assert state["executed_path"] == ["a", "b"]
+        assert state["results"] == {"a": "a", "b": "a+b"}
+        assert set(state["trace"]["tasks"]) == {"a", "b"}
+
+    def test_resume_from_the_failed_task(self, tmp_path):
+        checkpoint = Checkpoint(str(tmp_path / "flow.json"))
+        names = ["a", "b", "c", "d"]
+        self.__run(Scenario(failing="c"), checkpoint, names)
+
+        scenario = Scenario()
+        log = self.__run(scenario, checkpoint, names, resume=True)
+        assert scenario.calls == ["c", "d"]
+        assert log["status"] == "SUCCESS"
+        assert log["executed_path"] == names
+        assert log["tasks"]["d"]["status"]["task"] == "SUCCESS"
+        assert log["tasks"]["a"]["resumed"] is True
+        assert log["tasks"]["c"]["resumed"] is False
+        # The flow succeeded, so the next run starts over
+        assert checkpoint.load() is None
+
+    def test_unserializable_result_is_run_again(self, tmp_path):
+        checkpoint = Checkpoint(str(tmp_path / "flow.json"))
+        names = ["a", "b", "c", "d"]
+        self.__run(Scenario(failing="d"), checkpoint, names,
+                   unserializable=["b"])
+        assert set(checkpoint.load()["results"]) == {"a", "c"}
+
+        scenario = Scenario()
+        flow_path = scenario.flow_path(names, unserializable=["b"])
+        flow_path.checkpoint = checkpoint
+        assert flow_path.resume() == ["a"]
+        assert flow_path.run()["status"] == "SUCCESS"
+
+    def test_parallel(self, tmp_path):
+        checkpoint = Checkpoint(str(tmp_path / "flow.json"))
+        names = ["a", "b", "c"]
+        self.__run(Scenario(failing="c"), checkpoint, names, parallel=True)
+
+        scenario = Scenario()
+        log = self.__run(scenario, checkpoint, names, resume=True,
+                         parallel=True)
+        assert scenario.calls == ["c"]
+        assert log["tasks"]["c"]["status"]["task"] == "SUCCESS"
+
+    def test_asyncio(self, tmp_path):
+        checkpoint = Checkpoint(str(tmp_path / "flow.json"))
+        names = ["a", "b", "c"]
+        flow_path = Scenario(failing="b").flow_path(names)
+        flow_path.checkpoint = checkpoint
+        asyncio.run(flow_path.run_async())
+
+        scenario = Scenario()
+        flow_path = scenario.flow_path(names)
+        flow_path.checkpoint = checkpoint
+        flow_path.resume()
+        log = asyncio.run(flow_path.run_async())
+        assert scenario.calls == ["b", "c"]
+        assert log["status"] == "SUCCESS"
+
+    def test_no_checkpoint(self, tmp_path):
+        flow_path = Scenario().flow_path(["a"])
+        flow_path.checkpoint = Checkpoint(str(tmp_path / "missing.json"))
+        assert flow_path.resume() == []
+
+    def test_saved_atomically(self, tmp_path):
+        checkpoint = Checkpoint.in_directory(str(tmp_path / "dir"), "target")
+        checkpoint.save({"executed_path": []})
+        assert list((tmp_path / "dir").iterdir()) == [
+            tmp_path / "dir" / "target.checkpoint.json"]
+        with open(checkpoint.path) as checkpoint_file:
+            assert json.load(checkpoint_file) == {"executed_path": []}
@@ -1,27 +1,377 @@
 from stateful_test import core
+from stateful_test.resources import ResourcePool
+import asyncio
+import gevent
+import gevent.monkey
+import os
+import pytest
 import requests
+import weakref
 
 
 class TestConcurrency(object):
 
     url = "http://www.example.com/"
 
-    def __request(self):
-        response = requests.get(self.url)
+    def __request(self, session):
+        response = session.get(self.url)
         return response
 
-    def __create_request_task(self):
-        t = core.Task("example_req", task_function=self.__request)
+    def __create_request_task(self, sessions):
+        t = core.Task("example_req", task_function=self.__request,
+                      task_args=[sessions])
         return t
 
-    def __create_flow_path(self):
-        tasks = [self.__create_request_task(), ]
+    def __create_flow_path(self, sessions):
+        tasks = [self.__create_request_task(sessions), ]
         return core.FlowPath(tasks)
 
     def test_concurrent_at_once(self):
         req_no = 5
-        flow_dict = {i: self.__create_flow_path() for i in range(req_no)}
-        concurrent_flow = core.ConcurrentFlows(flow_dict)
-        concurrent_flow.run()
+        with ResourcePool("sessions", requests.Session, size=2,
+                          teardown=lambda s: s.close()) as sessions:
+            flow_dict = {i: self.__create_flow_path(sessions)
+                         for i in range(req_no)}
+            concurrent_flow = core.ConcurrentFlows(flow_dict)
+            concurrent_flow.run()
         logs = concurrent_flow.logs
         assert len(logs) == 5
+
+
+class TestRunModes(object):
+
+    def __sleep(self, in_flight, max_in_flight):
+        in_flight.append(1)
+        max_in_flight[0] = max(max_in_flight[0], len(in_flight))
+        gevent.sleep(0.01)
+        in_flight.pop()
+
+    def __create_flow_dict(self, flow_no, in_flight, max_in_flight):
+        return {i: core.FlowPath(core.Task("sleep", self.__sleep,
+                                           [in_flight, max_in_flight]))
+                for i in range(flow_no)}
+
+    def test_pool_max_in_flight(self):
+        in_flight, max_in_flight = [], [0]
+        concurrent_flow = core.ConcurrentFlows(
+            self.__create_flow_dict(20, in_flight, max_in_flight))
+        logs = concurrent_flow.run({"mode": "pool", "pool_size": 3})
+        assert len(logs) == 20
+        assert max_in_flight[0] == 3
+        assert all(log["phase"] == "pool" for log in logs.values())
+        assert all(log["status"] == "SUCCESS" for log in logs.values())
+
+    def test_ramp_up_and_hold(self):
+        in_flight, max_in_flight = [], [0]
+        concurrent_flow = core.ConcurrentFlows(
+            self.__create_flow_dict(40, in_flight, max_in_flight))
+        logs = concurrent_flow.run({"mode": "ramp_up", "start_concurrency": 1,
+                                    "max_concurrency": 4, "ramp_time": 0.05,
+                                    "steps": 3})
+        assert len(logs) == 40
+        assert max_in_flight[0] <= 4
+        phases = [log["phase"] for log in logs.values()]
+        assert phases[0] == "ramp_up"
+        assert phases[-1] == "hold"
+        assert logs[0]["concurrency"] == 1
+        assert logs[39]["concurrency"] == 4
+
+    def test_hold_time_stops_new_flows(self):
+        in_flight, max_in_flight = [], [0]
+        concurrent_flow = core.ConcurrentFlows(
+            self.__create_flow_dict(100, in_flight, max_in_flight))
+        logs = concurrent_flow.run({"mode": "ramp_up", "max_concurrency": 2,
+                                    "hold_time": 0.03})
+        assert 0 < len(logs) < 100
+
+    def test_unknown_mode(self):
+        concurrent_flow = core.ConcurrentFlows({})
+        with pytest.raises(core.InvalidRunOptions):
+            concurrent_flow.run({"mode": "foo"})
+
+
+class TestMultiProcess(object):
+
+    def __pid(self):
+        return os.getpid()
+
+    def __result_pid(self, pid, pids, parent_pid):
+        pids.append(pid)
+        return pid != parent_pid
+
+    def __create_flow_path(self, pids):
+        t = core.Task("pid", self.__pid)
+        t.add_result_function(self.__result_pid,
+                              [core.TaskResult(), pids, os.getpid()])
+        return core.FlowPath(t)
+
+    def test_sharded_logs(self):
+        pids = []
+        flow_dict = {"flow_{}".format(i): self.__create_flow_path(pids)
+                     for i in range(10)}
+        concurrent_flow = core.ConcurrentFlows(flow_dict)
+        logs = concurrent_flow.run({"processes": 3, "mode": "pool",
+                                    "pool_size": 2})
+        assert list(logs) == list(flow_dict)
+        assert all(log["status"] == "SUCCESS" for log in logs.values())
+        assert all(log["phase"] == "pool" for log in logs.values())
+        # Flows ran in the worker processes, so nothing was recorded here
+        assert pids == []
+        assert concurrent_flow.percentiles["flows"]["count"] == 10
+
+    def test_arrival_rate_is_split(self):
+        flow_dict = {i: core.FlowPath(core.Task("pid", self.__pid))
+                     for i in range(20)}
+        logs = core.ConcurrentFlows(flow_dict).run(
+            {"processes": 2, "mode": "arrival_rate", "rate": 100})
+        assert len(logs) == 20
+        # Each process starts its half of the flows at half the rate
+        for shard in (range(0, 20, 2), range(1, 20, 2)):
+            starts = [logs[fid]["intended_start_ns"] for fid in shard]
+            assert all((b - a) / 1e6 == pytest.approx(20)
+                       for a, b in zip(starts, starts[1:]))
+
+    def test_max_in_flight_is_split(self):
+        def _sleep():
+            gevent.sleep(0.2)
+
+        flow_dict = {i: core.FlowPath(core.Task("sleep", _sleep))
+                     for i in range(10)}
+        logs = core.ConcurrentFlows(flow_dict).run(
+            {"processes": 2, "mode": "arrival_rate", "rate": 200,
+             "max_in_flight": 3})
+        # The first process gets the remainder of the split
+        assert list(logs) == [0, 1, 2]
+
+    def test_shard_options(self):
+        options = {"mode": "arrival_rate", "rate": 90, "max_in_flight": 7}
+        shards = [core.shard_options(options, i, 3, 10) for i in range(3)]
+        assert [shard["max_in_flight"] for shard in shards] == [3, 2, 2]
+        assert [shard["rate"] for shard in shards] == [36, 27, 27]
+        with pytest.raises(core.InvalidRunOptions):
+            core.shard_options(options, 0, 8, 10)
+
+    def test_crashed_shard(self):
+        def _crash():
+            os._exit(3)
+
+        flow_dict = {i: core.FlowPath(core.Task("crash", _crash) if i == 1
+                                      else core.Task("pid", self.__pid))
+                     for i in range(4)}
+        with pytest.raises(core.ShardError, match="exited with code 3"):
+            core.ConcurrentFlows(flow_dict).run({"processes": 2})
+
+    def test_failed_shard(self):
+        def _create_flow_path(flow_id):
+            if flow_id == 1:
+                raise ValueError("Cannot create flow 1")
+            return core.FlowPath(core.Task("pid", self.__pid))
+
+        concurrent_flow = core.ConcurrentFlows(flow_factory=_create_flow_path,
+                                               flow_count=4)
+        # The worker traceback is kept in the error
+        with pytest.raises(core.ShardError, match="Cannot create flow 1"):
+            concurrent_flow.run({"processes": 2})
+
+
+class TestFlowFactory(object):
+
+    def __count_live_flows(self, live_flows, max_live_flows):
+        max_live_flows[0] = max(max_live_flows[0], len(live_flows))
+        gevent.sleep(0.001)
+
+    def __flow_factory(self, live_flows, max_live_flows):
+        def _create_flow_path(flow_id):
+            task = core.Task("count", self.__count_live_flows,
+                             [live_flows, max_live_flows])
+            flow_path = core.FlowPath(task)
+            live_flows.add(flow_path)
+            return flow_path
+        return _create_flow_path
+
+    def test_flows_created_just_in_time(self):
+        live_flows, max_live_flows = weakref.WeakSet(), [0]
+        concurrent_flow = core.ConcurrentFlows(
+            flow_factory=self.__flow_factory(live_flows, max_live_flows),
+            flow_count=200)
+        logs = concurrent_flow.run({"mode": "pool", "pool_size": 5},
+                                   on_flow_end=lambda fid, log: None,
+                                   keep_logs=False)
+        assert logs == {}
+        assert max_live_flows[0] <= 6
+        assert concurrent_flow.percentiles["flows"]["count"] == 200
+
+    def test_generator_factory(self):
+        flows = (core.FlowPath(core.Task("a", lambda: None)) for _ in range(7))
+        concurrent_flow = core.ConcurrentFlows(flow_factory=flows)
+        logs = concurrent_flow.run({"mode": "pool", "pool_size": 2})
+        assert list(logs) == list(range(7))
+
+    def test_factory_across_processes(self):
+        concurrent_flow = core.ConcurrentFlows(
+            flow_factory=lambda fid: core.FlowPath(core.Task("a", lambda: None)),
+            flow_count=9)
+        logs = concurrent_flow.run({"processes": 2})
+        assert list(logs) == list(range(9))
+
+    def test_factory_count_required(self):
+        with pytest.raises(ValueError):
+            core.ConcurrentFlows(flow_factory=lambda fid: None)
+
+
+class TestSoak(object):
+
+    def __sleep(self, calls):
+        calls.append(1)
+        gevent.sleep(0.005)
+
+    def __create_flow_dict(self, flow_no, calls):
+        return {i: core.FlowPath(core.Task("sleep", self.__sleep, [calls]))
+                for i in range(flow_no)}
+
+    def test_iterations(self):
+        calls, ended = [], []
+        concurrent_flow = core.ConcurrentFlows(self.__create_flow_dict(4, calls))
+        logs = concurrent_flow.run({"iterations": 3},
+                                   on_flow_end=lambda fid, log: ended.append(
+                                       (fid, log["iteration"])))
+        assert len(calls) == 12
+        assert sorted(ended) == [(i, n) for i in range(4) for n in range(3)]
+        # The log of every slot is the last iteration one
+        assert all(log["iteration"] == 2 for log in logs.values())
+        assert concurrent_flow.percentiles["flows"]["count"] == 12
+        throughput = concurrent_flow.throughput
+        assert throughput["iterations"] == 12
+        assert throughput["iterations_per_second"] > 0
+
+    def test_duration(self):
+        calls = []
+        concurrent_flow = core.ConcurrentFlows(self.__create_flow_dict(4, calls))
+        logs = concurrent_flow.run({"mode": "pool", "pool_size": 2,
+                                    "duration": 0.1})
+        # The first slots keep the pool busy until the duration has elapsed
+        assert list(logs) == [0, 1]
+        assert len(calls) > 10
+        assert 0.1 <= concurrent_flow.throughput["elapsed"] < 0.2
+
+    def test_duration_asyncio(self):
+        async def noop():
+            pass
+        concurrent_flow = core.ConcurrentFlows(
+            flow_factory=lambda fid: core.FlowPath(core.Task("noop", noop)),
+            flow_count=3)
+        logs = concurrent_flow.run({"backend": "asyncio", "duration": 5,
+                                    "iterations": 50})
+        assert all(log["iteration"] == 49 for log in logs.values())
+        assert concurrent_flow.throughput["iterations"] == 150
+
+    def test_across_processes(self):
+        concurrent_flow = core.ConcurrentFlows(
+            flow_factory=lambda fid: core.FlowPath(core.Task("a", lambda: None)),
+            flow_count=4)
+        concurrent_flow.run({"processes": 2, "iterations": 5})
+        assert concurrent_flow.throughput["iterations"] == 20
+
+    def test_invalid_options(self):
+        concurrent_flow = core.ConcurrentFlows({})
+        with pytest.raises(core.InvalidRunOptions):
+            concurrent_flow.run({"iterations": 0})
+        with pytest.raises(core.InvalidRunOptions):
+            concurrent_flow.run({"duration": -1})
+
+
+class TestArrivalRate(object):
+
+    def __sleep(self, seconds):
+        gevent.sleep(seconds)
+
+    def __block(self, seconds):
+        # Blocks the whole hub, as a CPU bound client would
+        gevent.monkey.get_original("time", "sleep")(seconds)
+
+    def __create_flow_dict(self, flow_no, seconds=0.05, function=None):
+        return {i: core.FlowPath(core.Task("sleep", function or self.__sleep,
+                                           [seconds]))
+                for i in range(flow_no)}
+
+    def __start_gaps(self, logs):
+        starts = sorted(log["intended_start_ns"] for log in logs.values())
+        return [(b - a) / 1e6 for a, b in zip(starts, starts[1:])]
+
+    def test_constant_rate(self):
+        concurrent_flow = core.ConcurrentFlows(self.__create_flow_dict(10))
+        logs = concurrent_flow.run({"mode": "arrival_rate", "rate": 100})
+        assert len(logs) == 10
+        assert all(gap == pytest.approx(10) for gap in self.__start_gaps(logs))
+        # The flows overlap, as new ones start whatever the ones in flight
+        assert max(log["concurrency"] for log in logs.values()) > 1
+        assert all(log["phase"] == "arrival_rate" for log in logs.values())
+        arrivals = concurrent_flow.percentiles["arrivals"]
+        assert arrivals["dropped"] == 0
+        assert arrivals["start_lag"]["count"] == 10
+
+    def test_latency_from_the_intended_start(self):
+        flows = self.__create_flow_dict(10, 0)
+        flows[0] = core.FlowPath(core.Task("block", self.__block, [0.1]))
+        concurrent_flow = core.ConcurrentFlows(flows)
+        logs = concurrent_flow.run({"mode": "arrival_rate", "rate": 200})
+        late = [log for fid, log in logs.items() if fid > 0]
+        # The blocked hub delays the following starts, which is accounted in
+        # their latencies, not just in their elapsed time
+        assert max(log["start_lag"] for log in late) >= 50
+        percentiles = concurrent_flow.percentiles
+        assert percentiles["arrivals"]["late"] > 0
+        assert percentiles["flows"]["p50"] >= 40
+        assert all(log["total_elapsed_time"] < 10 for log in late)
+
+    def test_max_in_flight(self):
+        concurrent_flow = core.ConcurrentFlows(self.__create_flow_dict(10, 0.2))
+        logs = concurrent_flow.run({"mode": "arrival_rate", "rate": 200,
+                                    "max_in_flight": 3})
+        assert list(logs) == [0, 1, 2]
+        assert concurrent_flow.percentiles["arrivals"]["dropped"] == 7
+
+    def test_max_lag(self):
+        flows = self.__create_flow_dict(10, 0)
+        flows[0] = core.FlowPath(core.Task("block", self.__block, [0.1]))
+        concurrent_flow = core.ConcurrentFlows(flows)
+        logs = concurrent_flow.run({"mode": "arrival_rate", "rate": 200,
+                                    "max_lag": 0.02})
+        assert concurrent_flow.percentiles["arrivals"]["dropped"] > 0
+        assert all(log["start_lag"] <= 20 for log in logs.values())
+
+    def test_duration(self):
+        def _flows():
+            while True:
+                yield core.FlowPath(core.Task("sleep", self.__sleep, [0.05]))
+        concurrent_flow = core.ConcurrentFlows(flow_factory=_flows())
+        logs = concurrent_flow.run({"mode": "arrival_rate", "rate": 100,
+                                    "duration": 0.2})
+        assert 15 <= len(logs) <= 21
+        assert all(log["iteration"] == 0 for log in logs.values())
+
+    def test_poisson(self):
+        concurrent_flow = core.ConcurrentFlows(self.__create_flow_dict(30, 0))
+        logs = concurrent_flow.run({"mode": "arrival_rate", "rate": 500,
+                                    "arrivals": "poisson"})
+        assert len(logs) == 30
+        assert len({round(gap, 2) for gap in self.__start_gaps(logs)}) > 1
+
+    def test_asyncio(self):
+        async def nap():
+            await asyncio.sleep(0.05)
+        concurrent_flow = core.ConcurrentFlows(
+            flow_factory=lambda fid: core.FlowPath(core.Task("nap", nap)),
+            flow_count=10)
+        logs = concurrent_flow.run({"mode": "arrival_rate", "rate": 100,
+                                    "backend": "asyncio"})
+        assert all(gap == pytest.approx(10) for gap in self.__start_gaps(logs))
+        assert max(log["concurrency"] for log in logs.values()) > 1
+
+    def test_invalid_options(self):
+        concurrent_flow = core.ConcurrentFlows({})
+        for options in ({}, {"rate": 0}, {"rate": 1, "arrivals": "bursty"},
+                        {"rate": 1, "iterations": 2},
+                        {"rate": 1, "max_in_flight": 0}):
+            with pytest.raises(core.InvalidRunOptions):
+                concurrent_flow.run(dict(options, mode="arrival_rate"))
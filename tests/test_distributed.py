@@ -0,0 +1,152 @@
+"""
+    tests.distributed
+
+    The master/worker distributed mode
+
+"""
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from stateful_test import main
+from stateful_test.distributed import DistributedError, MasterRunner
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKER_COMMAND = [sys.executable, "-c",
+                  "from stateful_test.main import main; main()", "--worker"]
+
+FLOWFILE = textwrap.dedent("""
+    import os
+
+    from stateful_test import core
+
+    def echo(value):
+        return value
+
+    def check(result, value):
+        return result == value
+
+    def crash():
+        os._exit(1)
+
+    def create_flow_path(value):
+        task = core.Task("echo", echo, [value])
+        task.add_result_function(check, [core.TaskResult(), value])
+        return core.FlowPath(task)
+
+    cflows = core.ConcurrentFlows({"flow_{}".format(i): create_flow_path(i)
+                                   for i in range(10)})
+    lazy = core.ConcurrentFlows(flow_factory=create_flow_path, flow_count=6)
+    single = create_flow_path("single")
+    crash_worker = core.FlowPath(core.Task("crash", crash))
+""")
+
+
+class TestMasterWorker(object):
+
+    def __load_flowfile(self, path):
+        _, flowpaths, concurrent_flows = main.load_flowfile(str(path))
+        return flowpaths, concurrent_flows
+
+    def __start_workers(self, flowfile, host, port, worker_no, worker_args):
+        """
+        Start every worker as a process of its own, running the CLI
+        """
+        command = WORKER_COMMAND + ["-f", str(flowfile), "--master-host",
+                                    host] + list(worker_args)
+        if port is not None:
+            command += ["--master-port", str(port)]
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        return [subprocess.Popen(command, env=env) for _ in range(worker_no)]
+
+    def __run(self, flowfile, host, port=0, worker_no=3, flowpath_names=None,
+              worker_args=()):
+        """
+        :param flowpath_names: <dict> The names the master runs the flow paths
+            under, by flowfile target. Default: every one but crash_worker, and
+            the ConcurrentFlows are only run then
+        :param worker_args: <list> More command line options of the workers
+        """
+        flowpaths, concurrent_flows = self.__load_flowfile(flowfile)
+        if flowpath_names is None:
+            flowpaths.pop("crash_worker")
+        else:
+            flowpaths = {name: flowpaths[target]
+                         for target, name in flowpath_names.items()}
+            concurrent_flows = {}
+        master = MasterRunner(flowpaths, concurrent_flows, host=host,
+                              port=port, expect_workers=worker_no)
+        address = master.address
+        port = None
+        if isinstance(address, tuple):
+            host, port = address
+        workers = self.__start_workers(flowfile, host, port, worker_no,
+                                       worker_args)
+        try:
+            out_dict = master.run()
+            # The workers exit as soon as the master tells them to quit
+            exit_codes = [worker.wait(timeout=10) for worker in workers]
+        finally:
+            for worker in workers:
+                if worker.poll() is None:
+                    worker.kill()
+                    worker.wait()
+        return out_dict, exit_codes
+
+    def __flowfile(self, tmp_path):
+        flowfile = tmp_path / "distributed_flowfile.py"
+        flowfile.write_text(FLOWFILE)
+        return flowfile
+
+    def test_merged_logs(self, tmp_path):
+        out_dict, exit_codes = self.__run(self.__flowfile(tmp_path),
+                                          "127.0.0.1")
+        assert exit_codes == [0, 0, 0]
+        assert list(out_dict) == ["cflows", "lazy", "single"]
+        assert list(out_dict["lazy"]) == list(range(6))
+        assert list(out_dict["cflows"]) == ["flow_{}".format(i) for i in range(10)]
+        assert all(log["status"] == "SUCCESS"
+                   for log in out_dict["cflows"].values())
+        assert out_dict["single"]["status"] == "SUCCESS"
+
+    def test_unix_socket(self, tmp_path):
+        host = "unix:{}".format(tmp_path / "master.sock")
+        out_dict, _ = self.__run(self.__flowfile(tmp_path), host, worker_no=2)
+        assert len(out_dict["cflows"]) == 10
+
+    def test_worker_error(self, tmp_path):
+        # The workers have not loaded any "unknown" target
+        with pytest.raises(DistributedError, match="KeyError"):
+            self.__run(self.__flowfile(tmp_path), "127.0.0.1", worker_no=1,
+                       flowpath_names={"single": "unknown"})
+
+    def test_worker_disconnected(self, tmp_path):
+        with pytest.raises(DistributedError, match="closed by peer"):
+            self.__run(self.__flowfile(tmp_path), "127.0.0.1", worker_no=2,
+                       flowpath_names={"crash_worker": "crash_worker"})
+
+    def test_arrival_rate_is_split(self, tmp_path):
+        out_dict, _ = self.__run(self.__flowfile(tmp_path), "127.0.0.1",
+                                 worker_no=2, worker_args=["--arrival-rate",
+                                                           "50"])
+        logs = out_dict["cflows"]
+        assert all(log["status"] == "SUCCESS" for log in logs.values())
+        # Each worker starts its half of the flows at half the rate
+        for shard in (range(0, 10, 2), range(1, 10, 2)):
+            starts = [logs["flow_{}".format(i)]["intended_start_ns"]
+                      for i in shard]
+            assert all((b - a) / 1e6 == pytest.approx(40)
+                       for a, b in zip(starts, starts[1:]))
+
+    def test_no_expected_workers(self):
+        with pytest.raises(ValueError):
+            MasterRunner({}, {}, port=0, expect_workers=0)
+
+    def test_workers_never_connect(self):
+        master = MasterRunner({}, {}, port=0, expect_workers=2,
+                              accept_timeout=0.1)
+        with pytest.raises(DistributedError, match="0 of the 2 workers"):
+            master.run()
@@ -0,0 +1,114 @@
+"""
+    tests.events
+
+    Lifecycle hooks and the sampling task profiler
+
+"""
+import asyncio
+
+from stateful_test import core
+from stateful_test.events import (EventHooks, FLOW_END, FLOW_START, TASK_END,
+                                  TASK_START, VERIFICATION_END)
+from stateful_test.profiler import TaskProfiler
+
+
+def busy(n):
+    return sum(i * i for i in range(n))
+
+
+class TestEventHooks(object):
+
+    def __listen(self, events, fired):
+        for event in (FLOW_START, FLOW_END, TASK_START, TASK_END,
+                      VERIFICATION_END):
+            events.add_listener(event, lambda event=event, **payload:
+                                fired.append((event, payload)))
+
+    def __create_flow_path(self):
+        a = core.Task("a", lambda: 1)
+        a.add_result_function(lambda result: result == 1, core.TaskResult())
+        b = core.Task("b", lambda: 2)
+        b.add_result_function(lambda result: False, core.TaskResult())
+        return core.FlowPath([a, b])
+
+    def test_event_order(self):
+        events, fired = EventHooks(), []
+        self.__listen(events, fired)
+        flow_path = self.__create_flow_path()
+        flow_path.events = events
+        flow_path.run()
+        assert [e for e, _ in fired] == [
+            FLOW_START, TASK_START, TASK_END, VERIFICATION_END,
+            TASK_START, TASK_END, VERIFICATION_END, FLOW_END]
+        task_end = fired[2][1]
+        assert task_end["task"].result == 1
+        assert task_end["record"].task_status == "SUCCESS"
+        assert fired[6][1]["record"].verification_status == "FAILED"
+        assert fired[-1][1]["record"].status == "FAILED"
+
+    def test_concurrent_flows_asyncio(self):
+        events, fired = EventHooks(), []
+        self.__listen(events, fired)
+        concurrent_flow = core.ConcurrentFlows(
+            flow_factory=lambda fid: self.__create_flow_path(), flow_count=3)
+        concurrent_flow.events = events
+        concurrent_flow.run({"backend": "asyncio"})
+        assert sum(1 for e, _ in fired if e == FLOW_END) == 3
+        assert sum(1 for e, _ in fired if e == TASK_END) == 6
+
+    def test_failing_listener(self):
+        events = EventHooks()
+        events.add_listener(TASK_START, lambda **payload: 1 / 0)
+        flow_path = self.__create_flow_path()
+        flow_path.events = events
+        assert flow_path.run()["tasks"]["a"]["status"]["task"] == "SUCCESS"
+
+    def test_unknown_event(self):
+        events = EventHooks()
+        try:
+            events.add_listener("foo", print)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("Unknown events must be rejected")
+
+
+class TestTaskProfiler(object):
+
+    def test_hot_spots(self):
+        events = EventHooks()
+        profiler = TaskProfiler(interval=0.001)
+        profiler.attach(events)
+        concurrent_flow = core.ConcurrentFlows(
+            flow_factory=lambda fid: core.FlowPath([
+                core.Task("busy", busy, [200000]), core.Task("idle", lambda: None)]),
+            flow_count=5)
+        concurrent_flow.events = events
+        with profiler:
+            concurrent_flow.run()
+        report = profiler.report()
+        assert report["busy"]["calls"] == 5
+        assert report["idle"]["calls"] == 5
+        assert report["busy"]["samples"] > report["idle"]["samples"]
+        assert report["busy"]["execution_time"] > 0
+        functions = [h["function"] for h in report["busy"]["hot_spots"]]
+        assert any(f.startswith("busy ") or f.startswith("<genexpr> ")
+                   for f in functions)
+
+    def test_asyncio(self):
+        async def busy_async():
+            await asyncio.sleep(0)
+            return busy(200000)
+
+        profiler = TaskProfiler(interval=0.001)
+        events = EventHooks()
+        profiler.attach(events)
+
+        async def _run():
+            for _ in range(5):
+                flow_path = core.FlowPath(core.Task("busy", busy_async))
+                flow_path.events = events
+                await flow_path.run_async()
+        with profiler:
+            asyncio.run(_run())
+        assert profiler.report()["busy"]["samples"] > 0
@@ -0,0 +1,178 @@
+"""
+    tests.executors
+
+    Task and result functions offloaded to thread and process pools
+
+"""
+import os
+import time
+
+import gevent
+import pytest
+from gevent import monkey
+
+from stateful_test import core
+from stateful_test.executors import ExecutorPools
+
+BLOCK = 0.2
+# A sleep which blocks the whole thread, as a C extension call would
+blocking_sleep = monkey.get_original("time", "sleep")
+
+
+def block():
+    blocking_sleep(BLOCK)
+    return True
+
+
+def worker_pid():
+    return os.getpid()
+
+
+def is_other_pid(pid, other_pid):
+    return pid != other_pid
+
+
+def sleep_forever():
+    time.sleep(60)
+
+
+class TestThreadExecutor(object):
+
+    def __flows(self, flow_no, function=block):
+        return core.ConcurrentFlows({
+            i: core.FlowPath(core.Task("block", function, executor="thread"))
+            for i in range(flow_no)})
+
+    def test_hub_stays_responsive(self):
+        ticks = []
+
+        def _tick():
+            while True:
+                ticks.append(time.perf_counter())
+                gevent.sleep(0.01)
+
+        ticker = gevent.spawn(_tick)
+        t = time.perf_counter()
+        logs = self.__flows(4).run()
+        elapsed = time.perf_counter() - t
+        ticker.kill()
+        assert all(log["status"] == "SUCCESS" for log in logs.values())
+        # The four blocking calls have run at the same time
+        assert elapsed < 2 * BLOCK
+        assert max(b - a for a, b in zip(ticks, ticks[1:])) < BLOCK / 2
+
+    def test_bounded_pool(self):
+        t = time.perf_counter()
+        logs = self.__flows(3).run({"thread_pool_size": 1})
+        assert time.perf_counter() - t >= 3 * BLOCK
+        waits = sorted(log["tasks"]["block"]["queue_wait_time"]
+                       for log in logs.values())
+        assert waits[0] < BLOCK * 1000 / 2
+        assert waits[2] >= 2 * BLOCK * 1000 * 0.9
+        # The queue wait is included in the execution time, but not in the
+        # net one
+        for log in logs.values():
+            task_log = log["tasks"]["block"]
+            assert task_log["execution_time"] >= task_log["queue_wait_time"]
+            assert task_log["net_execution_time"] == pytest.approx(
+                task_log["execution_time"] - task_log["queue_wait_time"],
+                abs=1)
+            assert task_log["net_execution_time"] < BLOCK * 1000 * 1.5
+
+    def test_not_offloaded(self):
+        log = core.FlowPath(core.Task("noop", lambda: True)).run()
+        assert log["tasks"]["noop"]["queue_wait_time"] is None
+        assert (log["tasks"]["noop"]["net_execution_time"]
+                == log["tasks"]["noop"]["execution_time"])
+
+    def test_net_verification_time(self):
+        task = core.Task("block", block, executor="thread",
+                         result_function=lambda result: block(),
+                         result_args=[core.TaskResult()],
+                         result_executor="thread")
+        flows = core.ConcurrentFlows({i: core.FlowPath(task.copy())
+                                      for i in range(2)})
+        logs = flows.run({"thread_pool_size": 1})
+        # The second verification waits for the first one
+        task_log = max((log["tasks"]["block"] for log in logs.values()),
+                       key=lambda task_log: task_log["verification_time"])
+        assert task_log["verification_time"] >= 2 * BLOCK * 1000 * 0.9
+        assert task_log["net_verification_time"] < BLOCK * 1000 * 1.5
+        # Each function has its own queue wait
+        assert task_log["net_verification_time"] == pytest.approx(
+            task_log["verification_time"]
+            - task_log["verification_queue_wait_time"], abs=1)
+        assert task_log["net_execution_time"] == pytest.approx(
+            task_log["execution_time"] - task_log["queue_wait_time"], abs=1)
+
+    def test_asyncio(self):
+        t = time.perf_counter()
+        logs = self.__flows(4).run({"backend": core.ASYNCIO_BACKEND})
+        assert time.perf_counter() - t < 2 * BLOCK
+        assert all(log["tasks"]["block"]["queue_wait_time"] is not None
+                   for log in logs.values())
+
+    def test_error(self):
+        def _fail():
+            raise ValueError("Offloaded failure")
+
+        log = core.FlowPath(core.Task("fail", _fail, executor="thread")).run()
+        assert log["status"] == "ERROR"
+        assert log["tasks"]["fail"]["status"]["task"] == "ERROR"
+
+
+class TestProcessExecutor(object):
+
+    def __flow_path(self, function=worker_pid, **kwargs):
+        task = core.Task("pid", function, executor="process",
+                         result_function=is_other_pid,
+                         result_args=[core.TaskResult(), os.getpid()],
+                         result_executor="process", **kwargs)
+        return core.FlowPath(task)
+
+    def test_run_in_worker_process(self):
+        flows = core.ConcurrentFlows({i: self.__flow_path() for i in range(4)})
+        logs = flows.run({"process_pool_size": 2})
+        assert all(log["status"] == "SUCCESS" for log in logs.values())
+        assert all(log["tasks"]["pid"]["queue_wait_time"] is not None
+                   for log in logs.values())
+
+    def test_asyncio(self):
+        flows = core.ConcurrentFlows({i: self.__flow_path() for i in range(2)})
+        logs = flows.run({"backend": core.ASYNCIO_BACKEND,
+                          "process_pool_size": 1})
+        assert all(log["status"] == "SUCCESS" for log in logs.values())
+
+    def test_timeout_replaces_the_worker(self):
+        executors = ExecutorPools(process_pool_size=1)
+        flow_path = self.__flow_path(sleep_forever, timeout=0.2)
+        flow_path.executors = executors
+        log = flow_path.run()
+        assert log["tasks"]["pid"]["status"]["task"] == "TIMEOUT"
+
+        flow_path = self.__flow_path()
+        flow_path.executors = executors
+        assert flow_path.run()["status"] == "SUCCESS"
+        executors.close()
+
+    def test_unpicklable_function(self):
+        flow_path = self.__flow_path(lambda: os.getpid())
+        log = flow_path.run()
+        assert log["tasks"]["pid"]["status"]["task"] == "ERROR"
+
+
+class TestExecutorOptions(object):
+
+    def test_unknown_executor(self):
+        with pytest.raises(ValueError):
+            core.Task("a", lambda: True, executor="fiber")
+
+    def test_invalid_pool_size(self):
+        flows = core.ConcurrentFlows({0: core.FlowPath(core.Task("a", bool))})
+        with pytest.raises(core.InvalidRunOptions):
+            flows.run({"process_pool_size": 0})
+
+    def test_copy_keeps_executors(self):
+        task = core.Task("a", block, executor="thread",
+                         result_executor="process").copy()
+        assert (task.executor, task.result_executor) == ("thread", "process")
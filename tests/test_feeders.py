@@ -0,0 +1,211 @@
+"""
+    tests.feeders
+
+    Rows streamed from CSV and JSON lines files into the task arguments
+
+"""
+import asyncio
+import json
+import multiprocessing
+import tracemalloc
+
+import pytest
+
+from stateful_test import core
+from stateful_test.feeders import Feeder, FeederExhausted
+
+USERS = ["ana", "bob", "eve"]
+
+
+class TestFeeder(object):
+
+    def __csv(self, tmp_path, names=USERS):
+        path = tmp_path / "users.csv"
+        path.write_text("name,password\n" + "".join(
+            "{},{}-secret\n".format(name, name) for name in names))
+        return str(path)
+
+    def __jsonl(self, tmp_path):
+        path = tmp_path / "users.jsonl"
+        path.write_text("".join(json.dumps({"name": name}) + "\n\n"
+                                for name in USERS))
+        return str(path)
+
+    @pytest.mark.parametrize("use_mmap", [False, True])
+    def test_sequential(self, tmp_path, use_mmap):
+        with Feeder(self.__csv(tmp_path), use_mmap=use_mmap) as feeder:
+            assert [feeder.next_row() for _ in USERS] == [
+                {"name": name, "password": name + "-secret"} for name in USERS]
+            with pytest.raises(FeederExhausted):
+                feeder.next_row()
+
+    @pytest.mark.parametrize("use_mmap", [False, True])
+    def test_circular(self, tmp_path, use_mmap):
+        feeder = Feeder(self.__jsonl(tmp_path), policy="circular",
+                        use_mmap=use_mmap)
+        assert [feeder.next_row()["name"] for _ in range(7)] == (
+            USERS * 3)[:7]
+        feeder.close()
+
+    @pytest.mark.parametrize("use_mmap", [False, True])
+    def test_random(self, tmp_path, use_mmap):
+        feeder = Feeder(self.__csv(tmp_path), policy="random", seed=1,
+                        use_mmap=use_mmap)
+        names = [feeder.next_row()["name"] for _ in range(60)]
+        assert set(names) == set(USERS)
+        feeder.close()
+
+    def test_partition(self, tmp_path):
+        names = ["user_{}".format(i) for i in range(7)]
+        feeder = Feeder(self.__csv(tmp_path, names), policy="circular")
+        feeder.partition(1, 3)
+        assert [feeder.next_row()["name"] for _ in range(4)] == [
+            "user_1", "user_4", "user_1", "user_4"]
+        with pytest.raises(ValueError):
+            feeder.partition(3, 3)
+        feeder.close()
+
+    @pytest.mark.parametrize("seed", [None, 1])
+    def test_random_is_reseeded_in_a_fork(self, tmp_path, seed):
+        names = ["user_{}".format(i) for i in range(100)]
+        feeder = Feeder(self.__csv(tmp_path, names), policy="random",
+                        seed=seed)
+
+        def _draw(writer):
+            writer.send([feeder.next_row()["name"] for _ in range(10)])
+            writer.close()
+
+        context = multiprocessing.get_context("fork")
+        reader, writer = context.Pipe(duplex=False)
+        child = context.Process(target=_draw, args=(writer,))
+        child.start()
+        writer.close()
+        child_names = reader.recv()
+        child.join()
+        assert child_names != [feeder.next_row()["name"] for _ in range(10)]
+        feeder.close()
+
+    def test_no_header(self, tmp_path):
+        path = tmp_path / "users.csv"
+        path.write_text("ana;1\nbob;2\n")
+        feeder = Feeder(str(path), header=False, delimiter=";")
+        assert [feeder.next_row(), feeder.next_row()] == [["ana", "1"],
+                                                          ["bob", "2"]]
+
+    def test_empty_file(self, tmp_path):
+        path = tmp_path / "empty.jsonl"
+        path.write_text("")
+        for policy in ("sequential", "circular", "random"):
+            with pytest.raises(FeederExhausted):
+                Feeder(str(path), policy=policy, use_mmap=True).next_row()
+
+    def test_invalid(self, tmp_path):
+        with pytest.raises(ValueError):
+            Feeder(self.__csv(tmp_path), policy="shuffled")
+        with pytest.raises(ValueError):
+            Feeder(str(tmp_path / "users.txt"))
+
+    def test_memory_does_not_grow_with_the_dataset(self, tmp_path):
+        path = tmp_path / "users.csv"
+        with open(str(path), "w") as users_file:
+            users_file.write("name,password\n")
+            for i in range(100000):
+                users_file.write("user_{0},password_{0}\n".format(i))
+        feeder = Feeder(str(path), policy="random")
+        tracemalloc.start()
+        try:
+            for _ in range(1000):
+                feeder.next_row()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+            feeder.close()
+        assert peak < 1 << 18
+
+
+class TestFeederFlows(object):
+
+    def __users(self, tmp_path, count, policy="sequential"):
+        path = tmp_path / "users.csv"
+        path.write_text("name\n" + "".join(
+            "user_{}\n".format(i) for i in range(count)))
+        return Feeder(str(path), policy=policy)
+
+    def __flow_path(self, users, seen):
+        def _login(name):
+            seen.setdefault("login", []).append(name)
+            return name
+
+        def _checkout(name, user):
+            seen.setdefault("checkout", []).append(name)
+            return name == user["name"]
+
+        return core.FlowPath([
+            core.Task("login", _login, [users["name"]]),
+            core.Task("checkout", _checkout, [users["name"], users],
+                      result_function=lambda same: same,
+                      result_args=[core.TaskResult()])])
+
+    def test_one_row_per_flow(self, tmp_path):
+        users = self.__users(tmp_path, 10)
+        seen = {}
+        flows = core.ConcurrentFlows(
+            flow_factory=lambda fid: self.__flow_path(users, seen),
+            flow_count=10)
+        logs = flows.run({"mode": "pool", "pool_size": 4})
+        assert all(log["status"] == "SUCCESS" for log in logs.values())
+        assert sorted(seen["login"]) == sorted(seen["checkout"])
+        assert len(set(seen["login"])) == 10
+
+    def test_exhausted_fails_the_flow(self, tmp_path):
+        users = self.__users(tmp_path, 2)
+        seen = {}
+        logs = core.ConcurrentFlows(
+            {i: self.__flow_path(users, seen) for i in range(3)}).run()
+        assert sorted(log["status"] for log in logs.values()) == [
+            "ERROR", "SUCCESS", "SUCCESS"]
+
+    def test_circular_soak(self, tmp_path):
+        users = self.__users(tmp_path, 3, policy="circular")
+        seen = {}
+        flows = core.ConcurrentFlows({0: self.__flow_path(users, seen)})
+        flows.run({"iterations": 5})
+        assert seen["login"] == ["user_0", "user_1", "user_2", "user_0",
+                                 "user_1"]
+
+    def test_across_processes(self, tmp_path):
+        users = self.__users(tmp_path, 10)
+        drawn = tmp_path / "drawn.txt"
+
+        def _login(name):
+            # Every process appends the rows it has drawn
+            with open(str(drawn), "a") as drawn_file:
+                drawn_file.write(name + "\n")
+            return name
+
+        flows = core.ConcurrentFlows({i: core.FlowPath(core.Task(
+            "login", _login, [users["name"]])) for i in range(10)})
+        logs = flows.run({"processes": 2})
+        assert all(log["status"] == "SUCCESS" for log in logs.values())
+        assert sorted(drawn.read_text().split()) == sorted(
+            "user_{}".format(i) for i in range(10))
+        # The parent process has not drawn any row
+        assert users.next_row() == {"name": "user_0"}
+
+    def test_asyncio(self, tmp_path):
+        users = self.__users(tmp_path, 4)
+        seen = {}
+        flows = core.ConcurrentFlows(
+            {i: self.__flow_path(users, seen) for i in range(4)})
+        logs = asyncio.run(flows.run_async())
+        assert all(log["status"] == "SUCCESS" for log in logs.values())
+        assert len(set(seen["checkout"])) == 4
+
+    def test_task_out_of_a_flow(self, tmp_path):
+        users = self.__users(tmp_path, 2)
+        task = core.Task("login", lambda name: name, [users["name"]],
+                         result_function=lambda result, name: result == name,
+                         result_args=[core.TaskResult(), users["name"]])
+        task.run()
+        assert task.result == "user_0"
+        assert task.check_result()
@@ -5,7 +5,10 @@
 
 """
 
-from stateful_test import core
+import time
+
+from stateful_test import core, helpers
+from stateful_test.log_config import LOG_DICT, TASK_DICT
 
 
 class TestFlowPath(object):
@@ -40,3 +43,102 @@ class TestFlowPath(object):
         path.run()
         assert True
 
+    def test_log_shape(self):
+        a = core.Task("task_a", lambda: None)
+        path = core.FlowPath([a])
+        log = path.run()
+        assert set(log) == set(LOG_DICT)
+        assert set(log["tasks"]["task_a"]) == set(TASK_DICT)
+        assert set(log["tasks"]["task_a"]["status"]) == set(TASK_DICT["status"])
+        assert path.log == log
+
+    def test_timestamps(self):
+        a = core.Task("task_a", lambda: time.sleep(0.002))
+        b = core.Task("task_b", lambda: None)
+        log = core.FlowPath([a, b]).run()
+        task_a, task_b = log["tasks"]["task_a"], log["tasks"]["task_b"]
+        assert log["start_ns"] <= task_a["start_ns"] < task_a["end_ns"]
+        assert task_a["end_ns"] <= task_b["start_ns"] <= log["end_ns"]
+        assert task_a["execution_time"] >= 2
+
+    def test_time_precision(self):
+        a = core.Task("task_a", lambda: time.sleep(0.0002))
+        path = core.FlowPath([a])
+        path.run()
+        helpers.set_time_precision(3)
+        try:
+            execution_time = path.log["tasks"]["task_a"]["execution_time"]
+        finally:
+            helpers.set_time_precision(0)
+        assert isinstance(execution_time, float)
+        assert 0 < execution_time < 1000
+        assert isinstance(path.log["tasks"]["task_a"]["execution_time"], int)
+
+
+class TestParallelFlowPath(object):
+
+    TOKEN = "token"
+
+    def __login(self):
+        return self.TOKEN
+
+    def __fetch(self, token, resource):
+        time.sleep(0.05)
+        return "{} with {}".format(resource, token)
+
+    def __create_path(self, parallel=True):
+        login = core.Task("login", self.__login)
+        profile = core.Task("profile", self.__fetch,
+                            task_args=[core.TaskResult(login), "profile"])
+        settings = core.Task("settings", self.__fetch,
+                             task_kwargs={"token": core.TaskResult("login"),
+                                          "resource": "settings"})
+        summary = core.Task("summary", lambda: True,
+                            depends_on=[profile, settings])
+        return core.FlowPath([login, profile, settings, summary],
+                             parallel=parallel)
+
+    def test_independent_tasks_overlap(self):
+        path = self.__create_path()
+        log = path.run()
+        assert log["status"] == "SUCCESS"
+        assert log["executed_path"][0] == "login"
+        assert log["executed_path"][-1] == "summary"
+        tasks = log["tasks"]
+        assert tasks["profile"]["start_ns"] < tasks["settings"]["end_ns"]
+        assert tasks["settings"]["start_ns"] < tasks["profile"]["end_ns"]
+        assert tasks["summary"]["start_offset"] >= 50
+        assert log["total_elapsed_time"] < 100
+
+    def test_results_passed_to_dependants(self):
+        path = self.__create_path()
+        path.run()
+        assert path.path[1].result == "profile with token"
+        assert path.path[2].result == "settings with token"
+
+    def test_sequential_with_dependencies(self):
+        log = self.__create_path(parallel=False).run()
+        assert log["status"] == "SUCCESS"
+        assert log["executed_path"] == ["login", "profile", "settings", "summary"]
+        assert log["total_elapsed_time"] >= 100
+
+    def test_dependency_later_in_path(self):
+        a = core.Task("a", lambda: True, depends_on="b")
+        b = core.Task("b", lambda: True)
+        log = core.FlowPath([a, b]).run()
+        assert log["status"] == "ERROR"
+        assert log["executed_path"] == []
+
+    def test_cycle(self):
+        a = core.Task("a", lambda: True, depends_on="b")
+        b = core.Task("b", lambda: True, depends_on="a")
+        log = core.FlowPath([a, b], parallel=True).run()
+        assert log["status"] == "ERROR"
+
+    def test_failure_stops_new_tasks(self):
+        a = core.Task("a", lambda: False, result_function=lambda r: r,
+                      result_args=core.TaskResult())
+        b = core.Task("b", lambda: True, depends_on="a")
+        log = core.FlowPath([a, b], parallel=True).run()
+        assert log["status"] == "FAILED"
+        assert "b" not in log["tasks"]
@@ -0,0 +1,112 @@
+"""
+    tests.histogram
+
+    The latency histograms and the percentile reports
+
+"""
+import random
+import time
+
+import pytest
+
+from stateful_test import core
+from stateful_test.histogram import LatencyHistogram, LatencyStats
+
+
+class TestLatencyHistogram(object):
+
+    def test_exact_low_values(self):
+        histogram = LatencyHistogram()
+        for value in range(1, 101):
+            histogram.record(value)
+        assert histogram.count == 100
+        assert histogram.percentile(50) == 50
+        assert histogram.percentile(99) == 99
+        assert histogram.percentile(100) == 100
+        assert histogram.mean == 50.5
+
+    def test_relative_error(self):
+        rand = random.Random(7)
+        values = sorted(rand.randint(0, 10**8) for _ in range(10000))
+        histogram = LatencyHistogram(significant_digits=3)
+        for value in values:
+            histogram.record(value)
+        for p in (50, 90, 99, 99.9):
+            expected = values[int(len(values) * p / 100) - 1]
+            assert abs(histogram.percentile(p) - expected) <= expected * 10**-3
+
+    def test_bounded_memory(self):
+        histogram = LatencyHistogram(significant_digits=2)
+        for value in range(10**6):
+            histogram.record(value)
+        assert len(histogram.counts) < 2000
+
+    def test_merge(self):
+        a, b, both = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+        for value in range(0, 5000, 3):
+            a.record(value)
+            both.record(value)
+        for value in range(7, 90000, 11):
+            b.record(value)
+            both.record(value)
+        a.merge(b)
+        assert a.counts == both.counts
+        assert (a.min, a.max, a.count) == (both.min, both.max, both.count)
+
+    def test_state(self):
+        stats = LatencyStats()
+        stats.record_execution("a", 1500)
+        stats.record_verification("a", 20)
+        stats.record_flow(1600)
+        rebuilt = LatencyStats.from_state(stats.to_state())
+        assert rebuilt.report() == stats.report()
+
+    def test_negative_value(self):
+        with pytest.raises(ValueError):
+            LatencyHistogram().record(-1)
+
+
+class TestPercentileReport(object):
+
+    def __task(self):
+        return True
+
+    def __check(self, result):
+        return result
+
+    def __create_flow_path(self):
+        a = core.Task("a", self.__task)
+        a.add_result_function(self.__check, core.TaskResult())
+        b = core.Task("b", self.__task)
+        return core.FlowPath([a, b])
+
+    def test_concurrent_flows_percentiles(self):
+        concurrent_flow = core.ConcurrentFlows(
+            {i: self.__create_flow_path() for i in range(20)})
+        concurrent_flow.run()
+        percentiles = concurrent_flow.percentiles
+        assert set(percentiles["tasks"]) == {"a", "b"}
+        assert percentiles["tasks"]["a"]["execution"]["count"] == 20
+        assert percentiles["tasks"]["a"]["verification"]["count"] == 20
+        assert percentiles["flows"]["count"] == 20
+        assert "p99" in percentiles["flows"]
+
+    def __check_after(self, result, seconds):
+        time.sleep(seconds)
+        return result
+
+    def test_total_verification_time(self):
+        a = core.Task("a", self.__task)
+        a.add_result_function(self.__check_after, [core.TaskResult(), 0.005])
+        b = core.Task("b", self.__task)
+        b.add_result_function(self.__check_after, [core.TaskResult(), 0.007])
+        log = core.FlowPath([a, b]).run()
+        verification_times = [log["tasks"][name]["verification_time"]
+                              for name in ("a", "b")]
+        assert log["total_verification_time"] >= 12
+        # The total is rounded once, instead of every task time
+        assert abs(log["total_verification_time"]
+                   - sum(verification_times)) <= 1
+        assert abs(log["total_execution_time"]
+                   - sum(log["tasks"][name]["execution_time"]
+                         for name in ("a", "b"))) <= 1
@@ -0,0 +1,138 @@
+"""
+    tests.polling
+
+    Result functions polled until they converge
+
+"""
+import asyncio
+import itertools
+
+import pytest
+
+from stateful_test import core
+from stateful_test.polling import Polling
+
+
+class EventuallyConsistent(object):
+    """
+    A stored value which is seen only after some reads
+    """
+    def __init__(self, reads_to_converge):
+        self.reads = 0
+        self.reads_to_converge = reads_to_converge
+
+    def write(self):
+        return True
+
+    def converged(self, _):
+        self.reads += 1
+        return self.reads >= self.reads_to_converge
+
+    def found(self, _):
+        """
+        Raise until the value is seen, as a read of a missing record does
+        """
+        if not self.converged(_):
+            raise KeyError("Not found yet")
+        return True
+
+    async def converged_async(self, _):
+        await asyncio.sleep(0)
+        return self.converged(_)
+
+
+class TestPolling(object):
+
+    def __task(self, store, poll, converged=None):
+        task = core.Task("write", store.write)
+        task.add_result_function(converged or store.converged,
+                                 core.TaskResult(), poll=poll)
+        return task
+
+    def test_converges(self):
+        store = EventuallyConsistent(3)
+        log = core.FlowPath(self.__task(store, Polling(interval=0.01))).run()
+        assert log["status"] == "SUCCESS"
+        assert log["tasks"]["write"]["verification_attempts"] == 3
+        assert log["tasks"]["write"]["status"]["verification"] == "SUCCESS"
+
+    def test_deadline(self):
+        store = EventuallyConsistent(1000)
+        poll = Polling(interval=0.01, deadline=0.05)
+        log = core.FlowPath(self.__task(store, poll)).run()
+        assert log["status"] == "FAILED"
+        assert 1 < log["tasks"]["write"]["verification_attempts"] < 10
+        assert log["tasks"]["write"]["verification_time"] < 500
+
+    def test_max_attempts(self):
+        store = EventuallyConsistent(1000)
+        poll = Polling(interval=0, max_attempts=4)
+        log = core.FlowPath(self.__task(store, poll)).run()
+        assert log["status"] == "FAILED"
+        assert store.reads == 4
+
+    def test_errors_are_failed_attempts(self):
+        store = EventuallyConsistent(3)
+        task = self.__task(store, Polling(interval=0.01), store.found)
+        log = core.FlowPath(task).run()
+        assert log["status"] == "SUCCESS"
+        assert log["tasks"]["write"]["verification_attempts"] == 3
+
+    def test_last_error_is_raised(self):
+        store = EventuallyConsistent(1000)
+        poll = Polling(interval=0, max_attempts=4)
+        task = self.__task(store, poll, store.found)
+        log = core.FlowPath(task).run()
+        assert log["status"] == "ERROR"
+        assert log["tasks"]["write"]["status"]["verification"] == "ERROR"
+        assert store.reads == 4
+        with pytest.raises(core.ResultFunctionError):
+            task.check_result()
+
+    def test_errors_are_failed_attempts_asyncio(self):
+        store = EventuallyConsistent(3)
+
+        async def _found(_):
+            await asyncio.sleep(0)
+            return store.found(_)
+
+        task = self.__task(store, Polling(interval=0.01), _found)
+        log = asyncio.run(core.FlowPath(task).run_async())
+        assert log["status"] == "SUCCESS"
+        assert log["tasks"]["write"]["verification_attempts"] == 3
+
+    def test_not_polled(self):
+        store = EventuallyConsistent(2)
+        log = core.FlowPath(self.__task(store, None)).run()
+        assert log["status"] == "FAILED"
+        assert log["tasks"]["write"]["verification_attempts"] == 1
+
+    def test_copy(self):
+        poll = Polling()
+        assert self.__task(EventuallyConsistent(1), poll).copy().poll is poll
+
+    def test_asyncio(self):
+        store = EventuallyConsistent(3)
+        task = self.__task(store, Polling(interval=0.01), store.converged_async)
+        log = asyncio.run(core.FlowPath(task).run_async())
+        assert log["status"] == "SUCCESS"
+        assert log["tasks"]["write"]["verification_attempts"] == 3
+
+
+class TestDelays(object):
+
+    def test_backoff(self):
+        poll = Polling(interval=1, backoff=2, max_interval=5, deadline=100)
+        delays = list(itertools.islice(poll.delays(), 6))
+        assert delays == [0, 1, 2, 4, 5, 5]
+
+    def test_jitter(self):
+        poll = Polling(interval=1, jitter=0.5, max_attempts=50, deadline=100)
+        delays = list(poll.delays())[1:]
+        assert len(delays) == 49
+        assert all(0.5 <= d <= 1.5 for d in delays)
+        assert len(set(delays)) > 1
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            Polling(backoff=0.5)
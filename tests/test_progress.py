@@ -0,0 +1,86 @@
+"""
+    tests.progress
+
+    Live progress snapshots of the runs
+
+"""
+import io
+import json
+import urllib.request
+
+import gevent
+
+from stateful_test import core
+from stateful_test.progress import ProgressReporter, RunProgress
+
+
+class TestProgress(object):
+
+    def __sleep(self, seconds):
+        gevent.sleep(seconds)
+        return seconds
+
+    def __create_concurrent_flows(self, flow_no):
+        flow_dict = {}
+        for i in range(flow_no):
+            task = core.Task("sleep", self.__sleep, [0.01])
+            # Every third flow fails its verification
+            task.add_result_function(lambda result, i=i: i % 3 != 0,
+                                     core.TaskResult())
+            flow_dict[i] = core.FlowPath([task, core.Task("noop", lambda: None)])
+        return core.ConcurrentFlows(flow_dict)
+
+    def test_counters(self):
+        progress = RunProgress()
+        concurrent_flow = self.__create_concurrent_flows(9)
+        concurrent_flow.progress = progress
+        concurrent_flow.run({"mode": "pool", "pool_size": 3})
+        snapshot = progress.snapshot()
+        assert snapshot["flows"] == {"started": 9, "in_flight": 0, "finished": 9,
+                                     "failed": 3, "errored": 0, "timed_out": 0}
+        # The failed flows do not run their noop task
+        assert snapshot["tasks_finished"] == 15
+        assert snapshot["tasks"]["sleep"]["execution"]["count"] == 9
+        assert snapshot["tasks"]["sleep"]["execution"]["p50"] >= 10
+        assert snapshot["tasks_per_second"] > 0
+
+        # The latencies and rates are rolling
+        snapshot = progress.snapshot()
+        assert snapshot["tasks"] == {}
+        assert snapshot["tasks_per_second"] == 0
+        assert snapshot["flows"]["finished"] == 9
+
+    def test_flow_path(self):
+        progress = RunProgress()
+        flow_path = core.FlowPath(core.Task("error", lambda: 1 / 0))
+        flow_path.progress = progress
+        flow_path.run()
+        assert progress.flows_errored == 1
+        assert progress.tasks_finished == 1
+
+    def test_multiprocess(self):
+        progress = RunProgress()
+        concurrent_flow = self.__create_concurrent_flows(6)
+        concurrent_flow.progress = progress
+        concurrent_flow.run({"processes": 2})
+        assert progress.flows_finished == 6
+        assert progress.flows_failed == 2
+
+    def test_reporter(self):
+        progress = RunProgress()
+        output = io.StringIO()
+        reporter = ProgressReporter(progress, interval=0.02, output=output,
+                                    http_port=0)
+        concurrent_flow = self.__create_concurrent_flows(30)
+        concurrent_flow.progress = progress
+        with reporter:
+            concurrent_flow.run({"mode": "pool", "pool_size": 2})
+            host, port = reporter.address
+            response = urllib.request.urlopen("http://{}:{}/".format(host, port))
+            served = json.loads(response.read().decode())
+        lines = output.getvalue().splitlines()
+        # The periodic snapshots, and the last one when stopping
+        assert len(lines) > 2
+        assert "finished=30 failed=10" in lines[-1]
+        assert any("sleep p50=" in line for line in lines)
+        assert 0 < served["flows"]["started"] <= 30
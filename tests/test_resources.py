@@ -0,0 +1,132 @@
+"""
+    tests.resources
+
+    Pooled shared resources injected into the tasks
+
+"""
+import asyncio
+import itertools
+import time
+
+import gevent
+import pytest
+
+from stateful_test import core
+from stateful_test.resources import ResourcePool, ResourcePoolTimeout
+
+
+class Connection(object):
+    ids = itertools.count()
+
+    def __init__(self):
+        self.id = next(self.ids)
+        self.closed = False
+        self.in_use = False
+
+    def close(self):
+        self.closed = True
+
+
+class TestResourcePool(object):
+
+    def __use(self, connection, used):
+        assert not connection.in_use
+        connection.in_use = True
+        gevent.sleep(0.01)
+        connection.in_use = False
+        used.append(connection)
+        return connection.id
+
+    async def __use_async(self, connection, used):
+        assert not connection.in_use
+        connection.in_use = True
+        await asyncio.sleep(0.01)
+        connection.in_use = False
+        used.append(connection)
+        return connection.id
+
+    def __create_concurrent_flows(self, pool, function, used, flow_no=10):
+        return core.ConcurrentFlows({
+            i: core.FlowPath(core.Task("use", function, [pool, used]))
+            for i in range(flow_no)})
+
+    def test_instances_are_reused(self):
+        used = []
+        pool = ResourcePool("connections", Connection, size=2,
+                            teardown=Connection.close)
+        logs = self.__create_concurrent_flows(pool, self.__use, used).run()
+        assert all(log["status"] == "SUCCESS" for log in logs.values())
+        assert len(used) == 10
+        assert len({c.id for c in used}) == 2
+        # Every flow but the two first ones has waited for a free connection
+        waits = sorted(log["tasks"]["use"]["pool_wait_time"]
+                       for log in logs.values())
+        assert waits[-1] >= 10
+        # The run has torn down its idle connections as it ended
+        assert all(c.closed for c in used)
+        logs = self.__create_concurrent_flows(pool, self.__use, used).run()
+        assert all(log["status"] == "SUCCESS" for log in logs.values())
+        assert len({c.id for c in used}) == 4
+
+    def test_instances_in_use_are_kept(self):
+        pool = ResourcePool("connections", Connection, size=2,
+                            teardown=Connection.close)
+        connection = pool.acquire()
+        used = []
+        self.__create_concurrent_flows(pool, self.__use, used, flow_no=2).run()
+        assert all(c.closed for c in used)
+        assert not connection.closed
+        pool.release(connection)
+        assert pool.acquire() is connection
+        pool.close()
+
+    def test_asyncio_backend(self):
+        used = []
+        pool = ResourcePool("connections", Connection, size=3)
+        logs = self.__create_concurrent_flows(pool, self.__use_async, used).run(
+            {"backend": "asyncio"})
+        assert all(log["status"] == "SUCCESS" for log in logs.values())
+        assert len({c.id for c in used}) == 3
+
+    def test_result_function_kwargs(self):
+        pool = ResourcePool("connections", Connection, size=1)
+        task = core.Task("connection_id", lambda connection: connection.id,
+                         task_kwargs={"connection": pool})
+        task.add_result_function(
+            lambda result, connection: result == connection.id,
+            kwargs={"result": core.TaskResult(), "connection": pool})
+        log = core.FlowPath(task).run()
+        assert log["status"] == "SUCCESS"
+        assert log["tasks"]["connection_id"]["pool_wait_time"] is not None
+
+    def test_no_pool_wait(self):
+        log = core.FlowPath(core.Task("noop", lambda: None)).run()
+        assert log["tasks"]["noop"]["pool_wait_time"] is None
+
+    def test_timeout(self):
+        pool = ResourcePool("connections", Connection, size=1, timeout=0.01)
+        connection = pool.acquire()
+        log = core.FlowPath(core.Task("use", lambda c: None, [pool])).run()
+        assert log["status"] == "ERROR"
+        assert log["tasks"]["use"]["status"]["task"] == "ERROR"
+        try:
+            pool.acquire()
+        except ResourcePoolTimeout:
+            pass
+        else:
+            raise AssertionError("The pool should have timed out")
+        pool.release(connection)
+        assert pool.acquire() is connection
+
+    @pytest.mark.parametrize("backend", ["gevent", "asyncio"])
+    def test_starved_pool_times_out_the_task(self, backend):
+        pool = ResourcePool("connections", Connection, size=1)
+        connection = pool.acquire()
+        flows = core.ConcurrentFlows({0: core.FlowPath(
+            core.Task("use", lambda c: None, [pool], timeout=0.05))})
+        t = time.perf_counter()
+        log = flows.run({"backend": backend})[0]
+        assert time.perf_counter() - t < 1
+        assert log["tasks"]["use"]["status"]["task"] == "TIMEOUT"
+        pool.release(connection)
+        assert pool.acquire() is connection
@@ -0,0 +1,121 @@
+"""
+    tests.sharding
+
+    Discovery of several flowfiles and sharding of their targets
+
+"""
+import json
+import os
+
+import pytest
+
+from stateful_test import main
+from stateful_test.sharding import (load_durations, parse_shard, partition,
+                                    select_shard)
+from stateful_test.sinks import JsonlSink
+
+FLOWFILE = """
+from stateful_test import core
+
+login = core.FlowPath(core.Task("login", lambda: True))
+load = core.ConcurrentFlows({0: core.FlowPath(core.Task("a", lambda: True))})
+_private = core.FlowPath(core.Task("hidden", lambda: True))
+"""
+
+
+class TestSharding(object):
+
+    def __names(self, count):
+        return ["target_{}".format(i) for i in range(count)]
+
+    def test_parse_shard(self):
+        assert parse_shard("2/4") == (2, 4)
+        for shard in ("0/4", "5/4", "1", "a/b"):
+            with pytest.raises(ValueError):
+                parse_shard(shard)
+
+    def test_every_target_in_one_shard(self):
+        names = self.__names(11)
+        shards = partition(names, 3)
+        assert sorted(sum(shards, [])) == sorted(names)
+        assert [len(shard) for shard in shards] == [4, 4, 3]
+        # The shard keeps the given order
+        assert shards[0] == sorted(shards[0], key=names.index)
+
+    def test_stable(self):
+        names = self.__names(20)
+        durations = {name: i % 7 for i, name in enumerate(names)}
+        assert (select_shard(names, (2, 3), durations)
+                == select_shard(list(names), (2, 3), dict(durations)))
+
+    def test_balanced_by_durations(self):
+        durations = {"long": 10, "a": 3, "b": 3, "c": 2, "d": 2}
+        shards = partition(list(durations), 2, durations)
+        assert shards == [["long"], ["a", "b", "c", "d"]]
+
+    def test_unknown_durations_weigh_the_median(self):
+        durations = {"a": 1, "b": 5, "c": 9}
+        shards = partition(["a", "b", "c", "new"], 2, durations)
+        assert shards == [["a", "c"], ["b", "new"]]
+
+    def test_more_shards_than_targets(self):
+        assert partition(["a"], 3) == [["a"], [], []]
+
+    def test_load_durations(self, tmp_path):
+        json_results = tmp_path / "shard_1.json"
+        json_results.write_text(json.dumps(
+            {"a": {}, "_timings": {"a": 1.5, "b": 2}}))
+        with JsonlSink(str(tmp_path / "shard_2.jsonl")) as sink:
+            sink.write_target("c", {})
+            sink.write_target("_timings", {"c": 3})
+        plain = tmp_path / "durations.json"
+        plain.write_text(json.dumps({"b": 4}))
+        assert load_durations([str(tmp_path / "shard_*"), str(plain),
+                               str(tmp_path / "missing.json")]) == {
+            "a": 1.5, "b": 4, "c": 3}
+
+
+class TestFlowfileDiscovery(object):
+
+    def __flowfiles(self, root):
+        for directory in ("checkout", "login"):
+            (root / directory).mkdir()
+            (root / directory / "flowfile.py").write_text(FLOWFILE)
+        (root / "login" / "_helpers.py").write_text("raise ImportError")
+
+    def test_directory(self, tmp_path):
+        self.__flowfiles(tmp_path)
+        assert main.find_flowfiles(str(tmp_path)) == [
+            str(tmp_path / "checkout" / "flowfile.py"),
+            str(tmp_path / "login" / "flowfile.py")]
+
+    def test_glob(self, tmp_path):
+        self.__flowfiles(tmp_path)
+        assert main.find_flowfiles(str(tmp_path / "**" / "*.py")) == [
+            str(tmp_path / "checkout" / "flowfile.py"),
+            str(tmp_path / "login" / "flowfile.py")]
+        assert main.find_flowfiles(str(tmp_path / "nothing*")) == []
+
+    def test_targets_of_every_flowfile(self, tmp_path, monkeypatch):
+        self.__flowfiles(tmp_path)
+        monkeypatch.chdir(tmp_path)
+        flowpaths, concurrent_flows = main.load_flowfiles(
+            main.find_flowfiles(str(tmp_path)))
+        checkout = os.path.join("checkout", "flowfile.py")
+        login = os.path.join("login", "flowfile.py")
+        assert sorted(flowpaths) == [checkout + "::login", login + "::login"]
+        assert sorted(concurrent_flows) == [checkout + "::load",
+                                            login + "::load"]
+        # Each flowfile is a module of its own
+        assert (flowpaths[checkout + "::login"]
+                is not flowpaths[login + "::login"])
+
+    def test_shard_targets(self, tmp_path, monkeypatch):
+        self.__flowfiles(tmp_path)
+        monkeypatch.chdir(tmp_path)
+        flowpaths, concurrent_flows = main.load_flowfiles(
+            main.find_flowfiles(str(tmp_path)))
+        shards = [main.shard_targets(flowpaths, concurrent_flows, (i, 2))
+                  for i in (1, 2)]
+        assert [len(f) + len(c) for f, c in shards] == [2, 2]
+        assert (set(shards[0][0]) | set(shards[1][0])) == set(flowpaths)
@@ -0,0 +1,172 @@
+"""
+    tests.shared
+
+    Run-once tasks shared by the flows
+
+"""
+import asyncio
+
+import gevent
+import pytest
+
+from stateful_test import core
+from stateful_test.shared import SharedResults, process_results
+
+
+class TokenServer(object):
+
+    def __init__(self, fail=False):
+        self.logins = 0
+        self.fail = fail
+
+    def login(self):
+        self.logins += 1
+        gevent.sleep(0.02)
+        if self.fail:
+            raise ValueError("Wrong password")
+        return "token-{}".format(self.logins)
+
+    async def login_async(self):
+        self.logins += 1
+        await asyncio.sleep(0.02)
+        return "token-{}".format(self.logins)
+
+
+def use_token(token):
+    return token
+
+
+def admin_login():
+    return "admin-token"
+
+
+class TestSharedTasks(object):
+
+    def __flow_factory(self, login, shared="run", ttl=None):
+        def _create_flow(fid):
+            return core.FlowPath([
+                core.Task("login", login, shared=shared, ttl=ttl),
+                core.Task("use", use_token, [core.TaskResult("login")]),
+            ])
+        return _create_flow
+
+    def __results(self, logs):
+        return [log["tasks"]["login"]["cache"] for log in logs.values()]
+
+    def test_concurrent_flows_share_the_run(self):
+        server = TokenServer()
+        flows = core.ConcurrentFlows(flow_factory=self.__flow_factory(
+            server.login), flow_count=20)
+        logs = flows.run()
+        assert server.logins == 1
+        assert self.__results(logs).count("MISS") == 1
+        assert self.__results(logs).count("HIT") == 19
+        assert all(log["status"] == "SUCCESS" for log in logs.values())
+
+    def test_result_is_used_by_the_other_tasks(self):
+        server = TokenServer()
+        flows = core.ConcurrentFlows(flow_factory=self.__flow_factory(
+            server.login), flow_count=3)
+        flows.execute()
+        assert all(record.tasks["use"].task_status == "SUCCESS"
+                   for record in flows.records.values())
+
+    def test_every_run_runs_it_again(self):
+        server = TokenServer()
+        flows = core.ConcurrentFlows(flow_factory=self.__flow_factory(
+            server.login), flow_count=5)
+        flows.run()
+        flows.run()
+        assert server.logins == 2
+
+    def test_ttl(self):
+        server = TokenServer()
+        flows = core.ConcurrentFlows(
+            flow_factory=self.__flow_factory(server.login, ttl=0),
+            flow_count=4)
+        logs = flows.run({"mode": "pool", "pool_size": 1})
+        assert server.logins == 4
+        assert self.__results(logs) == ["MISS"] * 4
+
+    def test_failure_is_not_kept(self):
+        server = TokenServer(fail=True)
+        flows = core.ConcurrentFlows(flow_factory=self.__flow_factory(
+            server.login), flow_count=5)
+        logs = flows.run()
+        assert server.logins == 1
+        assert all(log["status"] == "ERROR" for log in logs.values())
+        server.fail = False
+        key = core.Task("login", server.login).shared_key
+        assert flows.shared_results.get_or_run(key, None, server.login) == (
+            "MISS", "token-2")
+
+    def test_process_scope(self):
+        process_results.discard()
+        server = TokenServer()
+        for _ in range(2):
+            core.ConcurrentFlows(flow_factory=self.__flow_factory(
+                server.login, shared="process"), flow_count=3).run()
+        assert server.logins == 1
+        process_results.discard()
+
+    def test_same_name_does_not_collide(self):
+        process_results.discard()
+        server = TokenServer()
+        core.ConcurrentFlows(flow_factory=self.__flow_factory(
+            server.login, shared="process"), flow_count=2).run()
+        logs = core.ConcurrentFlows(flow_factory=self.__flow_factory(
+            admin_login, shared="process"), flow_count=2).run()
+        process_results.discard()
+        assert self.__results(logs) == ["MISS", "HIT"]
+        assert all(log["tasks"]["use"]["status"]["task"] == "SUCCESS"
+                   for log in logs.values())
+        assert server.logins == 1
+
+    def test_explicit_shared_key(self):
+        server = TokenServer()
+        flow_path = core.FlowPath([
+            core.Task("login", server.login, shared="run", shared_key="token"),
+            core.Task("admin", admin_login, shared="run", shared_key="token")])
+        log = core.ConcurrentFlows({0: flow_path}).run()[0]
+        assert [log["tasks"][t]["cache"] for t in ("login", "admin")] == [
+            "MISS", "HIT"]
+        assert flow_path.path[1].copy().shared_key == "token"
+
+    def test_not_shared(self):
+        server = TokenServer()
+        logs = core.ConcurrentFlows(flow_factory=self.__flow_factory(
+            server.login, shared=None), flow_count=3).run()
+        assert server.logins == 3
+        assert self.__results(logs) == [None] * 3
+
+    def test_unknown_scope(self):
+        with pytest.raises(ValueError):
+            core.Task("login", use_token, shared="forever")
+
+    def test_asyncio(self):
+        server = TokenServer()
+        flows = core.ConcurrentFlows(flow_factory=self.__flow_factory(
+            server.login_async), flow_count=10)
+        logs = flows.run({"backend": "asyncio"})
+        assert server.logins == 1
+        assert self.__results(logs).count("HIT") == 9
+
+
+class TestSharedResults(object):
+
+    def test_ttl_expiry(self):
+        shared = SharedResults()
+        assert shared.get_or_run("key", 0.05, lambda: 1) == ("MISS", 1)
+        assert shared.get_or_run("key", 0.05, lambda: 2) == ("HIT", 1)
+        gevent.sleep(0.06)
+        assert shared.get_or_run("key", 0.05, lambda: 3) == ("MISS", 3)
+
+    def test_cancelled_run_is_retried(self):
+        shared = SharedResults()
+        first = gevent.spawn(shared.get_or_run, "key", None,
+                             lambda: gevent.sleep(1))
+        gevent.sleep(0)
+        waiter = gevent.spawn(shared.get_or_run, "key", None, lambda: 42)
+        gevent.sleep(0)
+        first.kill()
+        assert waiter.get(timeout=1) == ("MISS", 42)
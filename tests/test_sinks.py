@@ -0,0 +1,58 @@
+"""
+    tests.sinks
+
+    The JSON lines result streaming
+
+"""
+import io
+import json
+
+from stateful_test import core, main
+from stateful_test.sinks import JsonlSink, read_jsonl
+
+
+class TestJsonlSink(object):
+
+    def __task(self):
+        return True
+
+    def __create_flow_path(self):
+        return core.FlowPath(core.Task("a", self.__task))
+
+    def test_roundtrip(self, tmp_path):
+        path = str(tmp_path / "out.jsonl")
+        concurrent_flow = core.ConcurrentFlows(
+            {"flow_{}".format(i): self.__create_flow_path() for i in range(5)})
+        single = self.__create_flow_path()
+        with JsonlSink(path, batch_size=2) as sink:
+            out_dict = main.run_targets({"single": single},
+                                        {"cflows": concurrent_flow}, sink=sink)
+        out_dict = read_jsonl(path)
+        assert list(out_dict["cflows"]) == ["flow_{}".format(i) for i in range(5)]
+        assert all(log["status"] == "SUCCESS"
+                   for log in out_dict["cflows"].values())
+        assert out_dict["single"] == json.loads(json.dumps(single.log))
+
+    def test_batched_writes(self):
+        output = io.StringIO()
+        sink = JsonlSink(output, batch_size=3)
+        sink.write_flow("cflows", 1, {})
+        sink.write_flow("cflows", 2, {})
+        assert output.getvalue() == ""
+        sink.write_flow("cflows", 3, {})
+        assert len(output.getvalue().splitlines()) == 3
+        sink.write_target("single", {})
+        sink.close()
+        lines = output.getvalue().splitlines()
+        assert len(lines) == 4
+        assert lines[0] == '{"target":"cflows","flow_id":1,"log":{}}'
+
+    def test_lines_written_before_close(self, tmp_path):
+        path = str(tmp_path / "out.jsonl")
+        sink = JsonlSink(path, batch_size=1)
+        concurrent_flow = core.ConcurrentFlows(
+            {i: self.__create_flow_path() for i in range(3)})
+        concurrent_flow.run(on_flow_end=lambda fid, log:
+                            sink.write_flow("cflows", fid, log))
+        assert list(read_jsonl(path)["cflows"]) == [0, 1, 2]
+        sink.close()
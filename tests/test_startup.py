@@ -0,0 +1,31 @@
+import subprocess
+import sys
+
+PROBE = '''
+import sys
+import stateful_test.main
+from stateful_test.core import Task, FlowPath
+FlowPath([Task("dummy", lambda: True)])
+print(",".join(m for m in ("gevent", "asyncio", "multiprocessing")
+               if m in sys.modules))
+'''
+
+
+class TestStartup(object):
+
+    def test_import_has_no_side_effects(self):
+        """
+        Importing the package and building flows must not import the backends
+        nor monkey patch the standard library
+        """
+        output = subprocess.check_output([sys.executable, "-c", PROBE])
+        assert output.decode().strip() == ""
+
+    def test_patch_gevent(self):
+        output = subprocess.check_output([
+            sys.executable, "-c",
+            "import socket; from stateful_test import patch_gevent; "
+            "patch_gevent(); patch_gevent(); "
+            "from gevent import monkey; print(monkey.is_module_patched('socket'))"
+        ])
+        assert output.decode().strip() == "True"
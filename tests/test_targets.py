@@ -0,0 +1,78 @@
+"""
+    tests.targets
+
+    Selection and parallel execution of the flowfile targets
+
+"""
+import asyncio
+import time
+
+import gevent
+
+from stateful_test import core, main
+
+NAP = 0.1
+
+
+def nap():
+    gevent.sleep(NAP)
+    return True
+
+
+async def nap_async():
+    await asyncio.sleep(NAP)
+    return True
+
+
+class TestTargets(object):
+
+    def __targets(self, function=nap):
+        flowpaths = {name: core.FlowPath(core.Task("nap", function))
+                     for name in ("login", "checkout_card", "checkout_cash")}
+        concurrent_flows = {"load": core.ConcurrentFlows(
+            {i: core.FlowPath(core.Task("nap", function)) for i in range(3)})}
+        return flowpaths, concurrent_flows
+
+    def test_select(self):
+        flowpaths, concurrent_flows = self.__targets()
+        assert list(main.select_targets(flowpaths, ["checkout_*"])) == [
+            "checkout_card", "checkout_cash"]
+        assert list(main.select_targets(flowpaths, ["login", "*_cash"])) == [
+            "login", "checkout_cash"]
+        assert main.select_targets(concurrent_flows, ["login"]) == {}
+
+    def test_one_after_another(self):
+        flowpaths, concurrent_flows = self.__targets()
+        timings = {}
+        t = time.perf_counter()
+        out_dict = main.run_targets(flowpaths, concurrent_flows,
+                                    timings=timings)
+        assert time.perf_counter() - t >= 4 * NAP
+        assert list(out_dict) == ["load", "login", "checkout_card",
+                                  "checkout_cash"]
+        assert set(timings) == set(out_dict)
+        assert all(NAP <= seconds < 4 * NAP for seconds in timings.values())
+
+    def test_parallel(self):
+        flowpaths, concurrent_flows = self.__targets()
+        timings = {}
+        t = time.perf_counter()
+        out_dict = main.run_targets(flowpaths, concurrent_flows,
+                                    parallel_targets=2, timings=timings)
+        elapsed = time.perf_counter() - t
+        assert 2 * NAP <= elapsed < 3 * NAP
+        assert list(out_dict) == ["load", "login", "checkout_card",
+                                  "checkout_cash"]
+        assert all(log["status"] == "SUCCESS"
+                   for log in out_dict["load"].values())
+        assert out_dict["login"]["status"] == "SUCCESS"
+        assert set(timings) == set(out_dict)
+
+    def test_parallel_asyncio(self):
+        flowpaths, concurrent_flows = self.__targets(nap_async)
+        t = time.perf_counter()
+        out_dict = main.run_targets(flowpaths, concurrent_flows,
+                                    backend=core.ASYNCIO_BACKEND,
+                                    parallel_targets=4)
+        assert time.perf_counter() - t < 2 * NAP
+        assert out_dict["checkout_cash"]["status"] == "SUCCESS"
@@ -0,0 +1,152 @@
+"""
+    tests.timeouts
+
+    Task, flow and run timeouts
+
+"""
+import asyncio
+import time
+
+import gevent
+import pytest
+
+from stateful_test import core
+
+
+def nap(seconds):
+    gevent.sleep(seconds)
+    return True
+
+
+async def nap_async(seconds):
+    await asyncio.sleep(seconds)
+    return True
+
+
+class TestTaskTimeout(object):
+
+    def test_task(self):
+        slow = core.Task("slow", nap, [1], timeout=0.02)
+        after = core.Task("after", nap, [0])
+        log = core.FlowPath([slow, after]).run()
+        assert log["status"] == "TIMEOUT"
+        assert log["tasks"]["slow"]["status"]["task"] == "TIMEOUT"
+        assert log["tasks"]["slow"]["execution_time"] < 500
+        assert log["executed_path"] == []
+        assert "after" not in log["tasks"]
+
+    def test_verification(self):
+        task = core.Task("check", nap, [0], timeout=0.02)
+        task.add_result_function(nap, [1])
+        log = core.FlowPath(task).run()
+        assert log["status"] == "TIMEOUT"
+        assert log["tasks"]["check"]["status"] == {"task": "SUCCESS",
+                                                   "verification": "TIMEOUT"}
+
+    def test_in_time(self):
+        log = core.FlowPath(core.Task("quick", nap, [0], timeout=1)).run()
+        assert log["status"] == "SUCCESS"
+
+    def test_asyncio(self):
+        slow = core.Task("slow", nap_async, [1], timeout=0.02)
+        log = asyncio.run(core.FlowPath(slow).run_async())
+        assert log["status"] == "TIMEOUT"
+        assert log["tasks"]["slow"]["status"]["task"] == "TIMEOUT"
+
+
+class TestFlowTimeout(object):
+
+    def test_sequential(self):
+        flow_path = core.FlowPath([core.Task("a", nap, [0]),
+                                   core.Task("b", nap, [1])], timeout=0.05)
+        log = flow_path.run()
+        assert log["status"] == "TIMEOUT"
+        assert log["executed_path"] == ["a"]
+        assert log["tasks"]["b"]["status"]["task"] == "TIMEOUT"
+        assert log["total_elapsed_time"] < 500
+
+    def test_parallel(self):
+        tasks = [core.Task("a", nap, [1]), core.Task("b", nap, [1]),
+                 core.Task("c", nap, [0], depends_on=["a"])]
+        log = core.FlowPath(tasks, parallel=True, timeout=0.05).run()
+        assert log["status"] == "TIMEOUT"
+        assert log["tasks"]["a"]["status"]["task"] == "TIMEOUT"
+        assert log["tasks"]["b"]["status"]["task"] == "TIMEOUT"
+        assert "c" not in log["tasks"]
+
+    def test_parallel_asyncio(self):
+        tasks = [core.Task("a", nap_async, [1]), core.Task("b", nap_async, [1])]
+        log = asyncio.run(core.FlowPath(tasks, parallel=True,
+                                        timeout=0.05).run_async())
+        assert log["status"] == "TIMEOUT"
+        assert log["tasks"]["a"]["status"]["task"] == "TIMEOUT"
+
+    def test_outer_timeout_is_raised(self):
+        flow_path = core.FlowPath(core.Task("a", nap, [1]))
+        with pytest.raises(gevent.Timeout):
+            with gevent.Timeout(0.05):
+                flow_path.run()
+        assert flow_path.record.status == "TIMEOUT"
+        assert flow_path.log["tasks"]["a"]["status"]["task"] == "TIMEOUT"
+
+    def test_cancelled_asyncio_task(self):
+        flow_path = core.FlowPath(core.Task("a", nap_async, [1]))
+
+        async def _cancel():
+            job = asyncio.ensure_future(flow_path.run_async())
+            await asyncio.sleep(0.05)
+            job.cancel()
+            await asyncio.wait([job])
+            return job
+
+        assert asyncio.run(_cancel()).cancelled()
+        assert flow_path.record.status == "TIMEOUT"
+
+    def test_copy_keeps_timeouts(self):
+        flow_path = core.FlowPath(core.Task("a", nap, [1], timeout=0.02),
+                                  timeout=2).copy()
+        assert flow_path.timeout == 2
+        assert flow_path.path[0].timeout == 0.02
+
+
+class TestRunTimeout(object):
+
+    def __create_concurrent_flows(self, function, flow_no=10):
+        # The even flows hang, the odd ones finish at once
+        return core.ConcurrentFlows(
+            flow_factory=lambda fid: core.FlowPath(
+                core.Task("nap", function, [10 if fid % 2 == 0 else 0])),
+            flow_count=flow_no)
+
+    def test_at_once(self):
+        concurrent_flow = self.__create_concurrent_flows(nap)
+        t = time.monotonic()
+        logs = concurrent_flow.run({"timeout": 0.05})
+        assert time.monotonic() - t < 1
+        assert len(logs) == 10
+        statuses = [logs[i]["status"] for i in range(10)]
+        assert statuses == ["TIMEOUT", "SUCCESS"] * 5
+        assert logs[0]["tasks"]["nap"]["status"]["task"] == "TIMEOUT"
+
+    def test_pool(self):
+        concurrent_flow = self.__create_concurrent_flows(nap, flow_no=100)
+        t = time.monotonic()
+        logs = concurrent_flow.run({"mode": "pool", "pool_size": 2,
+                                    "timeout": 0.05})
+        assert time.monotonic() - t < 1
+        # The pool is held by the hanging flows, so no more are started
+        assert list(logs) == [0, 1, 2]
+        assert [log["status"] for log in logs.values()] == [
+            "TIMEOUT", "SUCCESS", "TIMEOUT"]
+
+    def test_asyncio(self):
+        concurrent_flow = self.__create_concurrent_flows(nap_async)
+        t = time.monotonic()
+        logs = concurrent_flow.run({"backend": "asyncio", "timeout": 0.05})
+        assert time.monotonic() - t < 1
+        assert [logs[i]["status"] for i in range(10)] == ["TIMEOUT",
+                                                          "SUCCESS"] * 5
+
+    def test_invalid_timeout(self):
+        with pytest.raises(core.InvalidRunOptions):
+            core.ConcurrentFlows({}).run({"timeout": 0})